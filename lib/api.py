@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import json
+import re
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from db.models import DATABASE_URL, Team, Player, Match, TeamStats, SQLITE_PROFILES, sqlite_pragmas, install_pragmas
+from commands import team_dict, player_dict, match_dict
+import operations
+
+# Read-only JSON API over the tournament database for overlays and bots.
+# Requests are served from a small asyncio HTTP/1.1 server (keep-alive, GET
+# only) and queried through SQLAlchemy's async engine on aiosqlite, with a
+# bounded pool so a burst of clients queues for a connection instead of
+# opening one each. Responses are cached until the database changes: SQLite
+# bumps PRAGMA data_version on a connection whenever another connection
+# commits, so one idle connection tells us when every cached body is stale.
+
+DEFAULT_PORT = 8080
+DEFAULT_POOL_SIZE = 5
+CACHE_SIZE = 256
+MAX_PAGE_SIZE = 500
+
+
+class NotFound(Exception):
+    pass
+
+
+def create_async_db_engine(url=None, profile=None, pool_size=DEFAULT_POOL_SIZE, **overrides):
+    # Imported here so the rest of the app doesn't need aiosqlite installed.
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(url or DATABASE_URL)
+    if url.drivername == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    engine = create_async_engine(
+        url, poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=0, pool_timeout=30
+    )
+    if engine.dialect.name == 'sqlite':
+        install_pragmas(engine.sync_engine, sqlite_pragmas(profile, **overrides))
+    return engine
+
+
+def query_int(query, name, default=None, maximum=None):
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number")
+    if number < 1:
+        raise ValueError(f"'{name}' must be at least 1")
+    return min(number, maximum) if maximum else number
+
+
+# Views run inside AsyncSession.run_sync, so they can reuse the ordinary
+# query code in operations. Each returns the JSON payload.
+
+def teams_view(session, query):
+    stmt = select(Team.id, Team.name, Team.genre, Team.rankings).order_by(Team.id)
+    if query.get("genre"):
+        stmt = stmt.where(Team.genre == query["genre"])
+    return {"teams": [
+        {"id": team_id, "name": name, "genre": genre, "rankings": rankings}
+        for team_id, name, genre, rankings in session.execute(stmt)
+    ]}
+
+
+def team_view(session, query, team_id):
+    team = session.get(Team, int(team_id))
+    if not team:
+        raise NotFound(f"No team found with ID {team_id}")
+    stats = session.get(TeamStats, team.id)
+    payload = team_dict(team)
+    payload["stats"] = {
+        "rating": stats.rating,
+        "wins": stats.wins,
+        "losses": stats.losses,
+        "form": stats.form,
+    } if stats else None
+    return payload
+
+
+def team_players_view(session, query, team_id):
+    if session.get(Team, int(team_id)) is None:
+        raise NotFound(f"No team found with ID {team_id}")
+    return {"players": [player_dict(p) for p in session.execute(operations.players_query(int(team_id)))]}
+
+
+def player_view(session, query, player_id):
+    player = session.get(Player, int(player_id))
+    if not player:
+        raise NotFound(f"No player found with ID {player_id}")
+    return player_dict(player)
+
+
+def player_leaderboard_view(session, query):
+    return {"players": operations.player_leaderboard(
+        session,
+        query_int(query, "limit", operations.PLAYER_LEADERBOARD_SIZE, MAX_PAGE_SIZE),
+        query.get("sort", "kd"),
+        query.get("genre"),
+        query.get("role"),
+        query_int(query, "min_matches", 1),
+    )}
+
+
+def player_summary_view(session, query):
+    by = query.get("by", "role")
+    return {"by": by, "summary": operations.player_summary(session, by, query.get("genre"))}
+
+
+def match_json(match):
+    payload = match_dict(match)
+    payload["team1"] = match.team1
+    payload["team2"] = match.team2
+    payload["winner"] = match.winner
+    return payload
+
+
+def matches_view(session, query):
+    status = query.get("status")
+    if status and status not in operations.MATCH_STATUSES:
+        raise ValueError(f"Invalid status '{status}'. Choose from: {', '.join(operations.MATCH_STATUSES)}")
+    team_id = query.get("team")
+    matches, cursor = operations.match_history_page(
+        session,
+        query_int(query, "page_size", operations.HISTORY_PAGE_SIZE, MAX_PAGE_SIZE),
+        after=operations.parse_cursor(query.get("after")),
+        team_id=operations.parse_id(team_id, "team") if team_id else None,
+        genre=query.get("genre"),
+        date_from=query.get("from"),
+        date_to=query.get("to"),
+        status=status,
+    )
+    return {"matches": [match_json(m) for m in matches], "next": operations.format_cursor(cursor)}
+
+
+def match_view(session, query, match_id):
+    match = session.execute(
+        operations.match_history_query().where(Match.id == int(match_id))
+    ).first()
+    if not match:
+        raise NotFound(f"No match found with ID {match_id}")
+    return match_json(match)
+
+
+def leaderboard_view(session, query):
+    if query.get("date"):
+        rows = operations.leaderboard_at(session, query["date"], query_int(query, "limit"))
+        for row in rows:
+            row["last_match"] = row["last_match"].isoformat()
+        return {"date": query["date"], "leaderboard": rows}
+    return {"leaderboard": operations.leaderboard(
+        session, query_int(query, "limit"), query.get("genre"), query.get("source", "stats")
+    )}
+
+
+def team_ratings_view(session, query, team_id):
+    if session.get(Team, int(team_id)) is None:
+        raise NotFound(f"No team found with ID {team_id}")
+    return {"ratings": [
+        {"date": event.date.isoformat(), "match_id": event.match_id,
+         "before": event.before, "after": event.after, "delta": event.delta}
+        for event in session.execute(operations.rating_curve_query(int(team_id)))
+    ]}
+
+
+ROUTES = [
+    (re.compile(r'/teams'), teams_view),
+    (re.compile(r'/teams/(\d+)'), team_view),
+    (re.compile(r'/teams/(\d+)/players'), team_players_view),
+    (re.compile(r'/teams/(\d+)/ratings'), team_ratings_view),
+    (re.compile(r'/players/(\d+)'), player_view),
+    (re.compile(r'/players/leaderboard'), player_leaderboard_view),
+    (re.compile(r'/players/summary'), player_summary_view),
+    (re.compile(r'/matches'), matches_view),
+    (re.compile(r'/matches/(\d+)'), match_view),
+    (re.compile(r'/leaderboard'), leaderboard_view),
+]
+
+
+class ResponseCache:
+    # LRU of encoded responses, each tagged with the data_version it was
+    # built under; an entry from an older version counts as a miss.
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, version, response):
+        if not self.size:
+            return
+        self.entries[key] = (version, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class ApiServer:
+    def __init__(self, engine, cache_size=CACHE_SIZE):
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        self.engine = engine
+        self.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        self.cache = ResponseCache(cache_size)
+        self.version_conn = None
+        self.version_check = None
+
+    async def start(self, host, port):
+        # Held for the server's lifetime: data_version is only meaningful
+        # when read again on the same connection.
+        self.version_conn = await self.engine.connect()
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def close(self):
+        if self.version_conn is not None:
+            await self.version_conn.close()
+        await self.engine.dispose()
+
+    async def read_version(self):
+        version = (await self.version_conn.exec_driver_sql("PRAGMA data_version")).scalar()
+        await self.version_conn.rollback()
+        return version
+
+    async def data_version(self):
+        # Concurrent requests share one in-flight PRAGMA instead of queueing
+        # behind each other on the single version connection.
+        if self.version_check is None:
+            self.version_check = asyncio.ensure_future(self.read_version())
+            self.version_check.add_done_callback(lambda _: setattr(self, 'version_check', None))
+        return await asyncio.shield(self.version_check)
+
+    async def respond(self, method, target):
+        if method not in ('GET', 'HEAD'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Only GET is supported"}, None
+
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/') or '/'
+        for pattern, view in ROUTES:
+            found = pattern.fullmatch(path)
+            if found:
+                break
+        else:
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown path '{path}'"}, None
+
+        version = await self.data_version()
+        key = (path, parts.query)
+        cached = self.cache.get(key, version)
+        if cached is not None:
+            return HTTPStatus.OK, cached, "hit"
+
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        try:
+            async with self.sessions() as session:
+                payload = await session.run_sync(view, query, *found.groups())
+        except NotFound as e:
+            return HTTPStatus.NOT_FOUND, {"error": str(e)}, None
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}, None
+        except SQLAlchemyError as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Database error: {e.__class__.__name__}"}, None
+
+        body = json.dumps(payload).encode()
+        self.cache.put(key, version, body)
+        return HTTPStatus.OK, body, "miss"
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    method, target, version = None, '/', 'HTTP/1.0'
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                if method is None:
+                    status, body, cache = HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, None
+                    keep_alive = False
+                else:
+                    status, body, cache = await self.respond(method, target)
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+
+                head = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if cache:
+                    head.append(f"X-Cache: {cache}")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode())
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host='127.0.0.1', port=DEFAULT_PORT, url=None, profile=None,
+                pool_size=DEFAULT_POOL_SIZE, cache_size=CACHE_SIZE):
+    # query_only makes every pooled connection refuse writes. The extra
+    # connection is the one ApiServer keeps for data_version.
+    engine = create_async_db_engine(url, profile, pool_size + 1, query_only='ON')
+    api = ApiServer(engine, cache_size)
+    server = await api.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving on http://{address[0]}:{address[1]}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only JSON API for the Esports Tournament Manager")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--url", help="database URL (default: ESPORTS_DB_URL or sqlite:///Esports.db)")
+    parser.add_argument("--profile", choices=sorted(SQLITE_PROFILES), help="SQLite PRAGMA profile")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="cached responses; 0 disables the cache")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.url, args.profile, args.pool_size, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
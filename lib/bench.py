@@ -0,0 +1,901 @@
+import argparse
+import asyncio
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from rich.console import Console
+from rich.table import Table
+from sqlalchemy import select, insert, text, or_, and_
+from sqlalchemy.orm import Session, sessionmaker, joinedload
+from db.models import Base, Team, Player, Match, PlayerMatchStats, SQLITE_PROFILES, create_db_engine, prepare_database
+from ratings import K_FACTOR, INITIAL_RATING, simulate_pending, pending_query, replay, load_pending, merge_batches
+from operations import (
+    VALID_GENRES, start_simulation, simulate_chunks, list_teams, match_history_query, match_history_page, players_query, simulate_matches,
+    leaderboard, leaderboard_by_genre, leaderboard_row, leaderboard_at_query, rating_curve, rating_curve_query,
+    player_leaderboard, player_summary,
+)
+from db.seed import seed_league
+from tournaments import generate_fixtures
+from swiss import schedule_round
+import progress
+import forecast
+import numeric
+import rating_systems
+import snapshot
+import stats
+
+console = Console()
+
+
+def make_database(path, teams=500, matches=10000, seed=0, players_per_team=0, completed=0.0, profile=None,
+                  genres=1):
+    rng = random.Random(seed)
+    # Team i plays in genre i % genres, and matches stay inside a genre.
+    pools = [list(range(g + 1, teams + 1, genres)) for g in range(genres)]
+    engine = create_db_engine(f"sqlite:///{path}", profile)
+    Base.metadata.create_all(engine)
+    start = date(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Team), [
+            {"id": i, "name": f"Team {i}", "genre": VALID_GENRES[(i - 1) % genres], "rankings": None}
+            for i in range(1, teams + 1)
+        ])
+        rows = []
+        for i in range(1, matches + 1):
+            team1, team2 = rng.sample(pools[rng.randrange(genres)] if genres > 1 else range(1, teams + 1), 2)
+            rows.append({
+                "id": i,
+                "team1_id": team1,
+                "team2_id": team2,
+                "date": start + timedelta(days=rng.randrange(365)),
+                "winner_id": rng.choice((team1, team2)) if rng.random() < completed else None,
+            })
+        if rows:
+            conn.execute(insert(Match), rows)
+        if players_per_team:
+            conn.execute(insert(Player), [
+                {"name": f"Player {i}-{n}", "role": "Duelist", "team_id": i}
+                for i in range(1, teams + 1)
+                for n in range(players_per_team)
+            ])
+    return engine
+
+
+def legacy_simulate(session):
+    # The per-object loop simulate_matches used before the rating engine.
+    pending_matches = session.scalars(
+        select(Match)
+        .where(Match.winner_id == None)
+        .options(joinedload(Match.team1), joinedload(Match.team2))
+        .order_by(Match.date, Match.id)
+    ).all()
+
+    for match in pending_matches:
+        team1 = match.team1
+        team2 = match.team2
+
+        team1.rankings = team1.rankings if team1.rankings else INITIAL_RATING
+        team2.rankings = team2.rankings if team2.rankings else INITIAL_RATING
+
+        expected_team1 = 1 / (1 + 10 ** ((team2.rankings - team1.rankings) / 400))
+        expected_team2 = 1 / (1 + 10 ** ((team1.rankings - team2.rankings) / 400))
+
+        if random.random() < expected_team1:
+            winner = team1
+            actual_team1, actual_team2 = 1, 0
+        else:
+            winner = team2
+            actual_team1, actual_team2 = 0, 1
+
+        match.winner_id = winner.id
+        team1.rankings = round(team1.rankings + K_FACTOR * (actual_team1 - expected_team1))
+        team2.rankings = round(team2.rankings + K_FACTOR * (actual_team2 - expected_team2))
+
+    session.commit()
+    return len(pending_matches)
+
+
+def engine_simulate(session):
+    batch = simulate_pending(session)
+    session.commit()
+    return len(batch)
+
+
+def seeded_simulate(session):
+    batch = simulate_pending(session, seed=0)
+    session.commit()
+    return len(batch)
+
+
+def time_run(func, teams, matches, profile=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), teams, matches, profile=profile)
+        with Session(engine) as session:
+            random.seed(0)
+            started = time.perf_counter()
+            count = func(session)
+            elapsed = time.perf_counter() - started
+        engine.dispose()
+    return count, elapsed
+
+
+def bench_elo(args):
+    table = Table(title="ELO simulation throughput", show_header=True, header_style="bold magenta")
+    table.add_column("Implementation", style="green")
+    table.add_column("Matches", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Matches/sec", style="cyan", justify="right")
+
+    for label, func in (("per-object loop", legacy_simulate), ("rating engine", engine_simulate),
+                        ("rating engine, seeded", seeded_simulate)):
+        count, elapsed = time_run(func, args.teams, args.matches, args.profile)
+        table.add_row(label, str(count), f"{elapsed:.3f}", f"{count / elapsed:,.0f}")
+
+    console.print(table)
+
+
+def bench_genres(args):
+    genres = len(VALID_GENRES)
+    workers = min(genres, os.cpu_count() or 1)
+    table = Table(title=f"Simulation across {genres} genre pools", show_header=True, header_style="bold magenta")
+    table.add_column("Workers", style="green", justify="right")
+    table.add_column("Matches", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Matches/sec", style="cyan", justify="right")
+
+    for count in sorted({1, workers}):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_database(os.path.join(tmp, "bench.db"), args.teams, args.matches,
+                                   profile=args.profile, genres=genres)
+            with Session(engine) as session:
+                started = time.perf_counter()
+                simulated = len(simulate_matches(session, seed=0, workers=count))
+                session.commit()
+                elapsed = time.perf_counter() - started
+            engine.dispose()
+        table.add_row(str(count), str(simulated), f"{elapsed:.3f}", f"{simulated / elapsed:,.0f}")
+
+    console.print(table)
+
+
+def bench_chunks(args):
+    # One transaction against committed chunks. The longest transaction is
+    # how long the write lock on the database is held at a stretch. Runs are
+    # timed with tracemalloc on, so compare them with each other only.
+    table = Table(title=f"Simulating {args.matches:,} pending matches", show_header=True,
+                  header_style="bold magenta")
+    table.add_column("Commit every", style="green", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Longest transaction ms", style="cyan", justify="right")
+    table.add_column("Python peak MiB", justify="right")
+
+    for chunk_size in (None, 1000, 10000):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_database(os.path.join(tmp, "bench.db"), args.teams, args.matches, profile=args.profile)
+            prepare_database(engine)
+            with Session(engine) as session:
+                tracemalloc.start()
+                started = transaction = time.perf_counter()
+                longest = 0.0
+                if chunk_size is None:
+                    simulate_matches(session, seed=0, workers=1)
+                else:
+                    run = start_simulation(session, chunk_size, seed=0, workers=1)
+                    for _ in simulate_chunks(session, run):
+                        session.commit()
+                        longest = max(longest, time.perf_counter() - transaction)
+                        transaction = time.perf_counter()
+                session.commit()
+                finished = time.perf_counter()
+                longest = max(longest, finished - transaction)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            engine.dispose()
+        table.add_row(f"{chunk_size:,}" if chunk_size else "end of run", f"{finished - started:.2f}",
+                      f"{longest * 1000:,.0f}", f"{peak / 2 ** 20:,.1f}")
+
+    console.print(table)
+
+
+def render_full_table(results, target):
+    # What the menu used to print: one formatted row per match.
+    table = Table(show_header=True, header_style="bold magenta")
+    for column in ("Match", "Ratings Before", "Outcome", "Ratings After", "Δ"):
+        table.add_column(column)
+    for result in results:
+        team1, team2 = result["team1"], result["team2"]
+        before1, before2 = result["before"]
+        after1, after2 = result["after"]
+        table.add_row(
+            f"{team1} vs {team2}",
+            f"{team1}: {before1}\n{team2}: {before2}",
+            f"{result['winner']} wins",
+            f"{team1}: {after1}\n{team2}: {after2}",
+            f"{after1 - before1:+}\n{after2 - before2:+}",
+        )
+    target.print(table)
+
+
+def render_summary(results, target):
+    summary, window = progress.ResultSummary(), progress.ResultWindow()
+    for result in results:
+        summary.add(result)
+        window.add(result)
+    target.print(window)
+    target.print(summary.tables())
+
+
+def bench_output(args):
+    # Rendering alone, on the results of one simulation: the row-per-match
+    # table against the rolling window plus movers/upsets summary.
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), args.teams, args.matches, profile=args.profile)
+        with Session(engine) as session:
+            batch = simulate_matches(session, seed=0, workers=1)
+            session.rollback()
+        engine.dispose()
+
+    table = Table(title=f"Rendering {len(batch):,} results", show_header=True, header_style="bold magenta")
+    table.add_column("Output", style="green")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Python peak MiB", style="cyan", justify="right")
+    for label, render in (("table row per match", render_full_table), ("window + summary", render_summary)):
+        target = Console(file=io.StringIO(), width=120)
+        tracemalloc.start()
+        started = time.perf_counter()
+        render(batch.results(), target)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        table.add_row(label, f"{elapsed:.2f}", f"{peak / 2 ** 20:,.1f}")
+    console.print(table)
+
+
+def bench_systems(args):
+    # Update throughput of each rating system on the same pending matches,
+    # in memory only: loading and writing back are the same for all of
+    # them. Glicko-2 runs once vectorized and once in pure Python.
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), args.teams, args.matches, profile=args.profile)
+        with Session(engine) as session:
+            batch = load_pending(session)
+        engine.dispose()
+    days = len(set(batch.dates))
+
+    variants = sorted(rating_systems.SYSTEMS.items())
+    variants += [
+        ("glicko2, always vectorized", rating_systems.Glicko2(vector_threshold=0)),
+        ("glicko2, pure Python", rating_systems.Glicko2(vector_threshold=math.inf)),
+    ]
+    table = Table(title=f"Rating {len(batch):,} matches, {args.teams} teams, {days} rating periods",
+                  show_header=True, header_style="bold magenta")
+    table.add_column("System", style="green")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Matches/sec", style="cyan", justify="right")
+    for label, system in variants:
+        timings = []
+        for _ in range(args.rounds):
+            fresh = merge_batches([batch])  # a copy with the starting ratings
+            started = time.perf_counter()
+            system.run(fresh, seed=0)
+            timings.append(time.perf_counter() - started)
+        table.add_row(label, f"{min(timings):.3f}", f"{len(batch) / min(timings):,.0f}")
+    console.print(table)
+
+
+# The query and computation behind each menu screen, run headlessly. The
+# simulation is rolled back after every run so each one starts from the
+# same pending matches.
+SUITE_PATHS = [
+    ("teams list", list_teams),
+    ("leaderboard", leaderboard),
+    ("leaderboard by genre", lambda session: leaderboard_by_genre(session, 10)),
+    ("match history", match_history_page),
+    ("match history, one team", lambda session: match_history_page(session, team_id=1)),
+    ("rating curve", lambda session: rating_curve(session, 1)),
+]
+SUITE_SIZES = "1000,100000,1000000"
+
+
+def time_simulation(session, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = timeit.default_timer()
+        simulate_matches(session, seed=0, workers=1)
+        timings.append(timeit.default_timer() - started)
+        session.rollback()
+    return min(timings)
+
+
+def bench_suite(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    try:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)["timings"]
+    except FileNotFoundError:
+        baseline = {}
+
+    timings = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.profile)
+            Base.metadata.create_all(engine)
+            with Session(engine) as session:
+                summary = seed_league(session, args.teams, size)
+                session.commit()
+                results = {"seed league": summary["seconds"]}
+                for label, func in SUITE_PATHS:
+                    results[label] = min(timeit.repeat(lambda: func(session), number=1, repeat=args.rounds))
+                    session.rollback()
+                results["simulate pending"] = time_simulation(session, args.rounds)
+            engine.dispose()
+        timings[str(size)] = results
+
+    table = Table(title=f"Suite, {args.teams} teams, best of {args.rounds}", show_header=True,
+                  header_style="bold magenta")
+    table.add_column("Path", style="green")
+    for size in sizes:
+        table.add_column(f"{size:,} matches", justify="right")
+        if baseline:
+            table.add_column("vs baseline", style="cyan", justify="right")
+    for label in timings[str(sizes[0])]:
+        cells = []
+        for size in sizes:
+            seconds = timings[str(size)][label]
+            cells.append(f"{seconds * 1000:,.2f} ms")
+            if baseline:
+                before = baseline.get(str(size), {}).get(label)
+                cells.append(f"{seconds / before:.2f}x" if before else "-")
+        table.add_row(label, *cells)
+    console.print(table)
+
+    if args.save:
+        with open(args.baseline, "w") as stream:
+            json.dump({
+                "teams": args.teams,
+                "rounds": args.rounds,
+                "python": sys.version.split()[0],
+                "timings": timings,
+            }, stream, indent=2)
+        console.print(f"Saved baseline to {args.baseline}")
+
+
+def python_leaderboard(session, limit=None):
+    # Standings rebuilt in Python from every completed match.
+    totals = stats.compute_stats(session)
+    rows = [
+        leaderboard_row(team_id, name, genre, rankings or INITIAL_RATING, **totals.get(
+            team_id, {"wins": 0, "losses": 0, "form": ""}
+        ))
+        for team_id, name, genre, rankings in list_teams(session)
+    ]
+    rows.sort(key=lambda row: (-row["rating"], row["id"]))
+    return rows[:limit]
+
+
+def bench_leaderboard(args):
+    backends = [
+        ("team_stats", lambda session: leaderboard(session, 10)),
+        ("match history, SQL", lambda session: leaderboard(session, 10, source="matches")),
+        ("match history, Python", lambda session: python_leaderboard(session, 10)),
+    ]
+    table = Table(title=f"Top 10 of {args.teams} teams, {args.matches:,} matches", show_header=True,
+                  header_style="bold magenta")
+    table.add_column("Backend", style="green")
+    table.add_column("ms", style="cyan", justify="right")
+    table.add_column("Python peak KiB", justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.profile)
+        prepare_database(engine)
+        with Session(engine) as session:
+            seed_league(session, args.teams, args.matches, pending=0)
+            session.commit()
+            boards = []
+            for label, func in backends:
+                seconds = min(timeit.repeat(lambda: func(session), number=1, repeat=args.rounds))
+                tracemalloc.start()
+                boards.append(func(session))
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                table.add_row(label, f"{seconds * 1000:,.1f}", f"{peak / 1024:,.0f}")
+        engine.dispose()
+    console.print(table)
+
+    if any(board != boards[0] for board in boards[1:]):
+        raise SystemExit("Leaderboard backends disagree")
+
+
+def python_player_leaderboard(session, limit=10):
+    # Every stat line pulled into Python and summed per player.
+    totals = {}
+    for player_id, kills, deaths in session.execute(
+        select(PlayerMatchStats.player_id, PlayerMatchStats.kills, PlayerMatchStats.deaths)
+    ):
+        total = totals.setdefault(player_id, [0, 0])
+        total[0] += kills
+        total[1] += deaths
+    ranked = sorted(totals.items(), key=lambda item: (-(item[1][0] / (item[1][1] or 1)), item[0]))
+    return [player_id for player_id, _ in ranked[:limit]]
+
+
+def bench_players(args):
+    # --teams 20000 --matches 100000 is 100k players and a million stat lines.
+    queries = [
+        ("top 10 by K/D", lambda session: player_leaderboard(session, 10)),
+        ("top 10 by K/D, Python", python_player_leaderboard),
+        ("top 10 Duelists by kills", lambda session: player_leaderboard(session, 10, "kills", role="Duelist")),
+        ("top 10 in one genre, 5+ matches",
+         lambda session: player_leaderboard(session, 10, genre=VALID_GENRES[0], min_matches=5)),
+        ("summary by role", lambda session: player_summary(session, "role")),
+        ("summary by genre", lambda session: player_summary(session, "genre")),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.profile)
+        prepare_database(engine)
+        with Session(engine) as session:
+            summary = seed_league(session, args.teams, args.matches, pending=0, player_stats=True)
+            session.commit()
+            table = Table(
+                title=f"{summary['players']:,} players, {summary['stat_lines']:,} stat lines "
+                      f"(seeded in {summary['seconds']:.1f}s)",
+                show_header=True, header_style="bold magenta",
+            )
+            table.add_column("Query", style="green")
+            table.add_column("ms", style="cyan", justify="right")
+            for label, func in queries:
+                seconds = min(timeit.repeat(lambda: func(session), number=1, repeat=args.rounds))
+                table.add_row(label, f"{seconds * 1000:,.1f}")
+            if [row["id"] for row in player_leaderboard(session, 10)] != python_player_leaderboard(session):
+                raise SystemExit("SQL and Python player leaderboards disagree")
+        engine.dispose()
+    console.print(table)
+
+
+def bench_snapshot(args):
+    # Reading the inputs of a forecast and scanning the rating ledger,
+    # from SQLite and from a snapshot of the same league.
+    formats = ["binary"] + (["parquet"] if snapshot.load_pyarrow() is not None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.profile)
+        prepare_database(engine)
+        with Session(engine) as session:
+            seed_league(session, args.teams, args.matches)
+            session.commit()
+
+            table = Table(title=f"{args.teams} teams, {args.matches:,} matches", show_header=True,
+                          header_style="bold magenta")
+            table.add_column("Path", style="green")
+            table.add_column("ms", style="cyan", justify="right")
+            table.add_column("MiB", justify="right")
+
+            def timed(label, func, size=""):
+                seconds = min(timeit.repeat(func, number=1, repeat=args.rounds))
+                table.add_row(label, f"{seconds * 1000:,.1f}", size)
+
+            sql_sum = lambda: session.execute(text("SELECT sum(delta) FROM rating_events")).scalar()
+            timed("SQLite: forecast season", lambda: forecast.load_season(session, VALID_GENRES[0]))
+            timed("SQLite: sum of rating deltas", sql_sum)
+            for fmt in formats:
+                path = os.path.join(tmp, fmt)
+                summary = snapshot.export_snapshot(engine, path, fmt)
+                table.add_row(f"{fmt}: export", f"{summary['seconds'] * 1000:,.1f}",
+                              f"{summary['bytes'] / 1024 / 1024:,.1f}")
+                # Opened afresh every round, so mapping the files is timed too.
+                timed(f"{fmt}: forecast season",
+                      lambda: forecast.load_snapshot_season(snapshot.open_snapshot(path), VALID_GENRES[0]))
+                if fmt == "binary":
+                    deltas = lambda: snapshot.open_snapshot(path).table("rating_events")["delta"]
+                    timed("binary: sum of rating deltas", lambda: sum(deltas()))
+                    np = numeric.load_numpy()
+                    if np is not None:
+                        timed("binary: sum of rating deltas, NumPy", lambda: int(np.frombuffer(deltas(), np.int64).sum()))
+                else:
+                    timed("parquet: sum of rating deltas",
+                          lambda: snapshot.open_snapshot(path).table("rating_events")["delta"].to_numpy().sum())
+                from_snapshot = forecast.load_snapshot_season(snapshot.open_snapshot(path), VALID_GENRES[0])
+                if list(from_snapshot.match_ids) != list(forecast.load_season(session, VALID_GENRES[0]).match_ids):
+                    raise SystemExit(f"{fmt} snapshot and database disagree")
+        engine.dispose()
+    console.print(table)
+
+
+def bench_replay(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), args.teams, args.matches, completed=1.0)
+        with Session(engine) as session:
+            started = time.perf_counter()
+            ratings, replayed, skipped = replay(session)
+            elapsed = time.perf_counter() - started
+        engine.dispose()
+    console.print(
+        f"Replayed {replayed:,} matches for {len(ratings):,} teams "
+        f"in {elapsed:.2f}s ({replayed / elapsed:,.0f} matches/sec)"
+    )
+
+
+def bench_fixtures(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), args.teams, 0, profile=args.profile)
+        with Session(engine) as session:
+            started = time.perf_counter()
+            summary = generate_fixtures(session, VALID_GENRES[0], "round-robin", legs=2)
+            session.commit()
+            elapsed = time.perf_counter() - started
+        engine.dispose()
+    console.print(
+        f"Round robin for {summary['teams']} teams: {summary['fixtures']:,} fixtures "
+        f"in {elapsed:.2f}s ({summary['fixtures'] / elapsed:,.0f} fixtures/sec)"
+    )
+
+
+def bench_swiss(args):
+    table = Table(title=f"Swiss rounds for {args.teams:,} teams", show_header=True, header_style="bold magenta")
+    table.add_column("Round", justify="right")
+    table.add_column("Pairing (load + pair + insert)", justify="right")
+    table.add_column("Rematches", justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), args.teams, 0, profile=args.profile)
+        with Session(engine) as session:
+            stats.rebuild_stats(session)
+            for round_number in range(1, args.rounds + 1):
+                started = time.perf_counter()
+                summary = schedule_round(session, VALID_GENRES[0])
+                elapsed = time.perf_counter() - started
+                table.add_row(str(round_number), f"{elapsed * 1000:.0f} ms", str(summary["rematches"]))
+                simulate_matches(session)
+                session.commit()
+        engine.dispose()
+
+    console.print(table)
+
+
+def current_rss():
+    # Resident set size right now on Linux; elsewhere the peak so far.
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def browse_legacy(url, teams, rounds, pages, page_size):
+    # The menu before session_scope: one session for the whole run and ORM
+    # entities on every read path.
+    engine = create_db_engine(url)
+    session = Session(engine)
+    cursor = None
+    samples = []
+    for _ in range(rounds):
+        session.scalars(select(Team)).all()
+        for team_id in range(1, min(teams, 20) + 1):
+            session.scalars(select(Player).where(Player.team_id == team_id)).all()
+        for _ in range(pages):
+            query = (
+                select(Match)
+                .options(joinedload(Match.team1), joinedload(Match.team2), joinedload(Match.winner))
+                .order_by(Match.date.desc(), Match.id.desc())
+            )
+            if cursor:
+                query = query.where(or_(Match.date < cursor[0], and_(Match.date == cursor[0], Match.id < cursor[1])))
+            matches = session.scalars(query.limit(page_size)).unique().all()
+            cursor = (matches[-1].date, matches[-1].id) if matches else None
+        samples.append(current_rss())
+    samples.append(len(session.identity_map))
+    session.close()
+    return samples
+
+
+def browse_scoped(url, teams, rounds, pages, page_size):
+    engine = create_db_engine(url)
+    factory = sessionmaker(engine, expire_on_commit=False)
+    cursor = None
+    samples = []
+    for _ in range(rounds):
+        with factory() as session:
+            list_teams(session)
+        for team_id in range(1, min(teams, 20) + 1):
+            with factory() as session:
+                session.execute(players_query(team_id)).all()
+        for _ in range(pages):
+            with factory() as session:
+                matches, cursor = match_history_page(session, page_size, after=cursor)
+        samples.append(current_rss())
+    samples.append(0)
+    return samples
+
+
+def bench_memory(args):
+    # A long read-heavy menu session: every round lists the teams, opens a
+    # few rosters and pages further back through match history. Each
+    # variant runs in a fresh process so their heaps don't mix.
+    page_size = 100
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = make_database(path, args.teams, args.matches, players_per_team=5, completed=0.9)
+        engine.dispose()
+        url = f"sqlite:///{path}"
+        pages = max(1, args.matches // (page_size * args.rounds))
+
+        results = {}
+        context = multiprocessing.get_context("spawn")
+        for label, func in (("global session + ORM", browse_legacy), ("session_scope + rows", browse_scoped)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                started = time.perf_counter()
+                results[label] = pool.submit(func, url, args.teams, args.rounds, pages, page_size).result()
+                results[label].append(time.perf_counter() - started)
+
+    table = Table(title=f"RSS while browsing {args.matches:,} matches over {args.rounds} rounds",
+                  show_header=True, header_style="bold magenta")
+    table.add_column("Round", justify="right")
+    for label in results:
+        table.add_column(f"{label} (MB)", justify="right")
+    for round_number in range(args.rounds):
+        table.add_row(str(round_number + 1), *(f"{samples[round_number] / 2 ** 20:,.1f}" for samples in results.values()))
+    table.add_row("identity map", *(f"{samples[-2]:,}" for samples in results.values()))
+    table.add_row("seconds", *(f"{samples[-1]:.1f}" for samples in results.values()))
+    console.print(table)
+
+
+# Hot queries and the index each one is expected to be planned with.
+PLAN_CHECKS = [
+    ("pending matches (simulate_matches)", pending_query, "ix_matches_pending"),
+    ("match history", match_history_query, "ix_matches_date_id"),
+    ("match history page after a cursor",
+     lambda: match_history_query(after=(date(2025, 6, 1), 100)).limit(21), "ix_matches_date_id"),
+    ("players of a team (list_players)", lambda: players_query(1), "ix_players_team_id_name"),
+    ("wins of a team (Team.wins)", lambda: select(Match).where(Match.winner_id == 1), "ix_matches_winner_id"),
+    ("matches of a team (stats refresh)",
+     lambda: select(Match.id).where(or_(Match.team1_id == 1, Match.team2_id == 1)), "ix_matches_team2_id"),
+    ("leaderboard on a date", lambda: leaderboard_at_query(date(2025, 6, 1)), "ix_rating_events_team_date"),
+    ("rating curve of a team", lambda: rating_curve_query(1), "ix_rating_events_team_date"),
+]
+
+
+def query_plan(conn, stmt):
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def bench_plans(args):
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_database(os.path.join(tmp, "bench.db"), args.teams, args.matches,
+                               players_per_team=5, completed=0.95)
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+            for label, make_query, index in PLAN_CHECKS:
+                plan = query_plan(conn, make_query())
+                ok = any(f"INDEX {index}" in step for step in plan)
+                failures += not ok
+                console.print(f"{'[green]✓' if ok else '[red]✗'} {label}: expects {index}[/]")
+                for step in plan:
+                    console.print(f"    {step}", markup=False, highlight=False)
+        engine.dispose()
+
+    if failures:
+        raise SystemExit(f"{failures} queries are not using their index")
+
+
+# Median wall time of a headless command, from process start to exit.
+STARTUP_BUDGET_MS = 1000
+STARTUP_COMMANDS = [
+    ["teams", "list", "--json"],
+    ["leaderboard", "--limit", "10"],
+]
+
+
+def import_times(stderr):
+    # `python -X importtime` lines: "import time: self | cumulative | name",
+    # nested modules indented under the import that pulled them in. The
+    # script's own imports (one level down) are the ones worth naming.
+    total = 0
+    levels = ([], [])
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        total += int(own)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth < len(levels):
+            levels[depth].append((int(cumulative), name.strip()))
+    return total / 1000, sorted(levels[1] or levels[0], reverse=True)
+
+
+def bench_startup(args):
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+    table = Table(title=f"Startup, median of {args.rounds}", show_header=True, header_style="bold magenta")
+    table.add_column("Command", style="green")
+    table.add_column("Wall ms", style="cyan", justify="right")
+    table.add_column("Import ms", justify="right")
+    table.add_column("Slowest imports")
+
+    over = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_db_engine(f"sqlite:///{path}", args.profile)
+        prepare_database(engine)
+        with Session(engine) as session:
+            seed_league(session, 50, 1000)
+            session.commit()
+        engine.dispose()
+
+        env = dict(os.environ, ESPORTS_DB_URL=f"sqlite:///{path}")
+        for command in [["-c", "pass"]] + [[cli] + command for command in STARTUP_COMMANDS]:
+            walls = []
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                run = subprocess.run([sys.executable, "-X", "importtime"] + command, env=env,
+                                     capture_output=True, text=True)
+                walls.append((time.perf_counter() - started) * 1000)
+                if run.returncode:
+                    raise SystemExit(run.stderr)
+            wall = sorted(walls)[len(walls) // 2]
+            imported, top = import_times(run.stderr)
+            label = "python -c pass" if command[0] == "-c" else "cli.py " + " ".join(command[1:])
+            table.add_row(label, f"{wall:,.0f}", f"{imported:,.0f}",
+                          ", ".join(f"{name} {cumulative / 1000:.0f}" for cumulative, name in top[:3]))
+            if command[0] != "-c" and wall > args.budget:
+                over.append(label)
+    console.print(table)
+
+    if over:
+        raise SystemExit(f"Over the {args.budget:g} ms startup budget: {', '.join(over)}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(reader, writer, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    status = (await reader.readline()).split()[1]
+    length = 0
+    hit = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "x-cache":
+            hit = value.strip() == "hit"
+    await reader.readexactly(length)
+    return status, hit
+
+
+async def api_client(port, paths, deadline, seed, latencies, hits):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            started = time.perf_counter()
+            status, hit = await fetch(reader, writer, path)
+            if status != b"200":
+                raise SystemExit(f"GET {path} returned {status.decode()}")
+            latencies.append(time.perf_counter() - started)
+            hits.append(hit)
+    finally:
+        writer.close()
+
+
+async def api_load(port, paths, connections, duration):
+    latencies, hits = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        api_client(port, paths, deadline, seed, latencies, hits) for seed in range(connections)
+    ))
+    return latencies, hits
+
+
+def bench_api(args):
+    # The server runs in its own process, as it would in production, so
+    # the client's event loop doesn't compete with it for the GIL.
+    paths = ["/leaderboard", "/leaderboard?limit=10", "/teams", "/matches",
+             "/matches?status=pending&page_size=50"]
+    for team_id in range(1, min(args.teams, 50) + 1):
+        paths += [f"/teams/{team_id}", f"/teams/{team_id}/players", f"/matches?team={team_id}"]
+
+    table = Table(title=f"API load test: {args.connections} connections for {args.duration}s",
+                  show_header=True, header_style="bold magenta")
+    table.add_column("Response cache", style="green")
+    table.add_column("Requests", justify="right")
+    table.add_column("Requests/sec", style="cyan", justify="right")
+    table.add_column("Hit rate", justify="right")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p99 ms", justify="right")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = make_database(path, args.teams, args.matches, players_per_team=5, completed=0.9)
+        with Session(engine) as session:
+            stats.rebuild_stats(session)
+            session.commit()
+        engine.dispose()
+
+        for label, cache_size in (("off", 0), ("on", 1024)):
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "api.py", "--url", f"sqlite:///{path}", "--port", str(port),
+                 "--cache-size", str(cache_size)],
+                cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, text=True
+            )
+            try:
+                if not server.stdout.readline():
+                    raise SystemExit("API server failed to start")
+                latencies, hits = asyncio.run(api_load(port, paths, args.connections, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
+
+            latencies.sort()
+            table.add_row(
+                label,
+                f"{len(latencies):,}",
+                f"{len(latencies) / args.duration:,.0f}",
+                f"{sum(hits) / len(hits):.0%}",
+                f"{latencies[len(latencies) // 2] * 1000:.1f}",
+                f"{latencies[int(len(latencies) * 0.99)] * 1000:.1f}",
+            )
+
+    console.print(table)
+
+
+BENCHMARKS = {
+    "api": bench_api,
+    "chunks": bench_chunks,
+    "memory": bench_memory,
+    "output": bench_output,
+    "elo": bench_elo,
+    "genres": bench_genres,
+    "leaderboard": bench_leaderboard,
+    "plans": bench_plans,
+    "players": bench_players,
+    "replay": bench_replay,
+    "snapshot": bench_snapshot,
+    "startup": bench_startup,
+    "suite": bench_suite,
+    "systems": bench_systems,
+    "fixtures": bench_fixtures,
+    "swiss": bench_swiss,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esports Tournament Manager benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--teams", type=int, default=500)
+    parser.add_argument("--matches", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--profile", choices=sorted(SQLITE_PROFILES), help="SQLite PRAGMA profile")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent API clients")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per API load test")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help="startup budget in ms")
+    parser.add_argument("--sizes", default=SUITE_SIZES, help="comma-separated match counts for the suite")
+    parser.add_argument("--baseline", default="bench-baseline.json", help="suite timings to compare against")
+    parser.add_argument("--save", action="store_true", help="write the suite timings to --baseline")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == '__main__':
+    main()
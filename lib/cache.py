@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from db.models import Base
+
+# In-process cache for read paths the menu repeats on every screen (the
+# team list, match history pages). Each table has a version number that is
+# bumped when a session that wrote to it commits; a cached result is reused
+# only while the versions of the tables it read are unchanged, so between
+# writes those screens don't touch SQLite at all. Cached values must be
+# plain rows, never ORM instances, which expire on every commit.
+#
+# Only writes made through a Session in this process are seen. Another
+# process writing to the same file (a headless command, an import) is not.
+
+CACHE_SIZE = 128
+
+table_versions = {}
+
+
+def referencing_tables(names):
+    # Deleting a row nulls or removes the rows that point at it.
+    return {
+        table.name for table in Base.metadata.sorted_tables
+        if any(fk.column.table.name in names for fk in table.foreign_keys)
+    }
+
+
+def written_tables(session):
+    return session.info.setdefault('written_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def record_flush(session, flush_context):
+    written = written_tables(session)
+    written.update(obj.__table__.name for obj in session.new)
+    written.update(obj.__table__.name for obj in session.dirty)
+    deleted = {obj.__table__.name for obj in session.deleted}
+    written.update(deleted, referencing_tables(deleted))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def record_statement(orm_execute_state):
+    # Bulk insert()/update()/delete() run through session.execute skip the
+    # flush, so they are picked up here.
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    name = orm_execute_state.statement.table.name
+    written = written_tables(orm_execute_state.session)
+    written.add(name)
+    if orm_execute_state.is_delete:
+        written.update(referencing_tables({name}))
+
+
+@event.listens_for(Session, 'after_commit')
+def bump_versions(session):
+    for name in session.info.pop('written_tables', ()):
+        table_versions[name] = table_versions.get(name, 0) + 1
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_writes(session):
+    session.info.pop('written_tables', None)
+
+
+class QueryCache:
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key, tables, load):
+        versions = tuple(table_versions.get(name, 0) for name in tables)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == versions:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = load()
+        self.entries[key] = (versions, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
+
+
+query_cache = QueryCache()
+
+
+def cached(*tables):
+    # For query functions taking (session, ...) with hashable arguments.
+    def decorate(func):
+        @wraps(func)
+        def wrapper(session, *args, **kwargs):
+            # Inside a transaction with its own uncommitted writes the cached
+            # (committed) result could be stale, so read through.
+            if session.new or session.dirty or session.deleted or written_tables(session) & set(tables):
+                return func(session, *args, **kwargs)
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return query_cache.lookup(key, tables, lambda: func(session, *args, **kwargs))
+        return wrapper
+    return decorate
@@ -1,9 +1,19 @@
+import sys
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+    # Headless commands dispatch before the interactive menu and its
+    # imports are loaded; scripted runs only pay for what they use.
+    from commands import main
+    sys.exit(main(sys.argv[1:]))
+
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt
 from rich.text import Text
 from rich import box
-from db.models import session
+from cache import query_cache
+from db.models import engine
+import instrument
 from helpers import (
     initialize_database, simulate_matches, create_team, 
     add_player, schedule_match, show_leaderboard, 
@@ -12,7 +22,25 @@ from helpers import (
 )
 
 def main_menu():
-    initialize_database()
+    profiler = instrument.from_environment(engine)
+    try:
+        run_menu(profiler)
+    finally:
+        if profiler is not None:
+            profiler.export()
+
+
+def run_action(profiler, action):
+    if profiler is None:
+        action()
+        return
+    with profiler.action(action.__name__) as profile:
+        action()
+    console.print(profiler.panel(profile))
+
+
+def run_menu(profiler):
+    run_action(profiler, initialize_database)
     while True:
         console.print(Panel.fit(
             Text("\n🎮 Esports Tournament Manager\n", style="bold blue") +
@@ -44,7 +72,11 @@ def main_menu():
                 border_style="green",
                 box=box.SQUARE
             ))
-            session.close()
+            cache_stats = query_cache.stats()
+            console.print(
+                f"[dim]Query cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['evictions']} evictions[/dim]"
+            )
             break
         if choice == '?':
             show_help()
@@ -66,7 +98,7 @@ def main_menu():
             '14': show_leaderboard
         }
         console.print(f"\n[yellow]>> Option {choice} selected...[/yellow]")
-        actions[choice]()
+        run_action(profiler, actions[choice])
 
 def show_help():
     console.print(Panel.fit(
@@ -91,7 +123,5 @@ if __name__ == '__main__':
         main_menu()
     except KeyboardInterrupt:
         console.print("\n[red]Program interrupted. Exiting gracefully...[/red]")
-        session.close()
     except Exception as e:
         console.print(f"[red]An error occurred: {str(e)}[/red]")
-        session.close()
@@ -0,0 +1,630 @@
+import argparse
+import json
+import shlex
+import sys
+from rich.console import Console
+from db.models import engine, prepare_database, Session
+import operations
+import stats
+
+console = Console()
+err_console = Console(stderr=True)
+
+SUMMARY_SIZE = 5
+
+
+# Subsystems are imported by the handlers that use them, so a command only
+# pays for its own. The parser therefore takes no choices or defaults from
+# them: each subsystem validates its own arguments, and given() fills in
+# its defaults.
+
+
+def given(value, default):
+    return default if value is None else value
+
+
+class CommandError(Exception):
+    pass
+
+
+class CommandParser(argparse.ArgumentParser):
+    # argparse exits the process on bad input; in batch mode one bad line
+    # must abort the batch instead, so surface it as an exception.
+    def error(self, message):
+        raise CommandError(message)
+
+
+def team_dict(team):
+    return {"id": team.id, "name": team.name, "genre": team.genre, "rankings": team.rankings}
+
+
+def player_dict(player):
+    return {"id": player.id, "name": player.name, "role": player.role, "team_id": player.team_id}
+
+
+def match_dict(match):
+    return {
+        "id": match.id,
+        "team1_id": match.team1_id,
+        "team2_id": match.team2_id,
+        "date": match.date.isoformat() if match.date else None,
+        "winner_id": match.winner_id,
+    }
+
+
+def teams_create(session, args):
+    team = operations.create_team(session, args.name, args.genre)
+    return f"Added team {team.name} ({team.genre}) (ID: {team.id})", team_dict(team)
+
+
+def teams_list(session, args):
+    teams = operations.list_teams(session)
+    return "\n".join(f"{t.id}\t{t.name}\t{t.genre}\t{t.rankings or 'N/A'}" for t in teams), [team_dict(t) for t in teams]
+
+
+def teams_update(session, args):
+    team = operations.update_team(session, args.id, args.name, args.genre)
+    return f"Team updated: {team.name} ({team.genre})", team_dict(team)
+
+
+def teams_delete(session, args):
+    team = operations.delete_team(session, args.id)
+    return f"Team {team.id} deleted", {"deleted": team.id}
+
+
+def players_add(session, args):
+    player = operations.add_player(session, args.team_id, args.name, args.role)
+    return f"Added player {player.name} as {player.role} (ID: {player.id})", player_dict(player)
+
+
+def players_list(session, args):
+    team, players = operations.list_players(session, args.team_id)
+    return "\n".join(f"{p.id}\t{p.name}\t{p.role}" for p in players), [player_dict(p) for p in players]
+
+
+def players_update(session, args):
+    player = operations.update_player(session, args.id, args.name, args.role)
+    return f"Player updated: {player.name} ({player.role})", player_dict(player)
+
+
+def players_delete(session, args):
+    player = operations.delete_player(session, args.id)
+    return f"Player {player.id} deleted", {"deleted": player.id}
+
+
+def players_leaderboard(session, args):
+    rows = operations.player_leaderboard(session, args.limit, args.sort, args.genre, args.role, args.min_matches)
+    return "\n".join(
+        f"{idx}\t{row['name']}\t{row['role']}\t{row['team']}\t{row['matches']} played\t"
+        f"{row['kills']}/{row['deaths']}/{row['assists']}\tK/D {row['kd']:.2f}\t{row['mvps']} MVP"
+        for idx, row in enumerate(rows, 1)
+    ) or "No player stats recorded", rows
+
+
+def players_summary(session, args):
+    rows = operations.player_summary(session, args.by, args.genre)
+    return "\n".join(
+        f"{row[args.by]}\t{row['players']} players\t{row['lines']} lines\t"
+        f"{row['kills_per_match']:.2f} kills/match\tK/D {row['kd']:.2f}\t{row['mvps']} MVP"
+        for row in rows
+    ) or "No player stats recorded", rows
+
+
+def matches_schedule(session, args):
+    match, team1, team2 = operations.schedule_match(session, args.team1_id, args.team2_id, args.date)
+    return f"Match scheduled: {team1.name} vs {team2.name} (ID: {match.id})", match_dict(match)
+
+
+def matches_simulate(session, args):
+    if args.chunk_size:
+        run = operations.start_simulation(session, args.chunk_size, args.seed, args.workers, args.system)
+        return chunked_simulation(session, run, args, "w")
+    batch = operations.simulate_matches(session, args.seed, args.workers, args.system)
+    if args.json and not args.output:
+        # The one case that asks for every result on stdout.
+        return None, list(batch.results())
+    import progress  # only summarised runs need the output helpers
+
+    summary = progress.ResultSummary(args.top)
+    if args.output:
+        with open(args.output, "w") as stream:
+            progress.feed(batch, [summary.add, progress.jsonl_writer(stream)])
+        lines = [f"Simulated {len(batch)} matches, results written to {args.output}"]
+    else:
+        progress.feed(batch, [summary.add])
+        lines = [f"Simulated {len(batch)} matches"]
+    return "\n".join(lines + summary.lines()), summary.as_dict()
+
+
+def matches_resume(session, args):
+    if args.abandon:
+        run = operations.abandon_simulation(session)
+        return f"Abandoned simulation run {run.id} after {run.processed} of {run.total} matches", run_dict(run)
+    run = operations.resume_simulation(session)
+    if run.last_match_id:
+        err_console.print(
+            f"Resuming run {run.id} after match {run.last_match_id} ({run.last_date}), "
+            f"{run.processed} of {run.total} done"
+        )
+    # A resumed run carries on writing to the end of its results file.
+    return chunked_simulation(session, run, args, "a")
+
+
+def chunked_simulation(session, run, args, mode):
+    # Commits as it goes, which would break a batch file's single transaction.
+    if session.info.get("batch"):
+        raise CommandError("chunked simulation commits after every chunk and can't run in a batch file")
+    import progress  # only chunked runs need the progress display
+
+    summary = progress.ResultSummary(args.top)
+    window = progress.ResultWindow(args.window) if args.window else None
+    stream = open(args.output, mode) if args.output else None
+    sinks = [summary.add] + ([progress.jsonl_writer(stream)] if stream else [])
+    try:
+        simulated, elapsed = progress.run_simulation(session, run, err_console, sinks, window)
+    finally:
+        if stream:
+            stream.close()
+    lines = [
+        f"Simulated {simulated} matches in {elapsed:.1f}s ({simulated / elapsed if elapsed else 0:,.0f}/s), "
+        f"run {run.id} {run.status}: {run.processed} of {run.total}"
+    ]
+    if args.output:
+        lines.append(f"Results written to {args.output}")
+    return "\n".join(lines + summary.lines()), dict(run_dict(run), summary=summary.as_dict())
+
+
+def run_dict(run):
+    return {
+        "id": run.id,
+        "status": run.status,
+        "seed": run.seed,
+        "chunk_size": run.chunk_size,
+        "rating_system": run.rating_system,
+        "processed": run.processed,
+        "total": run.total,
+        "last_match_id": run.last_match_id,
+        "last_date": run.last_date.isoformat() if run.last_date else None,
+    }
+
+
+def matches_replay(session, args):
+    report = operations.verify_ratings(session, args.fix, args.system)
+    lines = [f"Replayed {report['replayed']} matches for {report['teams']} teams with {report['system']}"]
+    if report["skipped"]:
+        lines.append(f"Skipped {report['skipped']} matches involving deleted teams")
+    for m in report["mismatches"]:
+        lines.append(f"{m['id']}\t{m['name']}\tstored {m['stored']}\treplayed {m['replayed']}")
+    if not report["mismatches"]:
+        lines.append("All stored ratings match")
+    elif report["fixed"]:
+        lines.append(f"Fixed {len(report['mismatches'])} ratings")
+    return "\n".join(lines), report
+
+
+def matches_history(session, args):
+    filters = {
+        "team_id": args.team,
+        "genre": args.genre,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "status": args.status,
+    }
+    if args.page_size:
+        matches, cursor = operations.match_history_page(
+            session, args.page_size, after=operations.parse_cursor(args.after), **filters
+        )
+        next_cursor = operations.format_cursor(cursor)
+        text = matches_text(matches)
+        if next_cursor:
+            text += f"\nNext page: --after {next_cursor}"
+        return text, {"matches": [match_dict(m) for m in matches], "next": next_cursor}
+
+    # Without a page size, stream the full history (one JSON object per
+    # line with --json) instead of loading it into memory.
+    for match in operations.iter_match_history(session, **filters):
+        if args.json:
+            print(json.dumps(match_dict(match)))
+        else:
+            console.print(matches_text([match]), markup=False, highlight=False)
+    return None, None
+
+
+def matches_text(matches):
+    return "\n".join(
+        f"{m.id}\t{m.team1} vs {m.team2}\t"
+        f"{m.date or 'TBD'}\t{m.winner or 'Pending'}"
+        for m in matches
+    )
+
+
+def matches_generate(session, args):
+    import tournaments
+    summary = tournaments.generate_fixtures(
+        session, args.genre, args.format, args.start,
+        args.days_between_rounds, args.max_per_day, args.legs
+    )
+    text = (
+        f"Scheduled {summary['fixtures']} {summary['format']} fixtures for {summary['teams']} "
+        f"{summary['genre']} teams over {summary['rounds']} rounds "
+        f"({summary['first_date']} to {summary['last_date']})"
+    )
+    if summary["byes"]:
+        text += f"\nByes: {', '.join(str(team_id) for team_id in summary['byes'])}"
+    return text, summary
+
+
+def matches_advance(session, args):
+    import tournaments
+    summary = tournaments.advance_bracket(session, args.genre, args.date, args.days_between_rounds, args.max_per_day)
+    if summary["champion"] is not None:
+        return f"{summary['genre']} bracket {summary['bracket']} won by team {summary['champion']}", summary
+    text = (
+        f"Scheduled {summary['fixtures']} {summary['genre']} matches for round {summary['round']} "
+        f"of bracket {summary['bracket']} ({summary['first_date']} to {summary['last_date']})"
+    )
+    if summary["grand_final"]:
+        text += "\nGrand final"
+    if summary["byes"]:
+        text += f"\nByes: {', '.join(str(team_id) for team_id in summary['byes'])}"
+    return text, summary
+
+
+def matches_swiss(session, args):
+    import swiss
+    summary = swiss.schedule_round(session, args.genre, args.date, args.allow_pending)
+    text = (
+        f"Paired {summary['fixtures']} {summary['genre']} Swiss matches (round {summary['round']}) "
+        f"on {summary['date']}"
+    )
+    if summary["bye"]:
+        text += f", bye: {summary['bye']}"
+    if summary["rematches"]:
+        text += f", {summary['rematches']} unavoidable rematches"
+    return text, summary
+
+
+def matches_update(session, args):
+    match = operations.update_match(session, args.id, args.date)
+    return f"Match date updated to {match.date}", match_dict(match)
+
+
+def matches_delete(session, args):
+    match = operations.delete_match(session, args.id)
+    return f"Match {match.id} deleted", {"deleted": match.id}
+
+
+def leaderboard(session, args):
+    if args.date:
+        rows = operations.leaderboard_at(session, args.date, args.limit)
+        return "\n".join(
+            f"{idx}\t{row['name']}\t{row['game']}\t{row['rating']}\t{row['played']} played"
+            for idx, row in enumerate(rows, 1)
+        ), rows
+    if args.by_genre:
+        boards = operations.leaderboard_by_genre(session, args.limit)
+        return "\n\n".join(
+            f"{genre}\n" + leaderboard_text(rows) for genre, rows in boards.items()
+        ), boards
+    rows = operations.leaderboard(session, args.limit, args.genre, args.source)
+    return leaderboard_text(rows), rows
+
+
+def leaderboard_text(rows):
+    return "\n".join(
+        f"{idx}\t{row['name']}\t{row['game']}\t{row['rating']}\t{row['wins']}-{row['losses']}\t{row['form']}"
+        for idx, row in enumerate(rows, 1)
+    )
+
+
+def teams_ratings(session, args):
+    team, events = operations.rating_curve(session, args.id)
+    rows = [
+        {"date": event.date.isoformat(), "match_id": event.match_id,
+         "before": event.before, "after": event.after, "delta": event.delta}
+        for event in events
+    ]
+    text = "\n".join(
+        f"{row['date']}\tmatch {row['match_id']}\t{row['before']} -> {row['after']}\t{row['delta']:+}"
+        for row in rows
+    )
+    return text or f"No rating changes recorded for {team.name}", {"team_id": team.id, "events": rows}
+
+
+def import_data(session, args):
+    import importer
+    report = importer.import_file(
+        session, args.kind, args.file, args.format, given(args.batch_size, importer.DEFAULT_BATCH_SIZE),
+        args.rejects
+    )
+    text = (
+        f"Imported {report.inserted} {report.kind} in {report.elapsed:.2f}s "
+        f"({report.rows_per_sec:,.0f} rows/sec), {report.rejected_count} rejected"
+    )
+    for rejected in report.rejected:
+        text += f"\n  line {rejected['line']}: {rejected['reason']}"
+    return text, report.as_dict()
+
+
+def forecast_season(session, args):
+    import forecast
+    simulations = given(args.simulations, forecast.DEFAULT_SIMULATIONS)
+    top = given(args.top, forecast.DEFAULT_TOP)
+    if args.snapshot:
+        import snapshot
+        batch = forecast.load_snapshot_season(snapshot.open_snapshot(args.snapshot), args.genre)
+        rows = forecast.run_forecast(batch, simulations, top, args.workers, args.seed)
+        pending = len(batch)
+    else:
+        pending, rows = forecast.forecast(session, args.genre, simulations, top, args.workers, args.seed)
+    rows = rows[:args.limit] if args.limit else rows
+    text = f"{simulations:,} simulated {args.genre} seasons of {pending} pending matches\n"
+    text += "\n".join(
+        f"{row['name']}\t{row['rating']}\t{row['expected_rating']:.0f}\t"
+        f"P(1st) {row['first']:.1%}\tP(top {top}) {row['top']:.1%}"
+        for row in rows
+    )
+    return text, {"genre": args.genre, "pending": pending, "simulations": simulations, "top": top, "teams": rows}
+
+
+def export_snapshot(session, args):
+    # Read on a connection of its own, in one read transaction.
+    import snapshot
+    summary = snapshot.export_snapshot(
+        session.get_bind(), args.path, args.format, args.table, given(args.chunk_size, snapshot.DEFAULT_CHUNK_SIZE)
+    )
+    text = (
+        f"Wrote {summary['format']} snapshot to {summary['path']} in {summary['seconds']:.2f}s "
+        f"({summary['bytes'] / 1024 / 1024:,.1f} MiB)\n"
+    )
+    text += "\n".join(f"  {name}\t{rows:,} rows" for name, rows in summary["tables"].items())
+    return text, summary
+
+
+def stats_rebuild(session, args):
+    count = operations.rebuild_stats(session)
+    return f"Rebuilt leaderboard stats for {count} teams", {"teams": count}
+
+
+def seed_league(session, args):
+    from db import seed
+    summary = seed.seed_league(
+        session,
+        given(args.teams, seed.DEFAULT_TEAMS),
+        given(args.matches, seed.DEFAULT_MATCHES),
+        given(args.players, seed.DEFAULT_PLAYERS),
+        given(args.pending, seed.DEFAULT_PENDING),
+        args.genres, args.seed, system=args.system, player_stats=args.player_stats,
+    )
+    text = (
+        f"Seeded {summary['teams']} teams in {summary['genres']} genres, {summary['players']} players, "
+        f"{summary['played']} played and {summary['pending']} pending matches"
+        + (f", {summary['stat_lines']} player stat lines" if args.player_stats else "")
+        + f" in {summary['seconds']:.2f}s"
+    )
+    return text, summary
+
+
+def rating_system(sub):
+    sub.add_argument("--system", help="elo, glicko2 or trueskill (default: $ESPORTS_RATING_SYSTEM or elo)")
+
+
+def simulation_output(sub):
+    sub.add_argument("--output", metavar="FILE", help="write every result to FILE as JSON lines")
+    sub.add_argument("--top", type=int, default=SUMMARY_SIZE, help="movers and upsets to list in the summary")
+    sub.add_argument("--window", type=int, default=0,
+                     help="chunked runs: show the latest N results live on stderr")
+
+
+def build_parser():
+    parser = CommandParser(prog="cli.py", description="Esports Tournament Manager (headless mode)")
+    groups = parser.add_subparsers(dest="group", required=True)
+
+    def command(subparsers, name, handler):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--json", action="store_true", help="print the result as JSON")
+        sub.set_defaults(handler=handler)
+        return sub
+
+    teams = groups.add_parser("teams").add_subparsers(dest="command", required=True)
+    sub = command(teams, "create", teams_create)
+    sub.add_argument("name")
+    sub.add_argument("genre", choices=operations.VALID_GENRES)
+    command(teams, "list", teams_list)
+    sub = command(teams, "update", teams_update)
+    sub.add_argument("id", type=int)
+    sub.add_argument("--name")
+    sub.add_argument("--genre")
+    sub = command(teams, "delete", teams_delete)
+    sub.add_argument("id", type=int)
+    sub = command(teams, "ratings", teams_ratings)
+    sub.add_argument("id", type=int)
+
+    players = groups.add_parser("players").add_subparsers(dest="command", required=True)
+    sub = command(players, "add", players_add)
+    sub.add_argument("team_id", type=int)
+    sub.add_argument("name")
+    sub.add_argument("role")
+    sub = command(players, "list", players_list)
+    sub.add_argument("team_id", type=int)
+    sub = command(players, "update", players_update)
+    sub.add_argument("id", type=int)
+    sub.add_argument("--name")
+    sub.add_argument("--role")
+    sub = command(players, "delete", players_delete)
+    sub.add_argument("id", type=int)
+    sub = command(players, "leaderboard", players_leaderboard)
+    sub.add_argument("--sort", choices=operations.PLAYER_SORTS, default="kd")
+    sub.add_argument("--role", help="only players in this role")
+    sub.add_argument("--genre", choices=operations.VALID_GENRES, help="only stat lines recorded for this genre")
+    sub.add_argument("--min-matches", type=int, default=1, help="leave out players with fewer stat lines")
+    sub.add_argument("--limit", type=int, default=operations.PLAYER_LEADERBOARD_SIZE)
+    sub = command(players, "summary", players_summary)
+    sub.add_argument("--by", choices=operations.PLAYER_GROUPS, default="role")
+    sub.add_argument("--genre", choices=operations.VALID_GENRES, help="only stat lines recorded for this genre")
+
+    matches = groups.add_parser("matches").add_subparsers(dest="command", required=True)
+    sub = command(matches, "schedule", matches_schedule)
+    sub.add_argument("team1_id", type=int)
+    sub.add_argument("team2_id", type=int)
+    sub.add_argument("--date", help="YYYY-MM-DD")
+    sub = command(matches, "simulate", matches_simulate)
+    rating_system(sub)
+    sub.add_argument("--seed", type=int, help="reproducible results: each match draws from its own seeded stream")
+    sub.add_argument("--workers", type=int, help="processes for simulating genres in parallel (default: CPU count)")
+    sub.add_argument("--chunk-size", type=int,
+                     help="commit every N matches and keep a checkpoint, so an interrupted run can be resumed")
+    simulation_output(sub)
+    sub = command(matches, "resume", matches_resume)
+    sub.add_argument("--abandon", action="store_true", help="give up on the interrupted run instead")
+    simulation_output(sub)
+    sub = command(matches, "replay", matches_replay)
+    sub.add_argument("--fix", action="store_true", help="overwrite stored ratings with the replayed ones")
+    rating_system(sub)
+    sub = command(matches, "swiss", matches_swiss)
+    sub.add_argument("genre", choices=operations.VALID_GENRES)
+    sub.add_argument("--date", help="YYYY-MM-DD (default today)")
+    sub.add_argument("--allow-pending", action="store_true", help="pair even if the previous round is unfinished")
+    sub = command(matches, "advance", matches_advance)
+    sub.add_argument("genre", choices=operations.VALID_GENRES)
+    sub.add_argument("--date", help="first match day of the round, YYYY-MM-DD (default today)")
+    sub.add_argument("--days-between-rounds", type=int, default=1)
+    sub.add_argument("--max-per-day", type=int, help="spread a large round over several days")
+    sub = command(matches, "generate", matches_generate)
+    sub.add_argument("genre", choices=operations.VALID_GENRES)
+    sub.add_argument("--format", default="round-robin",
+                     help="round-robin, single-elimination, double-elimination or swiss")
+    sub.add_argument("--start", help="first match day, YYYY-MM-DD (default today)")
+    sub.add_argument("--days-between-rounds", type=int, default=1)
+    sub.add_argument("--max-per-day", type=int, help="spread large rounds over several days")
+    sub.add_argument("--legs", type=int, default=1, help="round-robin only: 2 for home and away")
+    sub = command(matches, "history", matches_history)
+    sub.add_argument("--team", type=int, help="only matches involving this team ID")
+    sub.add_argument("--genre", choices=operations.VALID_GENRES)
+    sub.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    sub.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+    sub.add_argument("--status", choices=operations.MATCH_STATUSES)
+    sub.add_argument("--page-size", type=int, help="return one page and a cursor for the next")
+    sub.add_argument("--after", help="cursor printed by the previous page")
+    sub = command(matches, "update", matches_update)
+    sub.add_argument("id", type=int)
+    sub.add_argument("--date", required=True, help="YYYY-MM-DD")
+    sub = command(matches, "delete", matches_delete)
+    sub.add_argument("id", type=int)
+
+    sub = command(groups, "leaderboard", leaderboard)
+    sub.add_argument("--date", help="leaderboard as it stood at the end of this day, YYYY-MM-DD")
+    sub.add_argument("--limit", type=int, help="only the top N teams (per genre with --by-genre)")
+    sub.add_argument("--genre", choices=operations.VALID_GENRES, help="only teams of this genre")
+    sub.add_argument("--by-genre", action="store_true", help="a separate ranking for each genre")
+    sub.add_argument("--source", choices=sorted(operations.LEADERBOARD_SOURCES), default="stats",
+                     help="read team_stats, or compute the standings from match history")
+
+    sub = command(groups, "forecast", forecast_season)
+    sub.add_argument("genre", choices=operations.VALID_GENRES)
+    sub.add_argument("--simulations", type=int, help="seasons to simulate")
+    sub.add_argument("--top", type=int, help="report P(finishing in the top k)")
+    sub.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    sub.add_argument("--seed", type=int, help="make the forecast reproducible")
+    sub.add_argument("--limit", type=int, default=20, help="teams to show, 0 for all")
+    sub.add_argument("--snapshot", metavar="PATH", help="read the season from a snapshot instead of the database")
+
+    stats_group = groups.add_parser("stats").add_subparsers(dest="command", required=True)
+    command(stats_group, "rebuild", stats_rebuild)
+
+    sub = command(groups, "import", import_data)
+    sub.add_argument("kind", help="teams, players, fixtures or player-stats")
+    sub.add_argument("file", help="CSV or JSONL file")
+    sub.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    sub.add_argument("--batch-size", type=int, help="rows per insert")
+    sub.add_argument("--rejects", help="write rejected rows to this JSONL file")
+
+    sub = command(groups, "export", export_snapshot)
+    sub.add_argument("path", help="snapshot directory to create")
+    sub.add_argument("--format", help="parquet or binary (default: parquet when pyarrow is installed)")
+    sub.add_argument("--table", action="append", help="export only this table; repeat for more (default: all)")
+    sub.add_argument("--chunk-size", type=int, help="rows read per chunk")
+
+    sub = command(groups, "seed", seed_league)
+    rating_system(sub)
+    sub.add_argument("--teams", type=int)
+    sub.add_argument("--matches", type=int)
+    sub.add_argument("--players", type=int, help="players per team")
+    sub.add_argument("--pending", type=float, help="share of matches left unplayed")
+    sub.add_argument("--genres", type=int, help="spread teams over the first N genres (default: all)")
+    sub.add_argument("--seed", type=int, default=0, help="random seed; the same seed gives the same league")
+    sub.add_argument("--player-stats", action="store_true", help="also record a stat line per player per played match")
+
+    sub = groups.add_parser("batch", help="run a newline-delimited command file in one transaction")
+    sub.add_argument("file", help="command file, or - for stdin")
+    sub.add_argument("--quiet", action="store_true", help="only print a summary")
+
+    return parser
+
+
+def emit(args, text, data):
+    if args.json and data is not None:
+        print(json.dumps(data, default=str))
+    elif text:
+        console.print(text, markup=False, highlight=False)
+
+
+def run_batch(parser, session, path, quiet=False):
+    stream = sys.stdin if path == "-" else open(path)
+    count = 0
+    session.info["batch"] = True
+    try:
+        for lineno, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+                if args.group == "batch":
+                    raise CommandError("batch files cannot be nested")
+                text, data = args.handler(session, args)
+            except (CommandError, ValueError) as e:
+                raise CommandError(f"line {lineno}: {e}")
+            if not quiet:
+                emit(args, text, data)
+            count += 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return count
+
+
+def main(argv):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandError as e:
+        parser.print_usage(sys.stderr)
+        err_console.print(f"[red]✗ {e}[/red]")
+        return 2
+
+    warning = prepare_database(engine)
+    if warning:
+        err_console.print(f"[yellow]⚠ {warning}[/yellow]")
+    session = Session()
+    try:
+        stats.ensure_stats(session)
+        if args.group == "batch":
+            count = run_batch(parser, session, args.file, args.quiet)
+            session.commit()
+            console.print(f"[green]✓ Batch committed: {count} commands[/green]")
+        else:
+            text, data = args.handler(session, args)
+            session.commit()
+            emit(args, text, data)
+        return 0
+    except (CommandError, ValueError) as e:
+        session.rollback()
+        err_console.print(f"[red]✗ {e}[/red]")
+        return 1
+    except Exception as e:
+        session.rollback()
+        err_console.print(f"[red]✗ Error: {str(e)}[/red]")
+        return 1
+    finally:
+        session.close()
@@ -0,0 +1,58 @@
+"""Team stats leaderboard
+
+Revision ID: 24f4a268dbbf
+Revises: bc112e758713
+Create Date: 2026-10-18 09:30:12.418023
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '24f4a268dbbf'
+down_revision: Union[str, None] = 'bc112e758713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    team_stats = op.create_table('team_stats',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('losses', sa.Integer(), nullable=False),
+    sa.Column('form', sa.String(), nullable=False),
+    sa.Column('rating', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id')
+    )
+    op.create_index('ix_team_stats_rating', 'team_stats', ['rating'], unique=False)
+
+    # Backfill from existing results, most recent match first.
+    conn = op.get_bind()
+    totals = {
+        team_id: {'team_id': team_id, 'wins': 0, 'losses': 0, 'form': '', 'rating': rankings or 1000}
+        for team_id, rankings in conn.execute(sa.text('SELECT id, rankings FROM teams'))
+    }
+    completed = conn.execute(sa.text(
+        'SELECT team1_id, team2_id, winner_id FROM matches '
+        'WHERE winner_id IS NOT NULL ORDER BY date DESC, id DESC'
+    ))
+    for team1_id, team2_id, winner_id in completed:
+        for team_id in (team1_id, team2_id):
+            row = totals.get(team_id)
+            if row is None:
+                continue
+            result = 'W' if winner_id == team_id else 'L'
+            row['wins' if result == 'W' else 'losses'] += 1
+            if len(row['form']) < 5:
+                row['form'] += result
+    if totals:
+        op.bulk_insert(team_stats, list(totals.values()))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_team_stats_rating', table_name='team_stats')
+    op.drop_table('team_stats')
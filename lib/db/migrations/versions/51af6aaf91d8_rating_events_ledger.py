@@ -0,0 +1,43 @@
+"""Rating events ledger
+
+Revision ID: 51af6aaf91d8
+Revises: 9a64b50168dd
+Create Date: 2026-10-18 11:12:40.331706
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '51af6aaf91d8'
+down_revision: Union[str, None] = '9a64b50168dd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Starts empty: matches simulated before this revision have no recorded
+    # rating changes.
+    op.create_table('rating_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=False),
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('before', sa.Integer(), nullable=False),
+    sa.Column('after', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['match_id'], ['matches.id'], ),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rating_events_team_date', 'rating_events', ['team_id', 'date', 'id'], unique=False)
+    op.create_index('ix_rating_events_match_id', 'rating_events', ['match_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_rating_events_match_id', table_name='rating_events')
+    op.drop_index('ix_rating_events_team_date', table_name='rating_events')
+    op.drop_table('rating_events')
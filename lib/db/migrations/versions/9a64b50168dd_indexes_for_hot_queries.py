@@ -0,0 +1,38 @@
+"""Indexes for hot queries
+
+Revision ID: 9a64b50168dd
+Revises: 24f4a268dbbf
+Create Date: 2026-10-18 10:02:47.905112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a64b50168dd'
+down_revision: Union[str, None] = '24f4a268dbbf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_matches_date_id', 'matches', ['date', 'id'], unique=False)
+    op.create_index('ix_matches_team1_id', 'matches', ['team1_id'], unique=False)
+    op.create_index('ix_matches_team2_id', 'matches', ['team2_id'], unique=False)
+    op.create_index('ix_matches_winner_id', 'matches', ['winner_id'], unique=False,
+                    sqlite_where=sa.text('winner_id IS NOT NULL'))
+    op.create_index('ix_matches_pending', 'matches', ['date', 'id'], unique=False,
+                    sqlite_where=sa.text('winner_id IS NULL'))
+    op.create_index('ix_players_team_id_name', 'players', ['team_id', 'name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_players_team_id_name', table_name='players')
+    op.drop_index('ix_matches_pending', table_name='matches')
+    op.drop_index('ix_matches_winner_id', table_name='matches')
+    op.drop_index('ix_matches_team2_id', table_name='matches')
+    op.drop_index('ix_matches_team1_id', table_name='matches')
+    op.drop_index('ix_matches_date_id', table_name='matches')
@@ -0,0 +1,45 @@
+"""Brackets
+
+Revision ID: a7d3e5c9f012
+Revises: f4c81d2e6b93
+Create Date: 2026-10-18 21:48:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e5c9f012'
+down_revision: Union[str, None] = 'f4c81d2e6b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('brackets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('champion_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['champion_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('bracket_slots',
+    sa.Column('bracket_id', sa.Integer(), nullable=False),
+    sa.Column('round', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=True),
+    sa.Column('team_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['bracket_id'], ['brackets.id'], ),
+    sa.ForeignKeyConstraint(['match_id'], ['matches.id'], ),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('bracket_id', 'round', 'position')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('bracket_slots')
+    op.drop_table('brackets')
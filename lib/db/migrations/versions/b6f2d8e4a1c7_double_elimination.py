@@ -0,0 +1,34 @@
+"""Double elimination
+
+Revision ID: b6f2d8e4a1c7
+Revises: a7d3e5c9f012
+Create Date: 2026-10-18 23:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6f2d8e4a1c7'
+down_revision: Union[str, None] = 'a7d3e5c9f012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Brackets opened before this revision are single elimination, and all
+    # of their slots are in the winners bracket.
+    with op.batch_alter_table('brackets') as batch_op:
+        batch_op.add_column(sa.Column('format', sa.String(), nullable=False, server_default='single-elimination'))
+    with op.batch_alter_table('bracket_slots') as batch_op:
+        batch_op.add_column(sa.Column('side', sa.String(), nullable=False, server_default='W'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('bracket_slots') as batch_op:
+        batch_op.drop_column('side')
+    with op.batch_alter_table('brackets') as batch_op:
+        batch_op.drop_column('format')
@@ -0,0 +1,40 @@
+"""Simulation run checkpoints
+
+Revision ID: c3e1f7a2b9d4
+Revises: 51af6aaf91d8
+Create Date: 2026-10-18 14:05:12.418530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e1f7a2b9d4'
+down_revision: Union[str, None] = '51af6aaf91d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('simulation_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('seed', sa.Integer(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('workers', sa.Integer(), nullable=True),
+    sa.Column('cutoff_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('processed', sa.Integer(), nullable=False),
+    sa.Column('last_match_id', sa.Integer(), nullable=True),
+    sa.Column('last_date', sa.Date(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('simulation_runs')
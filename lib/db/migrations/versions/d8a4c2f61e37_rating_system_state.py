@@ -0,0 +1,34 @@
+"""Rating system state
+
+Revision ID: d8a4c2f61e37
+Revises: c3e1f7a2b9d4
+Create Date: 2026-10-18 16:42:37.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a4c2f61e37'
+down_revision: Union[str, None] = 'c3e1f7a2b9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('teams') as batch_op:
+        batch_op.add_column(sa.Column('rating_deviation', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('rating_volatility', sa.Float(), nullable=True))
+    with op.batch_alter_table('simulation_runs') as batch_op:
+        batch_op.add_column(sa.Column('rating_system', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('simulation_runs') as batch_op:
+        batch_op.drop_column('rating_system')
+    with op.batch_alter_table('teams') as batch_op:
+        batch_op.drop_column('rating_volatility')
+        batch_op.drop_column('rating_deviation')
@@ -0,0 +1,41 @@
+"""Player match stats
+
+Revision ID: e2b7c9d45a10
+Revises: d8a4c2f61e37
+Create Date: 2026-10-18 19:20:48.316702
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c9d45a10'
+down_revision: Union[str, None] = 'd8a4c2f61e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('player_match_stats',
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=False),
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('kills', sa.Integer(), nullable=False),
+    sa.Column('deaths', sa.Integer(), nullable=False),
+    sa.Column('assists', sa.Integer(), nullable=False),
+    sa.Column('mvp', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['match_id'], ['matches.id'], ),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('player_id', 'match_id'),
+    sqlite_with_rowid=False
+    )
+    op.create_index('ix_player_match_stats_match_id', 'player_match_stats', ['match_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_player_match_stats_match_id', table_name='player_match_stats')
+    op.drop_table('player_match_stats')
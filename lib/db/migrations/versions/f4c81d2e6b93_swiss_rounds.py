@@ -0,0 +1,38 @@
+"""Swiss rounds
+
+Revision ID: f4c81d2e6b93
+Revises: e2b7c9d45a10
+Create Date: 2026-10-18 21:05:12.418530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c81d2e6b93'
+down_revision: Union[str, None] = 'e2b7c9d45a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('swiss_rounds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('number', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('bye_team_id', sa.Integer(), nullable=True),
+    sa.Column('first_match_id', sa.Integer(), nullable=True),
+    sa.Column('last_match_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['bye_team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_swiss_rounds_genre_number', 'swiss_rounds', ['genre', 'number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_swiss_rounds_genre_number', table_name='swiss_rounds')
+    op.drop_table('swiss_rounds')
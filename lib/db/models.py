@@ -1,10 +1,97 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Date
+import os
+from contextlib import contextmanager
+from sqlalchemy import (
+    create_engine, event, inspect, select, Column, Integer, String, ForeignKey, Date, Index, MetaData, Table,
+    PrimaryKeyConstraint, DateTime, Float, Boolean, text,
+)
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
-engine = create_engine('sqlite:///Esports.db')
+DATABASE_URL = os.environ.get('ESPORTS_DB_URL', 'sqlite:///Esports.db')
+
+# PRAGMAs applied to every new SQLite connection. Both profiles use WAL so
+# leaderboard readers never block the simulator while it writes results.
+#   durable:   every commit is fsynced; the default for interactive use.
+#   fast-bulk: no fsync and bigger caches, for imports and large simulations
+#              where the run can simply be repeated after a crash.
+SQLITE_PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -64000,        # KiB, i.e. 64 MB
+        'mmap_size': 268435456,      # 256 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,        # ms
+    },
+    'fast-bulk': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -256000,
+        'mmap_size': 1073741824,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 30000,
+    },
+}
+DEFAULT_PROFILE = 'durable'
+
+# Head of lib/db/migrations/versions. Bump it together with every new
+# migration: prepare_database() compares it with the database's
+# alembic_version on startup.
+SCHEMA_REVISION = 'b6f2d8e4a1c7'
+
+
+def sqlite_pragmas(profile=None, **overrides):
+    profile = profile or os.environ.get('ESPORTS_DB_PROFILE', DEFAULT_PROFILE)
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'. Choose from: {', '.join(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    # ESPORTS_SQLITE_CACHE_SIZE=-128000 etc. override a single PRAGMA.
+    for name in pragmas:
+        value = os.environ.get(f'ESPORTS_SQLITE_{name.upper()}')
+        if value is not None:
+            pragmas[name] = value
+    pragmas.update(overrides)
+    return pragmas
+
+
+def create_db_engine(url=None, profile=None, **overrides):
+    engine = create_engine(url or DATABASE_URL)
+    if engine.dialect.name != 'sqlite':
+        return engine
+
+    install_pragmas(engine, sqlite_pragmas(profile, **overrides))
+    return engine
+
+
+def install_pragmas(engine, pragmas):
+    # Also used for the async engine, through its sync_engine.
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+engine = create_db_engine()
 Base = declarative_base()
 Session = sessionmaker(bind=engine)
-session = Session()
+
+
+@contextmanager
+def session_scope():
+    # One short-lived session per unit of work, committed on success. Its
+    # identity map goes away with it, so a long menu session doesn't keep
+    # every Team and Match it ever loaded. Objects stay readable after the
+    # commit (expire_on_commit=False) for printing confirmations.
+    session = Session(expire_on_commit=False)
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
 # Table-1
 class Team(Base):
@@ -14,11 +101,16 @@ class Team(Base):
     name = Column(String)
     genre = Column(String)
     rankings = Column(Integer)
+    # Extra state of the rating systems that keep one (see rating_systems.py);
+    # NULL until such a system has rated the team.
+    rating_deviation = Column(Float)
+    rating_volatility = Column(Float)
 
     players = relationship('Player', back_populates='team', cascade='all, delete-orphan')
     matches_as_team1 = relationship('Match', foreign_keys='Match.team1_id', back_populates='team1')
     matches_as_team2 = relationship('Match', foreign_keys='Match.team2_id', back_populates='team2')
     wins = relationship('Match', foreign_keys='Match.winner_id', back_populates='winner')
+    stats = relationship('TeamStats', back_populates='team', uselist=False, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f"<Team(id={self.id}, name='{self.name}', genre='{self.genre}')>"
@@ -26,6 +118,9 @@ class Team(Base):
 # Table-2
 class Player(Base):
     __tablename__ = 'players'
+    __table_args__ = (
+        Index('ix_players_team_id_name', 'team_id', 'name'),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String)
@@ -40,6 +135,15 @@ class Player(Base):
 # Table-3
 class Match(Base):
     __tablename__ = 'matches'
+    __table_args__ = (
+        Index('ix_matches_date_id', 'date', 'id'),
+        Index('ix_matches_team1_id', 'team1_id'),
+        Index('ix_matches_team2_id', 'team2_id'),
+        # Completed and pending matches get separate partial indexes, so
+        # lookups by winner never compete with the pending-queue index.
+        Index('ix_matches_winner_id', 'winner_id', sqlite_where=text('winner_id IS NOT NULL')),
+        Index('ix_matches_pending', 'date', 'id', sqlite_where=text('winner_id IS NULL')),
+    )
 
     id = Column(Integer, primary_key=True)
     team1_id = Column(Integer, ForeignKey('teams.id'))  
@@ -52,4 +156,190 @@ class Match(Base):
     winner = relationship('Team', foreign_keys=[winner_id], back_populates='wins')
 
     def __repr__(self):
-        return f"<Match(id={self.id}, '{self.team1_id} vs {self.team2_id}' on {self.date})>"
\ No newline at end of file
+        return f"<Match(id={self.id}, '{self.team1_id} vs {self.team2_id}' on {self.date})>"
+
+# Table-4
+# Materialized leaderboard row per team, kept in step with match results by
+# stats.py so the leaderboard doesn't have to replay every match.
+class TeamStats(Base):
+    __tablename__ = 'team_stats'
+    __table_args__ = (
+        Index('ix_team_stats_rating', 'rating'),
+    )
+
+    team_id = Column(Integer, ForeignKey('teams.id'), primary_key=True)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    form = Column(String, nullable=False, default='')
+    rating = Column(Integer, nullable=False, default=1000)
+
+    team = relationship('Team', back_populates='stats')
+
+    def __repr__(self):
+        return f"<TeamStats(team_id={self.team_id}, wins={self.wins}, losses={self.losses}, rating={self.rating})>"
+
+# Table-5
+# Append-only ledger of rating changes, two rows per simulated match. `date`
+# is the match date (or the day it was simulated, for undated matches), so
+# a past leaderboard or a team's rating curve is a single indexed query.
+class RatingEvent(Base):
+    __tablename__ = 'rating_events'
+    __table_args__ = (
+        Index('ix_rating_events_team_date', 'team_id', 'date', 'id'),
+        Index('ix_rating_events_match_id', 'match_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    match_id = Column(Integer, ForeignKey('matches.id'), nullable=False)
+    team_id = Column(Integer, ForeignKey('teams.id'), nullable=False)
+    date = Column(Date, nullable=False)
+    before = Column(Integer, nullable=False)
+    after = Column(Integer, nullable=False)
+    delta = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<RatingEvent(match_id={self.match_id}, team_id={self.team_id}, {self.before} -> {self.after})>"
+
+# Table-6
+# Checkpoint of a chunked simulation. A run covers the matches pending when
+# it started (id <= cutoff_id) and is updated in the same transaction as
+# each chunk's results, so an interrupted run resumes after its last
+# committed chunk. The seed and rating system are kept so a resumed run
+# draws and rates exactly as the uninterrupted one would.
+class SimulationRun(Base):
+    __tablename__ = 'simulation_runs'
+
+    id = Column(Integer, primary_key=True)
+    seed = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    workers = Column(Integer)
+    cutoff_id = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    processed = Column(Integer, nullable=False, default=0)
+    last_match_id = Column(Integer)
+    last_date = Column(Date)
+    status = Column(String, nullable=False, default='running')
+    rating_system = Column(String)
+    started_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<SimulationRun(id={self.id}, {self.processed}/{self.total}, status='{self.status}')>"
+
+# Table-7
+# One stat line per player per match, for player leaderboards. The primary
+# key (player_id, match_id) is also the table's clustering order (WITHOUT
+# ROWID), so aggregating per player is one ordered scan with no sort.
+# team_id is the player's team when the line was recorded.
+class PlayerMatchStats(Base):
+    __tablename__ = 'player_match_stats'
+    __table_args__ = (
+        Index('ix_player_match_stats_match_id', 'match_id'),
+        {'sqlite_with_rowid': False},
+    )
+
+    player_id = Column(Integer, ForeignKey('players.id'), primary_key=True)
+    match_id = Column(Integer, ForeignKey('matches.id'), primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'), nullable=False)
+    kills = Column(Integer, nullable=False, default=0)
+    deaths = Column(Integer, nullable=False, default=0)
+    assists = Column(Integer, nullable=False, default=0)
+    mvp = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return (f"<PlayerMatchStats(player_id={self.player_id}, match_id={self.match_id}, "
+                f"{self.kills}/{self.deaths}/{self.assists})>")
+
+# Table-8
+# One row per Swiss round scheduled by swiss.py. A round's fixtures are
+# inserted as one block of match IDs (first_match_id..last_match_id), so the
+# current round's unfinished matches and every past bye are one lookup.
+class SwissRound(Base):
+    __tablename__ = 'swiss_rounds'
+    __table_args__ = (
+        Index('ix_swiss_rounds_genre_number', 'genre', 'number'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    genre = Column(String, nullable=False)
+    number = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    bye_team_id = Column(Integer, ForeignKey('teams.id'))
+    first_match_id = Column(Integer)
+    last_match_id = Column(Integer)
+
+    def __repr__(self):
+        return f"<SwissRound(genre='{self.genre}', number={self.number}, bye_team_id={self.bye_team_id})>"
+
+# Table-9
+# A single-elimination bracket. Its slots hold the bracket in seed order:
+# round 1 slot i is either a match or a bye, and the winners of slots 2i and
+# 2i + 1 meet in slot i of the next round.
+class Bracket(Base):
+    __tablename__ = 'brackets'
+
+    id = Column(Integer, primary_key=True)
+    genre = Column(String, nullable=False)
+    format = Column(String, nullable=False, default='single-elimination')
+    status = Column(String, nullable=False, default='running')
+    champion_id = Column(Integer, ForeignKey('teams.id'))
+
+    def __repr__(self):
+        return f"<Bracket(id={self.id}, genre='{self.genre}', status='{self.status}')>"
+
+
+class BracketSlot(Base):
+    __tablename__ = 'bracket_slots'
+
+    bracket_id = Column(Integer, ForeignKey('brackets.id'), primary_key=True)
+    round = Column(Integer, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    # W (winners bracket), L (losers bracket) or F (grand final). Positions
+    # are numbered across all sides of a round.
+    side = Column(String, nullable=False, default='W')
+    match_id = Column(Integer, ForeignKey('matches.id'))
+    # The team that goes through without playing, for a bye.
+    team_id = Column(Integer, ForeignKey('teams.id'))
+
+    def __repr__(self):
+        return f"<BracketSlot(bracket_id={self.bracket_id}, round={self.round}, position={self.position})>"
+
+
+# Alembic's own bookkeeping table, kept out of Base.metadata so autogenerate
+# never sees it.
+alembic_version = Table(
+    'alembic_version', MetaData(),
+    Column('version_num', String(32), nullable=False),
+    PrimaryKeyConstraint('version_num', name='alembic_version_pkc'),
+)
+
+
+def prepare_database(engine):
+    # Startup check, instead of create_all on every launch: a database at
+    # SCHEMA_REVISION costs two small queries. A new database is created
+    # from the models and stamped, as `alembic upgrade head` would leave it.
+    # Anything else is left alone and a warning returned.
+    with engine.begin() as conn:
+        tables = inspect(conn).get_table_names()
+        if 'alembic_version' in tables:
+            revision = conn.execute(select(alembic_version.c.version_num)).scalar()
+            if revision == SCHEMA_REVISION:
+                return None
+            return (
+                f"Database schema is at revision {revision}, this version needs {SCHEMA_REVISION}. "
+                "Run `alembic upgrade head` in lib/db."
+            )
+
+        if tables:
+            # Made by create_all before migrations were used: add what is
+            # missing, as launches used to, but don't claim a revision.
+            Base.metadata.create_all(conn)
+            return (
+                "Database has no schema revision. Once it matches the models, "
+                "run `alembic stamp head` in lib/db to skip this check."
+            )
+
+        Base.metadata.create_all(conn)
+        alembic_version.create(conn)
+        conn.execute(alembic_version.insert().values(version_num=SCHEMA_REVISION))
+        return None
@@ -0,0 +1,171 @@
+import math
+import random
+import time
+from itertools import islice
+from datetime import date, timedelta
+from sqlalchemy import select, insert, func
+from db.models import Team, Player, Match, RatingEvent, PlayerMatchStats
+from ratings import PendingBatch, rating_events
+from rating_systems import get_system
+from operations import VALID_GENRES, roles_for_genre
+import stats
+
+# Synthetic leagues for demos and benchmarks. Teams are spread over the
+# genres, each gets a roster using the roles add_player accepts for its
+# genre, and matches are played inside a genre. The history is simulated in
+# memory with the same seeded run as `matches simulate --seed`, under the
+# chosen rating system, so the stored ratings, rating_events and team_stats
+# agree and `matches replay` passes. Player stat lines, when asked for, are
+# drawn from a stream of their own, so they don't change the league itself.
+# Everything goes in with bulk inserts on the caller's session.
+
+DEFAULT_TEAMS = 200
+DEFAULT_MATCHES = 10000
+DEFAULT_PLAYERS = 5
+DEFAULT_PENDING = 0.1
+SEASON_START = date(2025, 1, 1)
+SEASON_DAYS = 365
+CHUNK_SIZE = 20000
+
+
+def chunks(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_insert(session, model, rows):
+    # Plain Core inserts on the table: the rows are complete, so the ORM's
+    # bulk path has nothing to add and costs about half again as much.
+    for chunk in chunks(rows):
+        session.execute(insert(model.__table__), chunk)
+
+
+def next_id(session, column):
+    return (session.scalar(select(func.max(column))) or 0) + 1
+
+
+def stat_lines(match_rows, first_team, first_player, players_per_team, seed):
+    # Generated match by match and inserted chunk by chunk: at a million
+    # lines, building them all first would dominate the seed's memory.
+    # Winners get a few more kills, and the winning team's top fragger is
+    # the match MVP.
+    rng = random.Random(f"{seed}:player-stats")
+    draw = rng.random
+    for match in match_rows:
+        if match["winner_id"] is None:
+            continue
+        for team_id in (match["team1_id"], match["team2_id"]):
+            won = team_id == match["winner_id"]
+            first = first_player + (team_id - first_team) * players_per_team
+            lines = [
+                {
+                    "player_id": player_id,
+                    "match_id": match["id"],
+                    "team_id": team_id,
+                    "kills": int(draw() * 20) + (4 if won else 0),
+                    "deaths": int(draw() * 20) + (0 if won else 4),
+                    "assists": int(draw() * 12),
+                    "mvp": False,
+                }
+                for player_id in range(first, first + players_per_team)
+            ]
+            if won and lines:
+                max(lines, key=lambda line: line["kills"])["mvp"] = True
+            yield from lines
+
+
+def seed_league(session, teams=DEFAULT_TEAMS, matches=DEFAULT_MATCHES, players_per_team=DEFAULT_PLAYERS,
+                pending=DEFAULT_PENDING, genres=None, seed=0, start=SEASON_START, system=None,
+                player_stats=False):
+    if teams < 2:
+        raise ValueError("A league needs at least 2 teams")
+    if matches < 0 or players_per_team < 0:
+        raise ValueError("Match and player counts cannot be negative")
+    if not 0 <= pending <= 1:
+        raise ValueError("Pending share must be between 0 and 1")
+    system = get_system(system)
+    genres = VALID_GENRES[:genres or len(VALID_GENRES)]
+    # Every genre needs two teams to play a match.
+    genres = genres[:max(1, teams // 2)]
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    first_team = next_id(session, Team.id)
+    first_match = next_id(session, Match.id)
+    first_player = next_id(session, Player.id)
+
+    team_rows = []
+    pools = {genre: [] for genre in genres}
+    for n in range(teams):
+        genre = genres[n % len(genres)]
+        team_id = first_team + n
+        team_rows.append({"id": team_id, "name": f"{genre} Team {team_id}", "genre": genre})
+        pools[genre].append(team_id)
+
+    player_rows = []
+    for team in team_rows:
+        roles = roles_for_genre(team["genre"]) or ["Player"]
+        for n in range(players_per_team):
+            player_rows.append({
+                "id": first_player + len(player_rows),
+                "name": f"{team['name']} Player {n + 1}",
+                "role": roles[n % len(roles)],
+                "team_id": team["id"],
+            })
+
+    # History is spread over one season and pending fixtures over the one
+    # after. IDs follow date order, as they would for a real league.
+    played = matches - round(matches * pending)
+    dates = sorted(start + timedelta(days=rng.randrange(SEASON_DAYS)) for _ in range(played))
+    dates += sorted(start + timedelta(days=SEASON_DAYS + rng.randrange(SEASON_DAYS)) for _ in range(matches - played))
+    genre_pools = list(pools.values())
+    fixtures = [rng.sample(genre_pools[rng.randrange(len(genre_pools))], 2) for _ in range(matches)]
+
+    batch = PendingBatch()
+    for team in team_rows:
+        batch.team_index(team["id"], team["name"], None)
+    for n in range(played):
+        batch.match_ids.append(first_match + n)
+        batch.dates.append(dates[n])
+        batch.team1.append(batch.team_index(fixtures[n][0], None, None))
+        batch.team2.append(batch.team_index(fixtures[n][1], None, None))
+    system.run(batch, seed=seed)
+
+    for team, rating, deviation, volatility in zip(team_rows, batch.ratings, batch.deviations, batch.volatilities):
+        team["rankings"] = rating
+        if system.state:
+            team["rating_deviation"] = None if math.isnan(deviation) else deviation
+            team["rating_volatility"] = None if math.isnan(volatility) else volatility
+    match_rows = [
+        {
+            "id": first_match + n,
+            "team1_id": team1,
+            "team2_id": team2,
+            "date": dates[n],
+            "winner_id": batch.team_ids[batch.winners[n]] if n < played else None,
+        }
+        for n, (team1, team2) in enumerate(fixtures)
+    ]
+
+    bulk_insert(session, Team, team_rows)
+    bulk_insert(session, Player, player_rows)
+    bulk_insert(session, Match, match_rows)
+    bulk_insert(session, RatingEvent, rating_events(batch))
+    if player_stats:
+        bulk_insert(session, PlayerMatchStats, stat_lines(match_rows, first_team, first_player, players_per_team, seed))
+    stats.rebuild_stats(session)
+
+    return {
+        "teams": teams,
+        "players": len(player_rows),
+        "matches": matches,
+        "played": played,
+        "pending": matches - played,
+        "genres": len(genres),
+        "stat_lines": played * 2 * players_per_team if player_stats else 0,
+        "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,188 @@
+import os
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select
+from db.models import Team
+from numeric import load_numpy
+from operations import VALID_GENRES
+from ratings import K_FACTOR, PendingBatch, pending_query
+
+# Monte Carlo forecast of the remaining season of one genre. Each genre is
+# its own rating pool, so ratings are only comparable within one. Every
+# simulated season replays the genre's pending fixtures in date order with
+# the same ELO update as simulate_matches, starting from the current
+# ratings; its teams are then ranked by final rating, as on the
+# leaderboard. Nothing is written back.
+# Seasons are split into chunks that run in parallel worker processes;
+# inside a chunk NumPy (when installed) advances all seasons at once.
+
+DEFAULT_SIMULATIONS = 10000
+DEFAULT_TOP = 4
+# Seasons per unit of work. Fixed, so a given seed gives the same forecast
+# however many workers run it.
+CHUNK_SIZE = 1000
+
+
+def check_genre(genre):
+    if genre not in VALID_GENRES:
+        raise ValueError(f"Invalid genre '{genre}'. Choose from: {', '.join(VALID_GENRES)}")
+
+
+def load_season(session, genre):
+    check_genre(genre)
+    batch = PendingBatch()
+    # Every team can finish in the top k, not only those with fixtures left.
+    for team_id, name, rankings in session.execute(
+        select(Team.id, Team.name, Team.rankings).where(Team.genre == genre)
+    ):
+        batch.team_index(team_id, name, rankings)
+    for match_id, match_date, id1, name1, rank1, id2, name2, rank2 in session.execute(
+        pending_query(genre=genre)
+    ):
+        batch.match_ids.append(match_id)
+        batch.team1.append(batch.team_index(id1, name1, rank1))
+        batch.team2.append(batch.team_index(id2, name2, rank2))
+    return batch
+
+
+def load_snapshot_season(snapshot, genre):
+    # The same season as load_season, from a snapshot (see snapshot.py)
+    # instead of the live database. Matches missing a team, or with a team
+    # from another genre, are left out, as pending_query leaves them out.
+    check_genre(genre)
+    batch = PendingBatch()
+    for team_id, name, team_genre, rankings in snapshot.rows("teams", "id", "name", "genre", "rankings"):
+        if team_genre == genre:
+            batch.team_index(team_id, name, rankings)
+    known = set(batch.team_ids)
+    # Only the pending rows of the other columns are decoded.
+    rows = [idx for idx, winner in enumerate(snapshot.values("matches", "winner_id")) if winner is None]
+    pending = sorted(
+        # NULL dates first, as SQLite orders them.
+        (match_date is not None, match_date, match_id, id1, id2)
+        for match_id, id1, id2, match_date in zip(
+            *(snapshot.values("matches", column, rows) for column in ("id", "team1_id", "team2_id", "date"))
+        )
+        if id1 in known and id2 in known
+    )
+    for _, _, match_id, id1, id2 in pending:
+        batch.match_ids.append(match_id)
+        batch.team1.append(batch.team_index(id1, None, None))
+        batch.team2.append(batch.team_index(id2, None, None))
+    return batch
+
+
+def simulate_chunk_numpy(np, team1, team2, ratings, simulations, top, seed):
+    rng = np.random.default_rng(seed)
+    # One row per team, one column per simulated season.
+    board = np.repeat(np.asarray(ratings, dtype=np.float64)[:, None], simulations, axis=1)
+    for a, b in zip(team1, team2):
+        ra = board[a]
+        rb = board[b]
+        expected_a = 1 / (1 + 10 ** ((rb - ra) / 400))
+        expected_b = 1 / (1 + 10 ** ((ra - rb) / 400))
+        a_wins = rng.random(simulations) < expected_a
+        board[a] = np.rint(ra + K_FACTOR * (a_wins - expected_a))
+        board[b] = np.rint(rb + K_FACTOR * (~a_wins - expected_b))
+
+    # Stable sort keeps ties in team order, like the leaderboard's sort.
+    order = np.argsort(-board, axis=0, kind='stable')
+    first = np.bincount(order[0], minlength=len(ratings))
+    top_k = np.bincount(order[:top].ravel(), minlength=len(ratings))
+    return first.tolist(), top_k.tolist(), board.sum(axis=1).tolist()
+
+
+def simulate_chunk_python(team1, team2, ratings, simulations, top, seed):
+    rng = random.Random(seed)
+    draw = rng.random
+    teams = range(len(ratings))
+    first = [0] * len(ratings)
+    top_k = [0] * len(ratings)
+    totals = [0] * len(ratings)
+
+    for _ in range(simulations):
+        board = array('q', ratings)
+        for a, b in zip(team1, team2):
+            ra = board[a]
+            rb = board[b]
+            expected_a = 1 / (1 + 10 ** ((rb - ra) / 400))
+            expected_b = 1 / (1 + 10 ** ((ra - rb) / 400))
+            if draw() < expected_a:
+                board[a] = round(ra + K_FACTOR * (1 - expected_a))
+                board[b] = round(rb + K_FACTOR * (0 - expected_b))
+            else:
+                board[a] = round(ra + K_FACTOR * (0 - expected_a))
+                board[b] = round(rb + K_FACTOR * (1 - expected_b))
+
+        ranked = sorted(teams, key=lambda idx: -board[idx])
+        first[ranked[0]] += 1
+        for idx in ranked[:top]:
+            top_k[idx] += 1
+        for idx in teams:
+            totals[idx] += board[idx]
+    return first, top_k, totals
+
+
+# The season is shipped to each worker once, not with every chunk.
+_season = None
+
+
+def load_worker_season(team1, team2, ratings):
+    global _season
+    _season = (team1, team2, ratings)
+
+
+def simulate_chunk(simulations, top, seed):
+    team1, team2, ratings = _season
+    np = load_numpy()
+    if np is not None:
+        return simulate_chunk_numpy(np, team1, team2, ratings, simulations, top, seed)
+    return simulate_chunk_python(team1, team2, ratings, simulations, top, seed)
+
+
+def run_forecast(batch, simulations=DEFAULT_SIMULATIONS, top=DEFAULT_TOP, workers=None, seed=None):
+    if simulations < 1:
+        raise ValueError("Number of simulations must be at least 1")
+    teams = len(batch.team_ids)
+    if not teams:
+        return []
+    top = max(1, min(top, teams))
+    workers = workers or os.cpu_count() or 1
+    seed = random.randrange(2 ** 32) if seed is None else seed
+
+    sizes = [CHUNK_SIZE] * (simulations // CHUNK_SIZE)
+    if simulations % CHUNK_SIZE:
+        sizes.append(simulations % CHUNK_SIZE)
+    season = (list(batch.team1), list(batch.team2), list(batch.ratings))
+    seeds = [seed + i for i in range(len(sizes))]
+
+    if workers == 1 or len(sizes) == 1:
+        load_worker_season(*season)
+        results = [simulate_chunk(size, top, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=load_worker_season, initargs=season) as pool:
+            results = list(pool.map(simulate_chunk, sizes, [top] * len(sizes), seeds))
+
+    first = [sum(result[0][idx] for result in results) for idx in range(teams)]
+    top_k = [sum(result[1][idx] for result in results) for idx in range(teams)]
+    totals = [sum(result[2][idx] for result in results) for idx in range(teams)]
+
+    rows = [
+        {
+            "id": batch.team_ids[idx],
+            "name": batch.names[idx],
+            "rating": batch.ratings[idx],
+            "expected_rating": round(totals[idx] / simulations, 1),
+            "first": first[idx] / simulations,
+            "top": top_k[idx] / simulations,
+        }
+        for idx in range(teams)
+    ]
+    rows.sort(key=lambda row: (-row["top"], -row["first"], -row["rating"]))
+    return rows
+
+
+def forecast(session, genre, simulations=DEFAULT_SIMULATIONS, top=DEFAULT_TOP, workers=None, seed=None):
+    batch = load_season(session, genre)
+    return len(batch), run_forecast(batch, simulations, top, workers, seed)
@@ -1,13 +1,12 @@
-import time
-import random
 from rich.console import Console
-from db.models import Base, engine, session, Team, Player, Match
+from db.models import engine, prepare_database, session_scope, Team, Player, Match
+import operations
+import progress
+import stats
 from rich.style import Style
 from rich.table import Table
 from rich.panel import Panel
 from rich.prompt import Prompt, Confirm, InvalidResponse
-from sqlalchemy import select, delete, func
-from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 console = Console()
@@ -20,12 +19,16 @@ highlight_style = Style(bold=True, underline=True)
 
 def initialize_database():
     with console.status("[green]Initializing database...[/green]"):
-        Base.metadata.create_all(engine)
-        time.sleep(1)
+        warning = prepare_database(engine)
+        with session_scope() as session:
+            stats.ensure_stats(session)
+    if warning:
+        console.print(f"[yellow]⚠ {warning}[/yellow]")
     console.print("[green]✓ Database initialized successfully![/green]")
 
 def list_teams():
-    teams = session.scalars(select(Team)).all()
+    with session_scope() as session:
+        teams = operations.team_rows(session)
     
     if not teams:
         console.print("[bold]No teams found.[/bold]")
@@ -57,36 +60,18 @@ def create_team():
         )
 
 
-    valid_genres = [
-        'Pes',
-        'Fifa'
-        'Valorant', 
-        'CS2', 
-        'Dota 2', ''
-        'League of Legends', 
-        'Overwatch', ''
-        'Call of duty'
-        ]
-    
     genre = Prompt.ask(
         "[bold]Genre[/bold]",
-        choices=valid_genres,
+        choices=operations.VALID_GENRES,
         default="Valorant",
         show_choices=True
     )
 
-    team = Team(
-        name=name,
-        genre=genre,
-        rankings=None  
-    )
-    
     try:
-        session.add(team)
-        session.commit()
+        with session_scope() as session:
+            team = operations.create_team(session, name, genre)
         console.print(f"\n[green]✓ Added team [bold]{name}[/bold] ({genre}) (ID: {team.id})[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]❌ Error creating team: {str(e)}[/red]")
         return None
 
@@ -99,7 +84,8 @@ def add_player():
     team_id = Prompt.ask("\nEnter team ID to add a player", default="0")
     
     try:
-        team = session.get(Team, int(team_id))
+        with session_scope() as session:
+            team = session.get(Team, int(team_id))
     except ValueError:
         console.print("[red]✗ Invalid team ID - must be a number[/red]")
         return
@@ -110,14 +96,7 @@ def add_player():
     
     name = Prompt.ask("[bold]Player Name[/bold]")
 
-    if team.genre.lower() == "call of duty":
-        valid_roles = ['Slayer', 'Support', 'Objective', 'Anchor']
-    elif team.genre.lower() == "valorant":
-        valid_roles = ['Duelist', 'Initiator', 'Sentinel', 'Controller']
-    elif team.genre.lower() == "CS2":
-        valid_roles = ["AWPer", "Rifler", "Support", "IGL"]  
-    else:
-        valid_roles = []
+    valid_roles = operations.roles_for_genre(team.genre)
 
     if not valid_roles:
         role = Prompt.ask("[bold]Role[/bold]")
@@ -128,18 +107,11 @@ def add_player():
             show_choices=True
         )
 
-    player = Player(
-        name=name,
-        role=role,
-        team_id=team.id
-    )
-    
     try:
-        session.add(player)
-        session.commit()
+        with session_scope() as session:
+            operations.add_player(session, team.id, name, role)
         console.print(f"[green]✓ Added player '{name}' as {role} to team '{team.name}'[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error adding player: {str(e)}[/red]")
 
 def list_players():
@@ -149,17 +121,8 @@ def list_players():
     team_id = Prompt.ask("\nEnter team ID to list players", default="0")
 
     try:
-        team = session.get(Team, int(team_id))
-        
-        if not team:
-            console.print(f"[red]✗ No team found with ID {team_id}[/red]")
-            return
-        
-        players = session.scalars(
-            select(Player)
-            .where(Player.team_id == team.id)
-            .order_by(Player.name)
-        ).all()
+        with session_scope() as session:
+            team, players = operations.list_players(session, team_id)
 
         if not players:
             console.print(f"[yellow]ℹ No players found in team '{team.name}'[/yellow]")
@@ -185,8 +148,8 @@ def list_players():
         
         console.print(table)
         
-    except ValueError:
-        console.print("[red]✗ Invalid team ID - must be a number[/red]")
+    except ValueError as e:
+        console.print(f"[red]✗ {str(e)}[/red]")
     except Exception as e:
         console.print(f"[red]✗ Error listing players: {str(e)}[/red]")  
 
@@ -194,10 +157,8 @@ def list_players():
 def schedule_match():
     console.print(Panel("📅 Schedule New Match", style="bold blue"))
     
-    teams = session.scalars(
-        select(Team)
-        .order_by(Team.name)
-    ).unique().all()  
+    with session_scope() as session:
+        teams = sorted(operations.team_rows(session), key=lambda team: team.name or "")
     
     if not teams:
         console.print("[red]✗ No teams available to schedule matches[/red]")
@@ -217,20 +178,12 @@ def schedule_match():
     team2_id = Prompt.ask("Enter ID of second team")
     
     try:
-        team1 = session.scalar(
-            select(Team)
-            .where(Team.id == int(team1_id))
-        )
-        team2 = session.scalar(
-            select(Team)
-            .where(Team.id == int(team2_id))
-        )
-        
-        if not team1 or not team2:
+        teams_by_id = {team.id: team for team in teams}
+        if int(team1_id) not in teams_by_id or int(team2_id) not in teams_by_id:
             console.print("[red]✗ One or both teams not found[/red]")
             return
         
-        if team1_id == team2_id:
+        if int(team1_id) == int(team2_id):
             console.print("[red]✗ A team cannot play against itself[/red]")
             return
         
@@ -249,14 +202,8 @@ def schedule_match():
             except ValueError:
                 console.print("[red]✗ Invalid date format. Use YYYY-MM-DD[/red]")
         
-        new_match = Match(
-            team1_id=team1.id,
-            team2_id=team2.id,
-            date=parsed_date
-        )
-        
-        session.add(new_match)
-        session.commit()
+        with session_scope() as session:
+            new_match, team1, team2 = operations.schedule_match(session, team1_id, team2_id, parsed_date)
         
         date_str = parsed_date.strftime("%b %d, %Y") if parsed_date else "TBD"
         console.print(f"\n[green]✓ Match scheduled:[/green]")
@@ -267,174 +214,121 @@ def schedule_match():
     except ValueError:
         console.print("[red]✗ Invalid team ID - must be a number[/red]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error scheduling match: {str(e)}[/red]")
 
 def simulate_matches():
     console.print(Panel("🎮 Simulate Match Outcomes", style="bold blue"))
-    
-    pending_matches = session.scalars(
-        select(Match)
-        .where(Match.winner_id == None)
-        .options(joinedload(Match.team1), joinedload(Match.team2))
-        .order_by(Match.date)
-    ).all()
-
-    if not pending_matches:
+    output = Prompt.ask("Write every result to a JSONL file instead of showing them (blank to watch live)",
+                        default="", show_default=False).strip()
+    summary = progress.ResultSummary()
+    window = None if output else progress.ResultWindow()
+
+    try:
+        # The interrupted run is read in a session of its own, closed before
+        # the prompt, so no transaction stays open while the menu waits.
+        with session_scope() as session:
+            run = operations.unfinished_run(session)
+        resume = run is not None and Confirm.ask(
+            f"[yellow]Run {run.id} stopped after {run.processed} of {run.total} matches "
+            f"(last match {run.last_match_id or '-'}). Resume it?[/yellow]",
+            default=True
+        )
+        with session_scope() as session:
+            # Loaded again: another process may have moved it on meanwhile.
+            if resume:
+                run = operations.resume_simulation(session)
+            else:
+                if operations.unfinished_run(session):
+                    operations.abandon_simulation(session)
+                run = operations.start_simulation(session)
+            stream = open(output, "a" if resume else "w") if output else None
+            sinks = [summary.add] + ([progress.jsonl_writer(stream)] if stream else [])
+            try:
+                simulated, elapsed = progress.run_simulation(session, run, console, sinks, window)
+            finally:
+                if stream:
+                    stream.close()
+    except Exception as e:
+        console.print(f"[red]✗ Error simulating matches: {str(e)}[/red]")
+        console.print("[yellow]Finished chunks were saved; choose Simulate Matches again to resume.[/yellow]")
+        return
+
+    if not run.total:
         console.print("[yellow]ℹ No pending matches to simulate[/yellow]")
         return
 
-    console.print(f"[green]Found {len(pending_matches)} matches to simulate:[/green]")
-    
-    K_FACTOR = 32  
-    INITIAL_RATING = 1000  
-    
-    results_table = Table(show_header=True, header_style="bold magenta")
-    results_table.add_column("Match", style="bold")
-    results_table.add_column("Ratings Before", style="blue")
-    results_table.add_column("Outcome", style="green")
-    results_table.add_column("Ratings After", style="blue")
-    results_table.add_column("Δ", style="cyan", justify="right")
-
-    for match in pending_matches:
-        team1 = match.team1
-        team2 = match.team2
-        
-        team1.rankings = team1.rankings if team1.rankings else INITIAL_RATING
-        team2.rankings = team2.rankings if team2.rankings else INITIAL_RATING
-        
-        expected_team1 = 1 / (1 + 10 ** ((team2.rankings - team1.rankings) / 400))
-        expected_team2 = 1 / (1 + 10 ** ((team1.rankings - team2.rankings) / 400))
-        
-        if random.random() < expected_team1:
-            winner, loser = team1, team2
-            actual_team1, actual_team2 = 1, 0
-            outcome = f"[green]{team1.name} wins[/green]"
-        else:
-            winner, loser = team2, team1
-            actual_team1, actual_team2 = 0, 1
-            outcome = f"[green]{team2.name} wins[/green]"
-        
-        team1_new = round(team1.rankings + K_FACTOR * (actual_team1 - expected_team1))
-        team2_new = round(team2.rankings + K_FACTOR * (actual_team2 - expected_team2))
-        
-        rating_changes = {
-            team1.name: team1_new - team1.rankings,
-            team2.name: team2_new - team2.rankings
-        }
-        
-        match.winner_id = winner.id
-        team1.rankings = team1_new
-        team2.rankings = team2_new
-        
-        results_table.add_row(
-            f"{team1.name} vs {team2.name}",
-            f"{team1.name}: {team1.rankings}\n{team2.name}: {team2.rankings}",
-            outcome,
-            f"{team1.name}: {team1_new}\n{team2.name}: {team2_new}",
-            f"{rating_changes[team1.name]:+}\n{rating_changes[team2.name]:+}"
-        )
-    
-    session.commit()
-    console.print(results_table)
-    console.print("[bold green]✓ All matches simulated and rankings updated![/bold green]")
-
-def match_history():
-    matches = session.scalars(
-        select(Match)
-        .options(
-            joinedload(Match.team1),
-            joinedload(Match.team2),
-            joinedload(Match.winner)
-        )
-        .order_by(Match.date.desc())
-    ).all()
+    console.print(summary.tables())
+    if output:
+        console.print(f"[green]Results written to {output}[/green]")
+    console.print(
+        f"[bold green]✓ {simulated} matches simulated in {elapsed:.1f}s and rankings updated![/bold green]"
+    )
+
+def match_history(page_size=operations.HISTORY_PAGE_SIZE):
+    with session_scope() as session:
+        matches, cursor = operations.match_history_rows(session, page_size)
 
     if not matches:
         console.print("[bold red]No matches to be displayed.[/bold red]")
         return
     
-    table = Table(title="⚔️ Match History", show_header=True, header_style="bold magenta")
-    table.add_column("ID", style="cyan", justify="right")
-    table.add_column("Team 1", style="green")
-    table.add_column("VS", justify="center")
-    table.add_column("Team 2", style="yellow")
-    table.add_column("Date", style="blue")
-    table.add_column("Winner", style="bold green")
-
-    for match in matches:
-        winner_text = ""
-        if match.winner:
-            if match.winner.id == match.team1.id:
-                winner_text = f"[green]→ {match.team1.name}[/green]"
-            elif match.winner.id == match.team2.id:
-                winner_text = f"[green]→ {match.team2.name}[/green]"
+    page = 1
+    while True:
+        table = Table(title="⚔️ Match History", caption=f"Page {page}", show_header=True, header_style="bold magenta")
+        table.add_column("ID", style="cyan", justify="right")
+        table.add_column("Team 1", style="green")
+        table.add_column("VS", justify="center")
+        table.add_column("Team 2", style="yellow")
+        table.add_column("Date", style="blue")
+        table.add_column("Winner", style="bold green")
+
+        for match in matches:
+            winner_text = ""
+            if match.winner:
+                if match.winner_id == match.team1_id:
+                    winner_text = f"[green]→ {match.team1}[/green]"
+                elif match.winner_id == match.team2_id:
+                    winner_text = f"[green]→ {match.team2}[/green]"
+                else:
+                    winner_text = f"[yellow]? {match.winner}[/yellow]"
             else:
-                winner_text = f"[yellow]? {match.winner.name}[/yellow]"
-        else:
-            winner_text = "[grey]Pending[/grey]"
+                winner_text = "[grey]Pending[/grey]"
+            
+            table.add_row(
+                str(match.id),
+                match.team1,
+                "VS",
+                match.team2,
+                match.date.strftime("%Y-%m-%d") if match.date else "TBD",
+                winner_text
+            )
         
-        table.add_row(
-            str(match.id),
-            match.team1.name,
-            "VS",
-            match.team2.name,
-            match.date.strftime("%Y-%m-%d"),
-            winner_text
-        )
-    
-    console.print(table)
+        console.print(table)
+
+        if cursor is None or not Confirm.ask("Show next page?", default=False):
+            break
+        with session_scope() as session:
+            matches, cursor = operations.match_history_rows(session, page_size, after=cursor)
+        page += 1
 
 def show_leaderboard():
     console.print(Panel("🏆 Esports Leaderboard", style="bold blue"))
+
+    genre = Prompt.ask(
+        "[bold]Genre[/bold] (Enter for all games)",
+        choices=[""] + operations.VALID_GENRES,
+        default="",
+        show_choices=False
+    )
     
-    teams = session.scalars(
-        select(Team)
-        .options(
-            joinedload(Team.matches_as_team1),
-            joinedload(Team.matches_as_team2),
-            joinedload(Team.wins)
-        )
-    ).unique().all()
+    with session_scope() as session:
+        leaderboard = operations.leaderboard(session, genre=genre or None)
 
-    if not teams:
+    if not leaderboard:
         console.print("[yellow]ℹ No teams found in the system[/yellow]")
         return
 
-    leaderboard = []
-    for team in teams:
-        all_matches = team.matches_as_team1 + team.matches_as_team2
-        completed_matches = [m for m in all_matches if m.winner_id is not None]
-        
-        wins = len(team.wins)
-        losses = len(completed_matches) - wins
-        win_rate = (wins / len(completed_matches)) * 100 if completed_matches else 0
-        
-        recent_matches = sorted(
-            all_matches, 
-            key=lambda m: m.date if m.date else m.date.min, 
-            reverse=True
-        )[:5]
-        recent_form = "".join(
-            "W" if m.winner_id == team.id else "L" 
-            for m in recent_matches 
-            if m.winner_id is not None
-        ) or "-"
-        
-        leaderboard.append({
-            "id": team.id,
-            "name": team.name,
-            "game": team.genre,
-            "rating": team.rankings or 1000,  
-            "wins": wins,
-            "losses": losses,
-            "win_rate": win_rate,
-            "form": recent_form
-        })
-
-    leaderboard.sort(key=lambda x: x["rating"], reverse=True)
-
-    table = Table(show_header=True, header_style="bold magenta")
+    table = Table(title=f"🏆 {genre}" if genre else None, show_header=True, header_style="bold magenta")
     table.add_column("#", style="cyan", justify="right")
     table.add_column("Team", style="green")
     table.add_column("Game", style="yellow")
@@ -466,7 +360,8 @@ def update_team():
     list_teams()
     team_id = Prompt.ask("\nEnter team ID to update", default="0")
     try:
-        team = session.get(Team, int(team_id))
+        with session_scope() as session:
+            team = session.get(Team, int(team_id))
     except ValueError:
         console.print("[red]✗ Invalid team ID - must be a number[/red]")
         return
@@ -475,13 +370,11 @@ def update_team():
         return
     new_name = Prompt.ask("New team name", default=team.name)
     new_genre = Prompt.ask("New genre", default=team.genre)
-    setattr(team, "name", new_name)
-    setattr(team, "genre", new_genre)
     try:
-        session.commit()
+        with session_scope() as session:
+            team = operations.update_team(session, team.id, new_name, new_genre)
         console.print(f"[green]✓ Team updated: {team.name} ({team.genre})[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error updating team: {str(e)}[/red]")
 
 def delete_team():
@@ -489,7 +382,8 @@ def delete_team():
     list_teams()
     team_id = Prompt.ask("\nEnter team ID to delete", default="0")
     try:
-        team = session.get(Team, int(team_id))
+        with session_scope() as session:
+            team = session.get(Team, int(team_id))
     except ValueError:
         console.print("[red]✗ Invalid team ID - must be a number[/red]")
         return
@@ -501,11 +395,10 @@ def delete_team():
         console.print("[yellow]Cancelled.[/yellow]")
         return
     try:
-        session.delete(team)
-        session.commit()
+        with session_scope() as session:
+            operations.delete_team(session, team.id)
         console.print(f"[green]✓ Team deleted[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error deleting team: {str(e)}[/red]")
 
 def update_player():
@@ -513,7 +406,8 @@ def update_player():
     list_players()
     player_id = Prompt.ask("\nEnter player ID to update", default="0")
     try:
-        player = session.get(Player, int(player_id))
+        with session_scope() as session:
+            player = session.get(Player, int(player_id))
     except ValueError:
         console.print("[red]✗ Invalid player ID - must be a number[/red]")
         return
@@ -522,13 +416,11 @@ def update_player():
         return
     new_name = Prompt.ask("New player name", default=player.name)
     new_role = Prompt.ask("New role", default=player.role)
-    setattr(player, "name", new_name)
-    setattr(player, "role", new_role)
     try:
-        session.commit()
+        with session_scope() as session:
+            player = operations.update_player(session, player.id, new_name, new_role)
         console.print(f"[green]✓ Player updated: {player.name} ({player.role})[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error updating player: {str(e)}[/red]")
 
 def delete_player():
@@ -536,7 +428,8 @@ def delete_player():
     list_players()
     player_id = Prompt.ask("\nEnter player ID to delete", default="0")
     try:
-        player = session.get(Player, int(player_id))
+        with session_scope() as session:
+            player = session.get(Player, int(player_id))
     except ValueError:
         console.print("[red]✗ Invalid player ID - must be a number[/red]")
         return
@@ -548,11 +441,10 @@ def delete_player():
         console.print("[yellow]Cancelled.[/yellow]")
         return
     try:
-        session.delete(player)
-        session.commit()
+        with session_scope() as session:
+            operations.delete_player(session, player.id)
         console.print(f"[green]✓ Player deleted[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error deleting player: {str(e)}[/red]")
 
 def update_match():
@@ -560,7 +452,8 @@ def update_match():
     match_history()
     match_id = Prompt.ask("\nEnter match ID to update", default="0")
     try:
-        match = session.get(Match, int(match_id))
+        with session_scope() as session:
+            match = session.get(Match, int(match_id))
     except ValueError:
         console.print("[red]✗ Invalid match ID - must be a number[/red]")
         return
@@ -569,13 +462,11 @@ def update_match():
         return
     new_date = Prompt.ask("New match date (YYYY-MM-DD)", default=match.date.strftime("%Y-%m-%d") if match.date is not None else "")
     try:
-        if new_date:
-            setattr(match, "date", datetime.strptime(new_date, "%Y-%m-%d").date())
         # If new_date is empty, do not change match.date
-        session.commit()
+        with session_scope() as session:
+            match = operations.update_match(session, match.id, new_date)
         console.print(f"[green]✓ Match date updated to {match.date}[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error updating match: {str(e)}[/red]")
 
 def delete_match():
@@ -583,7 +474,8 @@ def delete_match():
     match_history()
     match_id = Prompt.ask("\nEnter match ID to delete", default="0")
     try:
-        match = session.get(Match, int(match_id))
+        with session_scope() as session:
+            match = session.get(Match, int(match_id))
     except ValueError:
         console.print("[red]✗ Invalid match ID - must be a number[/red]")
         return
@@ -595,10 +487,9 @@ def delete_match():
         console.print("[yellow]Cancelled.[/yellow]")
         return
     try:
-        session.delete(match)
-        session.commit()
+        with session_scope() as session:
+            operations.delete_match(session, match.id)
         console.print(f"[green]✓ Match deleted[/green]")
     except Exception as e:
-        session.rollback()
         console.print(f"[red]✗ Error deleting match: {str(e)}[/red]")
 
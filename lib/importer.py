@@ -0,0 +1,288 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from sqlalchemy import select, insert, func
+from db.models import Team, Player, Match, TeamStats, PlayerMatchStats
+from operations import VALID_GENRES, roles_for_genre, parse_date
+from ratings import INITIAL_RATING
+from stats import REFRESH_LIMIT
+
+DEFAULT_BATCH_SIZE = 1000
+# Rejected rows kept in the report for display. Any more are only counted,
+# so a mostly bad file streams like a good one; every reject still goes to
+# the rejects file when there is one.
+MAX_KEPT_REJECTS = 10
+
+
+class ImportReport:
+    def __init__(self, kind, rejects=None):
+        self.kind = kind
+        self.inserted = 0
+        self.rejected = []
+        self.rejected_count = 0
+        self.rejects = rejects
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, lineno, row, reason):
+        rejected = {"line": lineno, "row": row, "reason": reason}
+        self.rejected_count += 1
+        if self.rejects:
+            self.rejects.write(json.dumps(rejected, default=str) + "\n")
+        if len(self.rejected) < MAX_KEPT_REJECTS:
+            self.rejected.append(rejected)
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "inserted": self.inserted,
+            "rejected": self.rejected_count,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+
+def detect_format(path):
+    return "jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_rows(stream, fmt):
+    # Yields (line number, row dict) without materialising the file.
+    if fmt == "jsonl":
+        for lineno, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield lineno, {"_error": f"invalid JSON: {e}"}
+                continue
+            yield lineno, row if isinstance(row, dict) else {"_error": "expected a JSON object"}
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key.strip(): (value or "").strip() for key, value in row.items() if key}
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class TeamDirectory:
+    # Team name/id lookups for the whole import, loaded with one query.
+    def __init__(self, session):
+        self.by_name = {}
+        self.genres = {}
+        for team_id, name, genre in session.execute(select(Team.id, Team.name, Team.genre)):
+            self.by_name.setdefault(name, team_id)
+            self.genres[team_id] = genre
+        self.next_id = (session.scalar(select(func.max(Team.id))) or 0) + 1
+
+    def add(self, name, genre):
+        team_id = self.next_id
+        self.next_id += 1
+        self.by_name[name] = team_id
+        self.genres[team_id] = genre
+        return team_id
+
+    def resolve(self, value):
+        if value is None or value == "":
+            return None
+        if isinstance(value, int) or str(value).isdigit():
+            team_id = int(value)
+            return team_id if team_id in self.genres else None
+        return self.by_name.get(value)
+
+
+def team_mapping(row, teams):
+    name = row.get("name")
+    genre = row.get("genre")
+    if not name:
+        raise ValueError("missing team name")
+    if genre not in VALID_GENRES:
+        raise ValueError(f"invalid genre '{genre}'")
+    if name in teams.by_name:
+        raise ValueError(f"team '{name}' already exists")
+    rankings = row.get("rankings")
+    return {
+        "id": teams.add(name, genre),
+        "name": name,
+        "genre": genre,
+        "rankings": int(rankings) if rankings not in (None, "") else None,
+    }
+
+
+def player_mapping(row, teams):
+    name = row.get("name")
+    if not name:
+        raise ValueError("missing player name")
+    team_id = teams.resolve(row.get("team_id") or row.get("team"))
+    if team_id is None:
+        raise ValueError(f"unknown team '{row.get('team_id') or row.get('team')}'")
+    role = row.get("role")
+    valid_roles = roles_for_genre(teams.genres[team_id])
+    if valid_roles and role not in valid_roles:
+        raise ValueError(f"invalid role '{role}' for {teams.genres[team_id]}")
+    return {"name": name, "role": role, "team_id": team_id}
+
+
+def fixture_mapping(row, teams):
+    team1_id = teams.resolve(row.get("team1_id") or row.get("team1"))
+    team2_id = teams.resolve(row.get("team2_id") or row.get("team2"))
+    if team1_id is None or team2_id is None:
+        raise ValueError("one or both teams not found")
+    if team1_id == team2_id:
+        raise ValueError("a team cannot play against itself")
+    # A result would need a rating change and a rating_events row, which
+    # only simulation writes; imported fixtures are pending until simulated.
+    if row.get("winner_id") or row.get("winner"):
+        raise ValueError("fixtures are imported without results; leave winner empty")
+    return {
+        "team1_id": team1_id,
+        "team2_id": team2_id,
+        "date": parse_date(row.get("date")),
+    }
+
+
+class StatLineDirectory:
+    # Every player's team is loaded once; matches and existing stat lines are
+    # looked up per chunk, for only the matches that chunk mentions, by
+    # prefetch(). Directories without it need nothing per chunk.
+    def __init__(self, session):
+        self.session = session
+        self.player_teams = dict(session.execute(select(Player.id, Player.team_id)).all())
+        self.matches = {}
+        self.seen = set()
+
+    def prefetch(self, chunk):
+        match_ids = {row_id(row, "match") for _, row in chunk}
+        match_ids.discard(None)
+        self.matches = {}
+        self.seen = set()
+        # In pieces, so a large --batch-size stays under SQLite's limit on
+        # bound parameters.
+        for piece in chunked(sorted(match_ids), REFRESH_LIMIT):
+            self.matches.update(
+                (match_id, (team1_id, team2_id))
+                for match_id, team1_id, team2_id in self.session.execute(
+                    select(Match.id, Match.team1_id, Match.team2_id).where(Match.id.in_(piece))
+                )
+            )
+            self.seen.update(self.session.execute(
+                select(PlayerMatchStats.player_id, PlayerMatchStats.match_id)
+                .where(PlayerMatchStats.match_id.in_(piece))
+            ).tuples())
+
+
+def row_id(row, field):
+    value = row.get(f"{field}_id") or row.get(field)
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        return int(value)
+    return None
+
+
+def stat_count(row, field):
+    value = row.get(field)
+    if value is None or value == "":
+        return 0
+    if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+        return int(value)
+    raise ValueError(f"invalid {field} '{value}'")
+
+
+MVP_VALUES = {"1": True, "true": True, "yes": True, "0": False, "false": False, "no": False, "": False}
+
+
+def stat_line_mapping(row, lines):
+    player_id = row_id(row, "player")
+    match_id = row_id(row, "match")
+    if player_id not in lines.player_teams:
+        raise ValueError(f"unknown player '{row.get('player_id') or row.get('player')}'")
+    if match_id not in lines.matches:
+        raise ValueError(f"unknown match '{row.get('match_id') or row.get('match')}'")
+    team_id = lines.player_teams[player_id]
+    if team_id is None or team_id not in lines.matches[match_id]:
+        raise ValueError(f"player {player_id}'s team is not playing in match {match_id}")
+    if (player_id, match_id) in lines.seen:
+        raise ValueError(f"player {player_id} already has a stat line for match {match_id}")
+    mvp = row.get("mvp")
+    mvp = MVP_VALUES.get(str(mvp).lower()) if mvp is not None else False
+    if mvp is None:
+        raise ValueError(f"invalid mvp '{row.get('mvp')}'")
+    lines.seen.add((player_id, match_id))
+    return {
+        "player_id": player_id,
+        "match_id": match_id,
+        "team_id": team_id,
+        "kills": stat_count(row, "kills"),
+        "deaths": stat_count(row, "deaths"),
+        "assists": stat_count(row, "assists"),
+        "mvp": mvp,
+    }
+
+
+# kind -> (model, row mapping, lookup the mapping validates against)
+IMPORTERS = {
+    "teams": (Team, team_mapping, TeamDirectory),
+    "players": (Player, player_mapping, TeamDirectory),
+    "fixtures": (Match, fixture_mapping, TeamDirectory),
+    "player-stats": (PlayerMatchStats, stat_line_mapping, StatLineDirectory),
+}
+
+
+def import_rows(session, kind, rows, batch_size=DEFAULT_BATCH_SIZE, rejects=None):
+    # Everything is staged on the caller's session; nothing is committed
+    # here, so the whole file lands in a single transaction. Rejected rows
+    # are written to the rejects stream, if given, as they are found.
+    if kind not in IMPORTERS:
+        raise ValueError(f"Invalid kind '{kind}'. Choose from: {', '.join(IMPORTERS)}")
+    model, to_mapping, directory = IMPORTERS[kind]
+    report = ImportReport(kind, rejects)
+    lookup = directory(session)
+    prefetch = getattr(lookup, "prefetch", None)
+    started = time.perf_counter()
+
+    for chunk in chunked(rows, batch_size):
+        mappings = []
+        if prefetch:
+            prefetch(chunk)
+        for lineno, row in chunk:
+            if "_error" in row:
+                report.reject(lineno, row, row["_error"])
+                continue
+            try:
+                mappings.append(to_mapping(row, lookup))
+            except (TypeError, ValueError) as e:
+                report.reject(lineno, row, str(e))
+        if mappings:
+            session.execute(insert(model), mappings)
+            report.inserted += len(mappings)
+            if model is Team:
+                session.execute(insert(TeamStats), [
+                    {"team_id": row["id"], "rating": row["rankings"] or INITIAL_RATING}
+                    for row in mappings
+                ])
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def import_file(session, kind, path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, rejects_path=None):
+    rejects = open(rejects_path, "w") if rejects_path else None
+    try:
+        with open(path, newline="") as stream:
+            return import_rows(session, kind, read_rows(stream, fmt or detect_format(path)), batch_size, rejects)
+    finally:
+        if rejects:
+            rejects.close()
@@ -0,0 +1,168 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from rich.console import Group
+from rich.panel import Panel
+from rich.table import Table
+from rich import box
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+# Opt-in SQL instrumentation for the interactive menu. While an action runs,
+# engine cursor events count its statements and time each one, and the
+# Session's do_orm_execute hook counts the rows selects return (a DBAPI
+# cursor can't tell how many rows will be fetched from it). Statements
+# slower than the threshold are kept with their parameters and explained
+# with EXPLAIN QUERY PLAN once the action has finished, so the extra
+# queries don't count against it.
+#
+#   ESPORTS_PROFILE=1                    panel after every menu action
+#   ESPORTS_PROFILE_JSON=profile.json    also write all reports on exit
+#   ESPORTS_SLOW_MS=20                   slow-query threshold
+
+SLOW_QUERY_MS = 20
+MAX_SLOW_QUERIES = 20
+
+
+class ActionProfile:
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.elapsed = 0.0
+        self.slow = []
+
+    def as_dict(self):
+        return {
+            "action": self.name,
+            "queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 3),
+            "rows": self.rows,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+            "slow_queries": self.slow,
+        }
+
+
+class Profiler:
+    def __init__(self, engine, slow_ms=SLOW_QUERY_MS, json_path=None):
+        self.engine = engine
+        self.slow_ms = slow_ms
+        self.json_path = json_path
+        self.current = None
+        self.actions = []
+
+    def install(self):
+        event.listen(self.engine, 'before_cursor_execute', self.before_execute)
+        event.listen(self.engine, 'after_cursor_execute', self.after_execute)
+        event.listen(Session, 'do_orm_execute', self.count_rows)
+        return self
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.current is not None:
+            conn.info['query_started'] = time.perf_counter()
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profile = self.current
+        started = conn.info.pop('query_started', None)
+        if profile is None or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        profile.queries += 1
+        profile.db_time += elapsed
+        # Selects are counted in count_rows; sqlite3 reports -1 for them.
+        if cursor.rowcount > 0:
+            profile.rows += cursor.rowcount
+        if elapsed * 1000 >= self.slow_ms and len(profile.slow) < MAX_SLOW_QUERIES:
+            profile.slow.append({
+                "statement": statement,
+                "parameters": list(parameters[0] if executemany else parameters),
+                "ms": round(elapsed * 1000, 3),
+                "plan": None,
+            })
+
+    def count_rows(self, orm_execute_state):
+        if self.current is None or not orm_execute_state.is_select:
+            return None
+        # Streamed queries would have to be buffered to be counted.
+        options = orm_execute_state.execution_options
+        if options.get('yield_per') or options.get('stream_results'):
+            return None
+        frozen = orm_execute_state.invoke_statement().freeze()
+        self.current.rows += len(frozen.data)
+        return frozen()
+
+    def explain(self, profile):
+        if self.engine.dialect.name != 'sqlite':
+            return
+        with self.engine.connect() as conn:
+            for slow in profile.slow:
+                if not slow["statement"].lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                    continue
+                # Runs in the action's finally block, so a statement that can't
+                # be explained on a fresh connection (a temp table, a dropped
+                # table, parameters that no longer bind) must not replace the
+                # action's own result or exception.
+                try:
+                    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {slow['statement']}", tuple(slow["parameters"]))
+                    slow["plan"] = [row[-1] for row in rows]
+                except SQLAlchemyError as error:
+                    slow["plan"] = [f"plan unavailable: {error.orig or error}"]
+
+    @contextmanager
+    def action(self, name):
+        profile = ActionProfile(name)
+        self.current = profile
+        started = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.elapsed = time.perf_counter() - started
+            self.current = None
+            self.explain(profile)
+            self.actions.append(profile)
+
+    def panel(self, profile):
+        summary = (
+            f"[bold]{profile.queries}[/bold] queries, [bold]{profile.db_time * 1000:.1f} ms[/bold] in the database, "
+            f"[bold]{profile.rows}[/bold] rows, {profile.elapsed * 1000:.0f} ms in total"
+        )
+        if not profile.slow:
+            return Panel(summary, title=f"[bold]SQL: {profile.name}[/bold]", border_style="dim", box=box.SQUARE)
+
+        table = Table(show_header=True, header_style="bold magenta", box=box.SIMPLE)
+        table.add_column("ms", style="red", justify="right")
+        table.add_column("Statement")
+        table.add_column("Plan", style="cyan")
+        for slow in profile.slow:
+            table.add_row(
+                f"{slow['ms']:.1f}",
+                " ".join(slow["statement"].split()),
+                "\n".join(slow["plan"] or ["-"]),
+            )
+        return Panel(
+            Group(summary, table),
+            title=f"[bold]SQL: {profile.name}[/bold]",
+            subtitle=f"[italic]queries over {self.slow_ms:g} ms[/italic]",
+            border_style="yellow",
+            box=box.SQUARE,
+        )
+
+    def report(self):
+        return [profile.as_dict() for profile in self.actions]
+
+    def export(self):
+        if self.json_path:
+            with open(self.json_path, "w") as stream:
+                json.dump({"slow_ms": self.slow_ms, "actions": self.report()}, stream, indent=2, default=str)
+
+
+def from_environment(engine):
+    # None unless profiling was asked for, so the menu pays nothing for it.
+    json_path = os.environ.get("ESPORTS_PROFILE_JSON")
+    if not (os.environ.get("ESPORTS_PROFILE") or json_path):
+        return None
+    slow_ms = float(os.environ.get("ESPORTS_SLOW_MS", SLOW_QUERY_MS))
+    return Profiler(engine, slow_ms, json_path).install()
@@ -0,0 +1,17 @@
+# NumPy is optional, and importing it takes longer than starting the rest of
+# the CLI. Modules that can use it (forecasts, Glicko-2 rating periods) load
+# it on first use with load_numpy(), which returns None when it isn't
+# installed so they can fall back to plain Python.
+
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
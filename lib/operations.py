@@ -0,0 +1,741 @@
+import random
+from datetime import datetime, date
+from sqlalchemy import select, update, delete, func, or_, and_, case, union_all, literal
+from sqlalchemy.orm import aliased
+from db.models import Team, Player, Match, TeamStats, RatingEvent, SimulationRun, PlayerMatchStats
+from ratings import INITIAL_RATING, simulate_sharded, simulate_batch, load_pending, pending_query
+from cache import cached
+import stats
+
+# Prompt-free versions of the helpers actions. They validate input, stage
+# changes on the given session and leave committing to the caller, so the
+# interactive menu commits once per action and batch mode once per batch.
+
+VALID_GENRES = [
+    'Pes',
+    'Fifa',
+    'Valorant',
+    'CS2',
+    'Dota 2',
+    'League of Legends',
+    'Overwatch',
+    'Call of duty'
+]
+
+GENRE_ROLES = {
+    'call of duty': ['Slayer', 'Support', 'Objective', 'Anchor'],
+    'valorant': ['Duelist', 'Initiator', 'Sentinel', 'Controller'],
+    'cs2': ['AWPer', 'Rifler', 'Support', 'IGL'],
+}
+
+
+def roles_for_genre(genre):
+    return GENRE_ROLES.get((genre or "").lower(), [])
+
+
+def parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+
+def parse_id(value, kind):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {kind} ID - must be a number")
+
+
+# Deleting a team leaves its matches behind with the team column nulled.
+DELETED_TEAM = "(deleted team)"
+
+
+def get_team(session, team_id):
+    team = session.get(Team, parse_id(team_id, "team"))
+    if not team:
+        raise ValueError(f"No team found with ID {team_id}")
+    return team
+
+
+def get_player(session, player_id):
+    player = session.get(Player, parse_id(player_id, "player"))
+    if not player:
+        raise ValueError(f"No player found with ID {player_id}")
+    return player
+
+
+def get_match(session, match_id):
+    match = session.get(Match, parse_id(match_id, "match"))
+    if not match:
+        raise ValueError(f"No match found with ID {match_id}")
+    return match
+
+
+# Read paths return plain rows (tuples with named fields) selected column
+# by column rather than ORM entities: nothing lands in the identity map and
+# a row costs a fraction of the memory of a mapped instance.
+
+def list_teams(session):
+    return session.execute(
+        select(Team.id, Team.name, Team.genre, Team.rankings).order_by(Team.id)
+    ).all()
+
+
+@cached('teams')
+def team_rows(session):
+    return tuple(list_teams(session))
+
+
+def create_team(session, name, genre):
+    if genre not in VALID_GENRES:
+        raise ValueError(f"Invalid genre '{genre}'. Choose from: {', '.join(VALID_GENRES)}")
+
+    team = Team(name=name, genre=genre, rankings=None, stats=TeamStats())
+    session.add(team)
+    session.flush()
+    return team
+
+
+def update_team(session, team_id, name=None, genre=None):
+    team = get_team(session, team_id)
+    if name:
+        team.name = name
+    if genre:
+        team.genre = genre
+    return team
+
+
+def delete_team(session, team_id):
+    team = get_team(session, team_id)
+    # Deleting a team nulls the team/winner columns of its matches, which
+    # changes the record of every opponent it has a result against.
+    opponents = {
+        opponent
+        for pair in session.execute(
+            select(Match.team1_id, Match.team2_id)
+            .where(or_(Match.team1_id == team.id, Match.team2_id == team.id))
+            .where(Match.winner_id != None)
+        )
+        for opponent in pair
+        if opponent != team.id
+    }
+    # The team's players go with it, and so do their stat lines.
+    session.execute(delete(PlayerMatchStats).where(
+        PlayerMatchStats.player_id.in_(select(Player.id).where(Player.team_id == team.id))
+    ))
+    session.delete(team)
+    stats.refresh_teams(session, opponents)
+    return team
+
+
+def list_players(session, team_id):
+    team = get_team(session, team_id)
+    players = session.execute(players_query(team.id)).all()
+    return team, players
+
+
+def players_query(team_id):
+    return (
+        select(Player.id, Player.name, Player.role, Player.team_id)
+        .where(Player.team_id == team_id)
+        .order_by(Player.name)
+    )
+
+
+def add_player(session, team_id, name, role):
+    team = get_team(session, team_id)
+    valid_roles = roles_for_genre(team.genre)
+    if valid_roles and role not in valid_roles:
+        raise ValueError(f"Invalid role '{role}' for {team.genre}. Choose from: {', '.join(valid_roles)}")
+
+    player = Player(name=name, role=role, team_id=team.id)
+    session.add(player)
+    session.flush()
+    return player
+
+
+def update_player(session, player_id, name=None, role=None):
+    player = get_player(session, player_id)
+    if name:
+        player.name = name
+    if role:
+        player.role = role
+    return player
+
+
+def delete_player(session, player_id):
+    player = get_player(session, player_id)
+    session.execute(delete(PlayerMatchStats).where(PlayerMatchStats.player_id == player.id))
+    session.delete(player)
+    return player
+
+
+def schedule_match(session, team1_id, team2_id, match_date=None):
+    team1_id, team2_id = parse_id(team1_id, "team"), parse_id(team2_id, "team")
+    if team1_id == team2_id:
+        raise ValueError("A team cannot play against itself")
+
+    teams = {
+        team.id: team
+        for team in session.scalars(select(Team).where(Team.id.in_([team1_id, team2_id])))
+    }
+    if len(teams) != 2:
+        raise ValueError("One or both teams not found")
+
+    parsed_date = parse_date(match_date)
+    if parsed_date and parsed_date < datetime.now().date():
+        raise ValueError("Date cannot be in the past")
+
+    match = Match(team1_id=team1_id, team2_id=team2_id, date=parsed_date)
+    session.add(match)
+    session.flush()
+    return match, teams[team1_id], teams[team2_id]
+
+
+def update_match(session, match_id, match_date=None):
+    match = get_match(session, match_id)
+    parsed_date = parse_date(match_date)
+    if parsed_date:
+        match.date = parsed_date
+        if match.winner_id is not None:
+            stats.refresh_teams(session, [match.team1_id, match.team2_id])
+    return match
+
+
+def delete_match(session, match_id):
+    match = get_match(session, match_id)
+    session.execute(delete(PlayerMatchStats).where(PlayerMatchStats.match_id == match.id))
+    session.delete(match)
+    if match.winner_id is not None:
+        stats.refresh_teams(session, [match.team1_id, match.team2_id])
+    return match
+
+
+def simulate_matches(session, seed=None, workers=None, system=None):
+    # Each genre is its own rating pool; large runs simulate them in
+    # parallel and everything is written back in the caller's transaction.
+    from rating_systems import get_system
+    batch = simulate_sharded(session, workers, seed, get_system(system))
+    stats.apply_batch(session, batch)
+    return batch
+
+
+SIMULATION_CHUNK_SIZE = 10000
+
+
+def unfinished_run(session):
+    return session.scalars(
+        select(SimulationRun).where(SimulationRun.status == 'running').order_by(SimulationRun.id.desc())
+    ).first()
+
+
+def start_simulation(session, chunk_size=SIMULATION_CHUNK_SIZE, seed=None, workers=None, system=None):
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least 1")
+    from rating_systems import get_system
+    system = get_system(system)
+    run = unfinished_run(session)
+    if run:
+        raise ValueError(
+            f"Simulation run {run.id} stopped after {run.processed} of {run.total} matches. "
+            "Resume it or abandon it first."
+        )
+
+    pending = pending_query().subquery()
+    cutoff_id, total = session.execute(select(func.max(pending.c.id), func.count())).one()
+    now = datetime.now()
+    run = SimulationRun(
+        # Unseeded runs get a seed too, so a resumed run draws exactly what
+        # the uninterrupted one would have.
+        seed=random.getrandbits(63) if seed is None else seed,
+        chunk_size=chunk_size,
+        workers=workers,
+        rating_system=system.name,
+        cutoff_id=cutoff_id or 0,
+        total=total,
+        processed=0,
+        status='running',
+        started_at=now,
+        updated_at=now,
+    )
+    session.add(run)
+    session.flush()
+    return run
+
+
+def resume_simulation(session):
+    run = unfinished_run(session)
+    if not run:
+        raise ValueError("No interrupted simulation run to resume")
+    return run
+
+
+def abandon_simulation(session):
+    run = resume_simulation(session)
+    run.status = 'abandoned'
+    run.updated_at = datetime.now()
+    return run
+
+
+def simulate_chunks(session, run):
+    # Simulates the run's remaining matches chunk_size at a time, in date
+    # order, yielding each chunk once its results and the run's checkpoint
+    # are staged. The caller commits after every chunk (and once more at the
+    # end, for the finished status), so each commit holds the write lock
+    # briefly and a crash loses at most the chunk in progress. Committed
+    # results are no longer pending, which is all a resume needs. Runs from
+    # before rating systems were recorded are ELO runs.
+    from rating_systems import get_system
+    system = get_system(run.rating_system or 'elo')
+    while True:
+        batch = load_pending(session, run.cutoff_id, run.chunk_size, whole_days=system.periodic)
+        if not len(batch):
+            break
+        results = simulate_batch(session, batch, run.workers, run.seed, system)
+        stats.apply_batch(session, results)
+        run.processed += len(batch)
+        run.last_match_id = batch.match_ids[-1]
+        run.last_date = batch.dates[-1]
+        run.updated_at = datetime.now()
+        yield results
+    run.status = 'finished'
+    run.updated_at = datetime.now()
+
+
+def verify_ratings(session, fix=False, system=None):
+    from rating_systems import get_system
+    system = get_system(system)
+    ratings, state, replayed, skipped = system.replay(session)
+    teams = session.execute(select(Team.id, Team.name, Team.rankings).order_by(Team.id)).all()
+    mismatches = [
+        {"id": team_id, "name": name, "stored": rankings, "replayed": ratings.get(team_id, INITIAL_RATING)}
+        for team_id, name, rankings in teams
+        if (rankings or INITIAL_RATING) != ratings.get(team_id, INITIAL_RATING)
+    ]
+    if fix and mismatches:
+        session.execute(update(Team), [{"id": m["id"], "rankings": m["replayed"]} for m in mismatches])
+        session.execute(update(TeamStats), [{"team_id": m["id"], "rating": m["replayed"]} for m in mismatches])
+    if fix and system.state and teams:
+        # Deviations and volatilities aren't compared, only replaced.
+        rows = []
+        for team_id, _, _ in teams:
+            deviation, volatility = state.get(team_id, (None, None))
+            rows.append({"id": team_id, "rating_deviation": deviation, "rating_volatility": volatility})
+        session.execute(update(Team), rows)
+    return {
+        "system": system.name,
+        "teams": len(teams),
+        "replayed": replayed,
+        "skipped": skipped,
+        "mismatches": mismatches,
+        "fixed": bool(fix and mismatches),
+    }
+
+
+def rebuild_stats(session):
+    return stats.rebuild_stats(session)
+
+
+HISTORY_PAGE_SIZE = 20
+MATCH_STATUSES = ['pending', 'completed']
+
+
+def match_history_query(team_id=None, genre=None, date_from=None, date_to=None, status=None, after=None):
+    # Newest first, keyed on (date, id) so a page can resume from the last
+    # row of the previous one. SQLite sorts NULL dates last when descending.
+    team1, team2, winner = aliased(Team), aliased(Team), aliased(Team)
+    query = (
+        select(
+            Match.id,
+            Match.team1_id,
+            func.coalesce(team1.name, DELETED_TEAM).label("team1"),
+            Match.team2_id,
+            func.coalesce(team2.name, DELETED_TEAM).label("team2"),
+            Match.date,
+            Match.winner_id,
+            winner.name.label("winner"),
+        )
+        .outerjoin(team1, Match.team1_id == team1.id)
+        .outerjoin(team2, Match.team2_id == team2.id)
+        .outerjoin(winner, Match.winner_id == winner.id)
+        .order_by(Match.date.desc(), Match.id.desc())
+    )
+
+    if team_id is not None:
+        query = query.where(or_(Match.team1_id == team_id, Match.team2_id == team_id))
+    if genre:
+        query = query.where(Match.team1_id.in_(select(Team.id).where(Team.genre == genre)))
+    if date_from:
+        query = query.where(Match.date >= parse_date(date_from))
+    if date_to:
+        query = query.where(Match.date <= parse_date(date_to))
+    if status == 'pending':
+        query = query.where(Match.winner_id == None)
+    elif status == 'completed':
+        query = query.where(Match.winner_id != None)
+
+    # Dated and undated matches are paged separately so that each page is
+    # an index range seek; match_history_page moves on to the NULL dates
+    # once the dated ones run out.
+    if after is not None:
+        after_date, after_id = after
+        if after_date is None:
+            query = query.where(Match.date == None)
+            if after_id is not None:
+                query = query.where(Match.id < after_id)
+        else:
+            query = query.where(or_(
+                Match.date < after_date,
+                and_(Match.date == after_date, Match.id < after_id)
+            ))
+    return query
+
+
+def match_cursor(match):
+    return (match.date, match.id)
+
+
+def format_cursor(cursor):
+    if cursor is None:
+        return None
+    match_date, match_id = cursor
+    return f"{match_date.isoformat() if match_date else ''}:{match_id}"
+
+
+def parse_cursor(value):
+    if not value:
+        return None
+    try:
+        match_date, match_id = value.rsplit(":", 1)
+        return parse_date(match_date), int(match_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor '{value}'")
+
+
+def match_history_page(session, page_size=HISTORY_PAGE_SIZE, after=None, **filters):
+    # One extra row tells us whether there is another page without a COUNT.
+    limit = page_size + 1
+    matches = session.execute(
+        match_history_query(after=after, **filters).limit(limit)
+    ).all()
+    if after is not None and after[0] is not None and len(matches) < limit:
+        matches += session.execute(
+            match_history_query(after=(None, None), **filters).limit(limit - len(matches))
+        ).all()
+    next_cursor = match_cursor(matches[page_size - 1]) if len(matches) > page_size else None
+    return matches[:page_size], next_cursor
+
+
+@cached('matches', 'teams')
+def match_history_rows(session, page_size=HISTORY_PAGE_SIZE, after=None, **filters):
+    matches, cursor = match_history_page(session, page_size, after, **filters)
+    return tuple(matches), cursor
+
+
+def iter_match_history(session, chunk_size=1000, **filters):
+    result = session.execute(
+        match_history_query(**filters).execution_options(yield_per=chunk_size)
+    )
+    for match in result:
+        yield match
+
+
+def leaderboard_query():
+    return (
+        select(
+            Team.id, Team.name, Team.genre,
+            TeamStats.rating, TeamStats.wins, TeamStats.losses, TeamStats.form
+        )
+        .join(TeamStats, TeamStats.team_id == Team.id)
+        .order_by(TeamStats.rating.desc())
+    )
+
+
+def match_results():
+    # One row per team per completed match, with 1 for a win.
+    return union_all(*(
+        select(
+            team_id.label("team_id"), Match.date, Match.id.label("match_id"),
+            case((Match.winner_id == team_id, 1), else_=0).label("won"),
+        ).where(Match.winner_id != None)
+        for team_id in (Match.team1_id, Match.team2_id)
+    )).subquery()
+
+
+def results_leaderboard_query():
+    # The leaderboard computed from match history in one query rather than
+    # read from team_stats: ROW_NUMBER numbers each team's results newest
+    # first, and the last FORM_LENGTH of them are folded into the form
+    # string by conditional aggregation, so SQLite returns one row per team.
+    results = match_results()
+    position = func.row_number().over(
+        partition_by=results.c.team_id, order_by=(results.c.date.desc(), results.c.match_id.desc())
+    ).label("position")
+    ranked = select(results.c.team_id, results.c.won, position).subquery()
+
+    form = literal("")
+    for n in range(1, stats.FORM_LENGTH + 1):
+        result = case((ranked.c.won == 1, "W"), else_="L")
+        form = form + func.coalesce(func.max(case((ranked.c.position == n, result))), "")
+    totals = (
+        select(
+            ranked.c.team_id,
+            func.sum(ranked.c.won).label("wins"),
+            (func.count() - func.sum(ranked.c.won)).label("losses"),
+            form.label("form"),
+        )
+        .group_by(ranked.c.team_id)
+        .subquery()
+    )
+
+    rating = func.coalesce(Team.rankings, INITIAL_RATING)
+    return (
+        select(
+            Team.id, Team.name, Team.genre, rating.label("rating"),
+            func.coalesce(totals.c.wins, 0), func.coalesce(totals.c.losses, 0), totals.c.form,
+        )
+        .outerjoin(totals, totals.c.team_id == Team.id)
+        .order_by(rating.desc(), Team.id)
+    )
+
+
+LEADERBOARD_SOURCES = {
+    "stats": leaderboard_query,
+    "matches": results_leaderboard_query,
+}
+
+
+def leaderboard_row(team_id, name, genre, rating, wins, losses, form):
+    return {
+        "id": team_id,
+        "name": name,
+        "game": genre,
+        "rating": rating,
+        "wins": wins,
+        "losses": losses,
+        "win_rate": (wins / (wins + losses)) * 100 if wins + losses else 0,
+        "form": form or "-"
+    }
+
+
+def leaderboard(session, limit=None, genre=None, source="stats"):
+    if source not in LEADERBOARD_SOURCES:
+        raise ValueError(f"Invalid leaderboard source '{source}'. Choose from: {', '.join(LEADERBOARD_SOURCES)}")
+    query = LEADERBOARD_SOURCES[source]()
+    if genre:
+        query = query.where(Team.genre == genre)
+    return [leaderboard_row(*row) for row in session.execute(query.limit(limit))]
+
+
+def leaderboard_by_genre(session, limit=None):
+    # Genres are separate rating pools, so each gets its own ranking; one
+    # query with ROW_NUMBER per genre rather than one query per genre.
+    position = func.row_number().over(
+        partition_by=Team.genre, order_by=TeamStats.rating.desc()
+    ).label("position")
+    ranked = leaderboard_query().order_by(None).add_columns(position).subquery()
+    query = select(ranked).order_by(ranked.c.genre, ranked.c.position)
+    if limit:
+        query = query.where(ranked.c.position <= limit)
+
+    boards = {}
+    for *row, _ in session.execute(query):
+        boards.setdefault(row[2], []).append(leaderboard_row(*row))
+    return boards
+
+
+# Player leaderboards aggregate player_match_stats in SQL. The table is
+# clustered on (player_id, match_id), so the per-player totals are one
+# ordered scan; only the top rows are joined to players and teams.
+PLAYER_SORTS = ["kd", "kills", "assists", "mvps", "matches"]
+PLAYER_LEADERBOARD_SIZE = 20
+
+
+def player_totals(genre=None, role=None, per_team=False):
+    lines = PlayerMatchStats
+    query = (
+        select(
+            lines.player_id,
+            *([lines.team_id] if per_team else []),
+            func.count().label("matches"),
+            func.sum(lines.kills).label("kills"),
+            func.sum(lines.deaths).label("deaths"),
+            func.sum(lines.assists).label("assists"),
+            func.sum(case((lines.mvp, 1), else_=0)).label("mvps"),
+        )
+        .group_by(lines.player_id, *([lines.team_id] if per_team else []))
+    )
+    if genre:
+        # The genre of the team the line was recorded for, not the player's
+        # current team.
+        query = query.where(lines.team_id.in_(select(Team.id).where(Team.genre == genre)))
+    if role:
+        query = query.where(lines.player_id.in_(select(Player.id).where(Player.role == role)))
+    return query
+
+
+def kill_death_ratio(kills, deaths):
+    return kills * 1.0 / func.coalesce(func.nullif(deaths, 0), 1)
+
+
+def player_leaderboard_query(sort="kd", genre=None, role=None, min_matches=1):
+    totals = player_totals(genre, role).having(func.count() >= min_matches).subquery()
+    kd = kill_death_ratio(totals.c.kills, totals.c.deaths).label("kd")
+    order = kd if sort == "kd" else totals.c[sort]
+    return (
+        select(
+            Player.id, Player.name, Player.role, Team.name, Team.genre,
+            totals.c.matches, totals.c.kills, totals.c.deaths, totals.c.assists, totals.c.mvps, kd,
+        )
+        .join(totals, totals.c.player_id == Player.id)
+        .outerjoin(Team, Team.id == Player.team_id)
+        .order_by(order.desc(), Player.id)
+    )
+
+
+def player_leaderboard_row(player_id, name, role, team, genre, matches, kills, deaths, assists, mvps, kd):
+    return {
+        "id": player_id,
+        "name": name,
+        "role": role,
+        "team": team,
+        "game": genre,
+        "matches": matches,
+        "kills": kills,
+        "deaths": deaths,
+        "assists": assists,
+        "mvps": mvps,
+        "kd": round(kd, 2),
+    }
+
+
+def check_player_filters(genre, role):
+    if genre and genre not in VALID_GENRES:
+        raise ValueError(f"Invalid genre '{genre}'. Choose from: {', '.join(VALID_GENRES)}")
+    # Genres without a role list take any role, as in add_player.
+    valid_roles = roles_for_genre(genre)
+    if role and valid_roles and role not in valid_roles:
+        raise ValueError(f"Invalid role '{role}' for {genre}. Choose from: {', '.join(valid_roles)}")
+
+
+def player_leaderboard(session, limit=PLAYER_LEADERBOARD_SIZE, sort="kd", genre=None, role=None, min_matches=1):
+    if sort not in PLAYER_SORTS:
+        raise ValueError(f"Invalid sort '{sort}'. Choose from: {', '.join(PLAYER_SORTS)}")
+    check_player_filters(genre, role)
+    query = player_leaderboard_query(sort, genre, role, max(min_matches, 1))
+    return [player_leaderboard_row(*row) for row in session.execute(query.limit(limit))]
+
+
+PLAYER_GROUPS = ["role", "genre"]
+
+
+def player_summary(session, by="role", genre=None):
+    # Totals per role (of the players' current roles) or per genre (of the
+    # teams the lines were recorded for). Roles are listed in add_player's
+    # order when a genre is given.
+    if by not in PLAYER_GROUPS:
+        raise ValueError(f"Invalid grouping '{by}'. Choose from: {', '.join(PLAYER_GROUPS)}")
+    check_player_filters(genre, None)
+    # Summed per player first, so only one row per player (and team, for
+    # genres) is joined rather than every stat line.
+    totals = player_totals(genre, per_team=by == "genre").subquery()
+    if by == "role":
+        key = Player.role
+        source = select(key).join(totals, totals.c.player_id == Player.id)
+    else:
+        key = Team.genre
+        source = select(key).join(totals, totals.c.team_id == Team.id)
+    query = (
+        source.add_columns(
+            func.count(func.distinct(totals.c.player_id)),
+            func.sum(totals.c.matches),
+            func.sum(totals.c.kills),
+            func.sum(totals.c.deaths),
+            func.sum(totals.c.assists),
+            func.sum(totals.c.mvps),
+        )
+        .group_by(key)
+        .order_by(key)
+    )
+
+    rows = [
+        {
+            by: group,
+            "players": players,
+            "lines": count,
+            "kills": kills,
+            "deaths": deaths,
+            "assists": assists,
+            "mvps": mvps,
+            "kills_per_match": round(kills / count, 2),
+            "kd": round(kills / (deaths or 1), 2),
+        }
+        for group, players, count, kills, deaths, assists, mvps in session.execute(query)
+    ]
+    order = roles_for_genre(genre) if by == "role" and genre else []
+    if order:
+        rows.sort(key=lambda row: order.index(row["role"]) if row["role"] in order else len(order))
+    return rows
+
+
+def leaderboard_at_query(on_date):
+    # Driven from teams: for each team, its last rating event on or before
+    # the date (latest date, then highest id, since ids follow simulation
+    # order rather than match date) and how many it had. Both correlated
+    # subqueries seek to the team in ix_rating_events_team_date and read
+    # only its entries up to the date, never the table itself. Teams with
+    # no event by then have no latest id and drop out of the join.
+    events = aliased(RatingEvent)
+    played = (
+        select(func.count())
+        .where(events.team_id == Team.id, events.date <= on_date)
+        .scalar_subquery()
+    )
+    latest_id = (
+        select(events.id)
+        .where(events.team_id == Team.id, events.date <= on_date)
+        .order_by(events.date.desc(), events.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return (
+        select(Team.id, Team.name, Team.genre, RatingEvent.after, played.label("played"), RatingEvent.date)
+        .join(RatingEvent, RatingEvent.id == latest_id)
+        .order_by(RatingEvent.after.desc(), Team.id)
+    )
+
+
+def leaderboard_at(session, on_date, limit=None):
+    on_date = parse_date(on_date)
+    if on_date is None:
+        raise ValueError("A date is required (YYYY-MM-DD)")
+    rows = session.execute(leaderboard_at_query(on_date).limit(limit))
+    return [
+        {
+            "id": team_id,
+            "name": name,
+            "game": genre,
+            "rating": rating,
+            "played": played,
+            "last_match": last_match,
+        }
+        for team_id, name, genre, rating, played, last_match in rows
+    ]
+
+
+def rating_curve_query(team_id):
+    return (
+        select(RatingEvent.date, RatingEvent.match_id, RatingEvent.before, RatingEvent.after, RatingEvent.delta)
+        .where(RatingEvent.team_id == team_id)
+        .order_by(RatingEvent.date, RatingEvent.id)
+    )
+
+
+def rating_curve(session, team_id):
+    team = get_team(session, team_id)
+    return team, session.execute(rating_curve_query(team.id)).all()
@@ -0,0 +1,183 @@
+import heapq
+import json
+import time
+from collections import deque
+from rich.console import Group
+from rich.live import Live
+from rich.progress import Progress, ProgressColumn, TextColumn, BarColumn, MofNCompleteColumn, TimeRemainingColumn
+from rich.table import Table
+from rich.text import Text
+from rich import box
+import operations
+
+# Output for simulation runs, shared by the menu and the headless
+# `matches simulate` / `matches resume` commands. Nothing here keeps a row
+# per match: the live window holds the latest few results, the summary a
+# fixed number of upsets and one rating pair per team, and full results
+# are streamed to a JSONL file when asked for.
+
+WINDOW_SIZE = 10
+SUMMARY_SIZE = 5
+
+
+class RateColumn(ProgressColumn):
+    def render(self, task):
+        return Text(f"{task.speed or 0:,.0f} matches/s", style="cyan")
+
+
+class ResultWindow:
+    # Rendered by Live on every refresh, from whatever results are latest.
+    def __init__(self, size=WINDOW_SIZE):
+        self.results = deque(maxlen=size)
+
+    def add(self, result):
+        self.results.append(result)
+
+    def __rich__(self):
+        table = Table(title=f"Latest {self.results.maxlen} results", show_header=True,
+                      header_style="bold magenta", box=box.SIMPLE)
+        table.add_column("Match", justify="right", style="dim")
+        table.add_column("Team 1")
+        table.add_column("Team 2")
+        table.add_column("Winner", style="green")
+        table.add_column("Δ", style="cyan", justify="right")
+        for result in self.results:
+            before1, _ = result["before"]
+            after1, _ = result["after"]
+            table.add_row(str(result["match_id"]), result["team1"], result["team2"], result["winner"],
+                          f"{abs(after1 - before1)}")
+        return table
+
+
+class ResultSummary:
+    def __init__(self, size=SUMMARY_SIZE):
+        self.size = size
+        self.count = 0
+        self.upset_count = 0
+        # Min-heap of (rating gap, match ID, result): the smallest of the
+        # biggest upsets so far sits on top and is the one to replace.
+        self.upsets = []
+        # Team ID -> [rating before its first match, rating after its last].
+        # Names aren't unique, so they are only kept for display.
+        self.ratings = {}
+        self.names = {}
+
+    def add(self, result):
+        self.count += 1
+        for team_id, name, before, after in zip(
+            (result["team1_id"], result["team2_id"]), (result["team1"], result["team2"]),
+            result["before"], result["after"],
+        ):
+            if team_id in self.ratings:
+                self.ratings[team_id][1] = after
+            else:
+                self.ratings[team_id] = [before, after]
+                self.names[team_id] = name
+
+        before1, before2 = result["before"]
+        winner, loser = (before1, before2) if result["winner"] == result["team1"] else (before2, before1)
+        if winner >= loser:
+            return
+        self.upset_count += 1
+        entry = (loser - winner, result["match_id"], result)
+        if len(self.upsets) < self.size:
+            heapq.heappush(self.upsets, entry)
+        elif entry > self.upsets[0]:
+            heapq.heapreplace(self.upsets, entry)
+
+    def movers(self):
+        return [
+            {"id": team_id, "team": self.names[team_id], "before": before, "after": after, "delta": after - before}
+            for team_id, (before, after) in heapq.nlargest(
+                self.size, self.ratings.items(), key=lambda item: abs(item[1][1] - item[1][0])
+            )
+        ]
+
+    def biggest_upsets(self):
+        return [dict(result, gap=gap) for gap, _, result in sorted(self.upsets, reverse=True)]
+
+    def as_dict(self):
+        return {
+            "matches": self.count,
+            "upsets": self.upset_count,
+            "movers": self.movers(),
+            "biggest_upsets": self.biggest_upsets(),
+        }
+
+    def lines(self):
+        lines = [f"{self.upset_count} of {self.count} matches were won by the lower-rated team"]
+        if self.ratings:
+            lines.append("Biggest movers:")
+            lines.extend(
+                f"  {m['team']}\t{m['before']} -> {m['after']}\t{m['delta']:+}" for m in self.movers()
+            )
+        if self.upsets:
+            lines.append("Biggest upsets:")
+            lines.extend(
+                f"  {u['match_id']}\t{u['winner']} beat {u['team2'] if u['winner'] == u['team1'] else u['team1']}"
+                f"\t{u['gap']} points below"
+                for u in self.biggest_upsets()
+            )
+        return lines
+
+    def tables(self):
+        movers = Table(title="Biggest movers", show_header=True, header_style="bold magenta")
+        movers.add_column("Team", style="green")
+        movers.add_column("Before", justify="right")
+        movers.add_column("After", justify="right")
+        movers.add_column("Δ", style="cyan", justify="right")
+        for m in self.movers():
+            movers.add_row(m["team"], str(m["before"]), str(m["after"]), f"{m['delta']:+}")
+
+        upsets = Table(title=f"Biggest upsets ({self.upset_count} in total)", show_header=True,
+                       header_style="bold magenta")
+        upsets.add_column("Match", justify="right", style="dim")
+        upsets.add_column("Winner", style="green")
+        upsets.add_column("Loser", style="red")
+        upsets.add_column("Rating gap", style="cyan", justify="right")
+        for u in self.biggest_upsets():
+            loser = u["team2"] if u["winner"] == u["team1"] else u["team1"]
+            upsets.add_row(str(u["match_id"]), u["winner"], loser, str(u["gap"]))
+        return Group(movers, upsets)
+
+
+def jsonl_writer(stream):
+    def write(result):
+        stream.write(json.dumps(result) + "\n")
+    return write
+
+
+def feed(batch, sinks):
+    # One pass over the batch; each result dict lives only as long as the
+    # sinks take to look at it.
+    count = 0
+    for result in batch.results():
+        count += 1
+        for sink in sinks:
+            sink(result)
+    return count
+
+
+def run_simulation(session, run, console, sinks=(), window=None):
+    # Commits after every chunk, and once more for the finished status.
+    # With a window, the progress bar and latest results share one Live.
+    sinks = list(sinks) + ([window.add] if window else [])
+    started = time.perf_counter()
+    simulated = 0
+    progress = Progress(
+        TextColumn(f"[bold]Run {run.id}[/bold]"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        RateColumn(),
+        TimeRemainingColumn(),
+        console=console,
+    )
+    task = progress.add_task("simulate", total=run.total, completed=run.processed)
+    display = Live(Group(progress, window), console=console) if window else progress
+    with display:
+        for results in operations.simulate_chunks(session, run):
+            session.commit()
+            simulated += feed(results, sinks)
+            progress.update(task, advance=len(results))
+    session.commit()
+    return simulated, time.perf_counter() - started
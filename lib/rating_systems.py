@@ -0,0 +1,375 @@
+import math
+import os
+import random
+from abc import ABC, abstractmethod
+from sqlalchemy import select
+from db.models import Match
+from numeric import load_numpy
+from ratings import INITIAL_RATING, PendingBatch, match_draw, run_elo, replay
+
+# Rating systems a simulation can run under. Each one rates a PendingBatch
+# in date order and fills in the same per-match results as run_elo (winner,
+# rating before and after), so write_back, team_stats and the rating_events
+# ledger work unchanged. Team.rankings stays the rating shown everywhere;
+# systems with more state keep it in Team.rating_deviation and
+# Team.rating_volatility.
+#
+#   elo        one update per match, K = 32 (the default)
+#   glicko2    Glicko-2 with one rating period per match day: the day's
+#              matches are decided on the ratings at the start of the day,
+#              then every team that played is updated at once, vectorized
+#              with NumPy when it is installed
+#   trueskill  a TrueSkill-style Gaussian skill (mean and deviation) for
+#              two-team matches without draws, updated after every match
+#
+# ESPORTS_RATING_SYSTEM sets the default; `--system` overrides it.
+
+DEFAULT_SYSTEM = 'elo'
+
+# Glicko-2 works on its own scale: mu = (rating - 1000) / 173.7178.
+GLICKO_SCALE = 400 / math.log(10)
+GLICKO_DEVIATION = 350.0
+GLICKO_VOLATILITY = 0.06
+GLICKO_TAU = 0.5
+GLICKO_EPSILON = 0.000001
+# Rating periods with fewer matches than this are cheaper in plain Python
+# than as NumPy arrays (see `bench.py systems`).
+GLICKO_VECTOR_THRESHOLD = 64
+
+# TrueSkill's defaults (mu = 3 sigma, beta = sigma / 2, tau = sigma / 100)
+# with beta chosen so a rating gap means roughly what it does under ELO.
+TRUESKILL_SIGMA = 400.0
+TRUESKILL_BETA = TRUESKILL_SIGMA / 2
+TRUESKILL_TAU = TRUESKILL_SIGMA / 100
+
+
+def fill_unset(values, initial):
+    for i, value in enumerate(values):
+        if math.isnan(value):
+            values[i] = initial
+
+
+def load_completed(session):
+    # Completed matches in simulation order, with the result of each as
+    # "team 1 won". Matches with a deleted team can't be replayed.
+    batch = PendingBatch()
+    known = []
+    skipped = 0
+    query = (
+        select(Match.id, Match.date, Match.team1_id, Match.team2_id, Match.winner_id)
+        .where(Match.winner_id != None)
+        .order_by(Match.date, Match.id)
+    )
+    for match_id, match_date, id1, id2, winner in session.execute(query):
+        if id1 is None or id2 is None:
+            skipped += 1
+            continue
+        batch.match_ids.append(match_id)
+        batch.dates.append(match_date)
+        batch.team1.append(batch.team_index(id1, None, None))
+        batch.team2.append(batch.team_index(id2, None, None))
+        known.append(winner == id1)
+    return batch, known, skipped
+
+
+class RatingSystem(ABC):
+    name = None
+    # Team columns the system keeps besides Team.rankings.
+    state = ()
+    # Whether a day's matches form one rating period that must be rated
+    # together (and so never be split between chunks).
+    periodic = False
+
+    @abstractmethod
+    def run(self, batch, draw=random.random, seed=None, known=None):
+        pass
+
+    def replay(self, session):
+        # Ratings and state of every team, recomputed from recorded results.
+        batch, known, skipped = load_completed(session)
+        self.run(batch, known=known)
+        ratings = dict(zip(batch.team_ids, batch.ratings))
+        state = {
+            team_id: (None if math.isnan(deviation) else deviation, None if math.isnan(volatility) else volatility)
+            for team_id, deviation, volatility in zip(batch.team_ids, batch.deviations, batch.volatilities)
+        }
+        return ratings, state, len(known), skipped
+
+
+class Elo(RatingSystem):
+    name = 'elo'
+
+    def run(self, batch, draw=random.random, seed=None, known=None):
+        # Replays go through ratings.replay (see below), so known results
+        # never reach here; the argument keeps the signature common.
+        return run_elo(batch, draw, seed)
+
+    def replay(self, session):
+        ratings, replayed, skipped = replay(session)
+        return ratings, {}, replayed, skipped
+
+
+def periods(dates):
+    # (start, end) of each run of matches on the same day.
+    start = 0
+    for i in range(1, len(dates) + 1):
+        if i == len(dates) or dates[i] != dates[start]:
+            yield start, i
+            start = i
+
+
+def glicko_g(phi):
+    return 1 / math.sqrt(1 + 3 * phi * phi / math.pi ** 2)
+
+
+def glicko_volatility(phi, sigma, v, delta):
+    # Step 5 of Glickman's "Example of the Glicko-2 system": the Illinois
+    # algorithm for the new volatility.
+    a = math.log(sigma * sigma)
+    phi2, delta2, tau2 = phi * phi, delta * delta, GLICKO_TAU * GLICKO_TAU
+
+    def f(x):
+        ex = math.exp(x)
+        d = phi2 + v + ex
+        return ex * (delta2 - phi2 - v - ex) / (2 * d * d) - (x - a) / tau2
+
+    A = a
+    if delta2 > phi2 + v:
+        B = math.log(delta2 - phi2 - v)
+    else:
+        k = 1
+        while f(a - k * GLICKO_TAU) < 0:
+            k += 1
+        B = a - k * GLICKO_TAU
+    fa, fb = f(A), f(B)
+    while abs(B - A) > GLICKO_EPSILON:
+        C = A + (A - B) * fa / (fb - fa)
+        fc = f(C)
+        if fc * fb <= 0:
+            A, fa = B, fb
+        else:
+            fa /= 2
+        B, fb = C, fc
+    return math.exp(A / 2)
+
+
+def glicko_period_python(batch, start, end, rolls, known):
+    ratings, deviations, volatilities = batch.ratings, batch.deviations, batch.volatilities
+    won, contrib1, contrib2 = [], [], []
+    v_inv, delta_sum = {}, {}
+    for k, i in enumerate(range(start, end)):
+        a, b = batch.team1[i], batch.team2[i]
+        mu_a = (ratings[a] - INITIAL_RATING) / GLICKO_SCALE
+        mu_b = (ratings[b] - INITIAL_RATING) / GLICKO_SCALE
+        phi_a, phi_b = deviations[a] / GLICKO_SCALE, deviations[b] / GLICKO_SCALE
+        g_a, g_b = glicko_g(phi_a), glicko_g(phi_b)
+        diff = mu_a - mu_b
+
+        if known is not None:
+            a_won = known[i]
+        else:
+            a_won = rolls[k] < 1 / (1 + math.exp(-glicko_g(math.hypot(phi_a, phi_b)) * diff))
+        expected_a = 1 / (1 + math.exp(-g_b * diff))
+        expected_b = 1 / (1 + math.exp(g_a * diff))
+        score = 1.0 if a_won else 0.0
+
+        won.append(a_won)
+        contrib1.append(g_b * (score - expected_a))
+        contrib2.append(g_a * (1 - score - expected_b))
+        v_inv[a] = v_inv.get(a, 0.0) + g_b * g_b * expected_a * (1 - expected_a)
+        v_inv[b] = v_inv.get(b, 0.0) + g_a * g_a * expected_b * (1 - expected_b)
+        delta_sum[a] = delta_sum.get(a, 0.0) + contrib1[-1]
+        delta_sum[b] = delta_sum.get(b, 0.0) + contrib2[-1]
+
+    new_phi, new_sigma = {}, {}
+    for team, total in v_inv.items():
+        phi = deviations[team] / GLICKO_SCALE
+        v = 1 / total
+        sigma = glicko_volatility(phi, volatilities[team], v, v * delta_sum[team])
+        phi_star2 = phi * phi + sigma * sigma
+        new_phi[team] = 1 / math.sqrt(1 / phi_star2 + 1 / v)
+        new_sigma[team] = sigma
+    return won, contrib1, contrib2, new_phi, new_sigma
+
+
+def glicko_volatility_numpy(np, phi, sigma, v, delta):
+    # glicko_volatility for every team at once; each team stops iterating
+    # as soon as it has converged, exactly as it would on its own.
+    a = np.log(sigma * sigma)
+    phi2, delta2, tau2 = phi * phi, delta * delta, GLICKO_TAU * GLICKO_TAU
+
+    def f(x):
+        ex = np.exp(x)
+        d = phi2 + v + ex
+        return ex * (delta2 - phi2 - v - ex) / (2 * d * d) - (x - a) / tau2
+
+    A = a
+    large = delta2 > phi2 + v
+    B = np.where(large, np.log(np.where(large, delta2 - phi2 - v, 1.0)), a - GLICKO_TAU)
+    k = np.ones_like(a)
+    low = ~large & (f(B) < 0)
+    while low.any():
+        k = np.where(low, k + 1, k)
+        B = np.where(low, a - k * GLICKO_TAU, B)
+        low &= f(B) < 0
+    fa, fb = f(A), f(B)
+    active = np.abs(B - A) > GLICKO_EPSILON
+    while active.any():
+        C = A + (A - B) * fa / (fb - fa)
+        fc = f(C)
+        flip = fc * fb <= 0
+        A = np.where(active & flip, B, A)
+        fa = np.where(active, np.where(flip, fb, fa / 2), fa)
+        B = np.where(active, C, B)
+        fb = np.where(active, fc, fb)
+        active &= np.abs(B - A) > GLICKO_EPSILON
+    return np.exp(A / 2)
+
+
+def glicko_period_numpy(np, batch, start, end, rolls, known):
+    # One rating period with every team in it updated together: per-match
+    # terms are computed as arrays and summed per team with bincount.
+    size = end - start
+    teams, inverse = np.unique(np.array(batch.team1[start:end] + batch.team2[start:end]), return_inverse=True)
+    ia, ib = inverse[:size], inverse[size:]
+    team_list = teams.tolist()
+    mu = (np.array([batch.ratings[t] for t in team_list], dtype=np.float64) - INITIAL_RATING) / GLICKO_SCALE
+    phi = np.array([batch.deviations[t] for t in team_list]) / GLICKO_SCALE
+    sigma = np.array([batch.volatilities[t] for t in team_list])
+
+    g = 1 / np.sqrt(1 + 3 * phi * phi / math.pi ** 2)
+    g_a, g_b = g[ia], g[ib]
+    diff = mu[ia] - mu[ib]
+    if known is not None:
+        won = np.array(known[start:end], dtype=bool)
+    else:
+        g_ab = 1 / np.sqrt(1 + 3 * (phi[ia] ** 2 + phi[ib] ** 2) / math.pi ** 2)
+        won = np.array(rolls) < 1 / (1 + np.exp(-g_ab * diff))
+    expected_a = 1 / (1 + np.exp(-g_b * diff))
+    expected_b = 1 / (1 + np.exp(g_a * diff))
+    score = won.astype(np.float64)
+    contrib1 = g_b * (score - expected_a)
+    contrib2 = g_a * (1 - score - expected_b)
+
+    n = len(teams)
+    v = 1 / (np.bincount(ia, g_b * g_b * expected_a * (1 - expected_a), n)
+             + np.bincount(ib, g_a * g_a * expected_b * (1 - expected_b), n))
+    delta = v * (np.bincount(ia, contrib1, n) + np.bincount(ib, contrib2, n))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        new_sigma = glicko_volatility_numpy(np, phi, sigma, v, delta)
+    new_phi = 1 / np.sqrt(1 / (phi * phi + new_sigma * new_sigma) + 1 / v)
+    return (won.tolist(), contrib1.tolist(), contrib2.tolist(),
+            dict(zip(team_list, new_phi.tolist())), dict(zip(team_list, new_sigma.tolist())))
+
+
+class Glicko2(RatingSystem):
+    # Teams that don't play in a period keep their deviation rather than
+    # having it widened: a batch only holds the teams with matches in it,
+    # and widening the rest would make results depend on how runs, chunks
+    # and genre pools were split.
+    name = 'glicko2'
+    state = ('rating_deviation', 'rating_volatility')
+    periodic = True
+
+    def __init__(self, vector_threshold=GLICKO_VECTOR_THRESHOLD):
+        self.vector_threshold = vector_threshold
+
+    def run(self, batch, draw=random.random, seed=None, known=None):
+        fill_unset(batch.deviations, GLICKO_DEVIATION)
+        fill_unset(batch.volatilities, GLICKO_VOLATILITY)
+        np = load_numpy()
+        ratings, match_ids = batch.ratings, batch.match_ids
+        team1, team2, winners = batch.team1, batch.team2, batch.winners
+
+        for start, end in periods(batch.dates):
+            rolls = None
+            if known is None:
+                rolls = [draw() if seed is None else match_draw(seed, match_ids[i]) for i in range(start, end)]
+            if np is not None and end - start >= self.vector_threshold:
+                won, contrib1, contrib2, new_phi, new_sigma = glicko_period_numpy(np, batch, start, end, rolls, known)
+            else:
+                won, contrib1, contrib2, new_phi, new_sigma = glicko_period_python(batch, start, end, rolls, known)
+
+            # A team's change over the period is the sum of one term per
+            # match, so each match's before/after is the running total and
+            # a team's ledger rows still chain from one match to the next.
+            start_rating = {team: ratings[team] for team in new_phi}
+            step = {team: GLICKO_SCALE * phi * phi for team, phi in new_phi.items()}
+            running = dict.fromkeys(new_phi, 0.0)
+            for k, i in enumerate(range(start, end)):
+                a, b = team1[i], team2[i]
+                winners.append(a if won[k] else b)
+                for team, contrib, before, after in (
+                    (a, contrib1[k], batch.before1, batch.after1),
+                    (b, contrib2[k], batch.before2, batch.after2),
+                ):
+                    before.append(round(start_rating[team] + step[team] * running[team]))
+                    running[team] += contrib
+                    after.append(round(start_rating[team] + step[team] * running[team]))
+
+            for team in new_phi:
+                ratings[team] = round(start_rating[team] + step[team] * running[team])
+                batch.deviations[team] = GLICKO_SCALE * new_phi[team]
+                batch.volatilities[team] = new_sigma[team]
+        return batch
+
+
+def normal_cdf(x):
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+def normal_pdf(x):
+    return math.exp(-x * x / 2) / math.sqrt(2 * math.pi)
+
+
+class TrueSkill(RatingSystem):
+    name = 'trueskill'
+    state = ('rating_deviation',)
+
+    def run(self, batch, draw=random.random, seed=None, known=None):
+        fill_unset(batch.deviations, TRUESKILL_SIGMA)
+        ratings, deviations, match_ids = batch.ratings, batch.deviations, batch.match_ids
+        two_beta2 = 2 * TRUESKILL_BETA ** 2
+        tau2 = TRUESKILL_TAU ** 2
+
+        for i in range(len(match_ids)):
+            a, b = batch.team1[i], batch.team2[i]
+            mu_a, mu_b = ratings[a], ratings[b]
+            var_a = deviations[a] ** 2 + tau2
+            var_b = deviations[b] ** 2 + tau2
+            c = math.sqrt(two_beta2 + var_a + var_b)
+
+            if known is not None:
+                a_won = known[i]
+            else:
+                roll = draw() if seed is None else match_draw(seed, match_ids[i])
+                a_won = roll < normal_cdf((mu_a - mu_b) / c)
+            t = (mu_a - mu_b if a_won else mu_b - mu_a) / c
+            cdf = normal_cdf(t)
+            # Far past the tail the ratio pdf/cdf tends to -t.
+            v = normal_pdf(t) / cdf if cdf > 0 else -t
+            w = v * (v + t)
+            sign = 1 if a_won else -1
+            new_a = round(mu_a + sign * var_a / c * v)
+            new_b = round(mu_b - sign * var_b / c * v)
+
+            batch.winners.append(a if a_won else b)
+            batch.before1.append(mu_a)
+            batch.before2.append(mu_b)
+            batch.after1.append(new_a)
+            batch.after2.append(new_b)
+            ratings[a], ratings[b] = new_a, new_b
+            deviations[a] = math.sqrt(var_a * (1 - var_a / (c * c) * w))
+            deviations[b] = math.sqrt(var_b * (1 - var_b / (c * c) * w))
+        return batch
+
+
+SYSTEMS = {system.name: system for system in (Elo(), Glicko2(), TrueSkill())}
+
+
+def get_system(name=None):
+    name = name or os.environ.get('ESPORTS_RATING_SYSTEM') or DEFAULT_SYSTEM
+    try:
+        return SYSTEMS[name]
+    except KeyError:
+        raise ValueError(f"Unknown rating system: {name} (choose from {', '.join(sorted(SYSTEMS))})")
@@ -0,0 +1,358 @@
+import math
+import os
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from sqlalchemy import select, update, insert
+from sqlalchemy.orm import aliased
+from db.models import Team, Match, RatingEvent
+
+K_FACTOR = 32
+INITIAL_RATING = 1000
+# Deviation or volatility a team hasn't been given yet; each rating
+# system starts it from its own initial value.
+UNSET = float('nan')
+
+MASK64 = (1 << 64) - 1
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def splitmix64(value):
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def match_draw(seed, match_id):
+    # The uniform draw for one match under a seed. It depends only on the
+    # seed and the match id, never on which batch, chunk or worker the match
+    # is simulated in, so a seeded run is reproducible however it is split.
+    return (splitmix64(splitmix64(seed & MASK64) ^ match_id) >> 11) / 2 ** 53
+
+
+class PendingBatch:
+    # Pending matches and the ratings of every team they involve, packed into
+    # flat arrays. Teams are addressed by a compact index instead of their id.
+    def __init__(self):
+        self.team_ids = array('q')
+        self.names = []
+        self.ratings = array('q')
+        self.deviations = array('d')
+        self.volatilities = array('d')
+        self.match_ids = array('q')
+        self.dates = []
+        self.team1 = array('l')
+        self.team2 = array('l')
+        self.winners = array('l')
+        self.before1 = array('q')
+        self.before2 = array('q')
+        self.after1 = array('q')
+        self.after2 = array('q')
+        self._index = {}
+
+    def __len__(self):
+        return len(self.match_ids)
+
+    def team_index(self, team_id, name, rankings, deviation=UNSET, volatility=UNSET):
+        idx = self._index.get(team_id)
+        if idx is None:
+            idx = len(self.team_ids)
+            self._index[team_id] = idx
+            self.team_ids.append(team_id)
+            self.names.append(name)
+            self.ratings.append(rankings if rankings else INITIAL_RATING)
+            self.deviations.append(UNSET if deviation is None else deviation)
+            self.volatilities.append(UNSET if volatility is None else volatility)
+        return idx
+
+    def results(self):
+        names = self.names
+        for i in range(len(self.winners)):
+            a, b = self.team1[i], self.team2[i]
+            yield {
+                "match_id": self.match_ids[i],
+                "team1_id": self.team_ids[a],
+                "team2_id": self.team_ids[b],
+                "team1": names[a],
+                "team2": names[b],
+                "winner": names[self.winners[i]],
+                "before": (self.before1[i], self.before2[i]),
+                "after": (self.after1[i], self.after2[i]),
+            }
+
+
+def pending_query(until_id=None, genre=None):
+    team1 = aliased(Team)
+    team2 = aliased(Team)
+    query = (
+        select(
+            Match.id, Match.date,
+            team1.id, team1.name, team1.rankings,
+            team2.id, team2.name, team2.rankings,
+        )
+        .join(team1, Match.team1_id == team1.id)
+        .join(team2, Match.team2_id == team2.id)
+        .where(Match.winner_id == None)
+        .order_by(Match.date, Match.id)
+    )
+    if until_id is not None:
+        query = query.where(Match.id <= until_id)
+    if genre is not None:
+        query = query.where(team1.genre == genre, team2.genre == genre)
+    return query
+
+
+def load_pending(session, until_id=None, limit=None, whole_days=False):
+    rows = session.execute(pending_query(until_id).limit(limit)).all()
+    if whole_days and limit and len(rows) == limit:
+        # Rating systems with one rating period per day need the rest of
+        # the last day in the same batch.
+        last_id, last_date = rows[-1][0], rows[-1][1]
+        rows += session.execute(
+            pending_query(until_id).where(
+                Match.date == last_date if last_date is not None else Match.date == None,
+                Match.id > last_id,
+            )
+        ).all()
+
+    batch = PendingBatch()
+    for match_id, match_date, id1, name1, rank1, id2, name2, rank2 in rows:
+        batch.match_ids.append(match_id)
+        batch.dates.append(match_date)
+        batch.team1.append(batch.team_index(id1, name1, rank1))
+        batch.team2.append(batch.team_index(id2, name2, rank2))
+    return batch
+
+
+def load_state(session, batch):
+    # Deviation and volatility of the batch's teams, for the rating systems
+    # that keep them. One pass over teams is cheaper than a long IN list.
+    index = batch._index
+    for team_id, deviation, volatility in session.execute(
+        select(Team.id, Team.rating_deviation, Team.rating_volatility)
+    ):
+        idx = index.get(team_id)
+        if idx is not None:
+            batch.deviations[idx] = UNSET if deviation is None else deviation
+            batch.volatilities[idx] = UNSET if volatility is None else volatility
+
+
+def run_elo(batch, draw=random.random, seed=None):
+    # Matches are applied strictly in date order: each result feeds the
+    # ratings used for the next one, so this loop cannot be reordered.
+    # With a seed every match draws from its own stream instead of `draw`.
+    ratings = batch.ratings
+    match_ids = batch.match_ids
+    team1, team2 = batch.team1, batch.team2
+    winners = batch.winners
+    before1, before2 = batch.before1, batch.before2
+    after1, after2 = batch.after1, batch.after2
+
+    for i in range(len(batch.match_ids)):
+        a = team1[i]
+        b = team2[i]
+        ra = ratings[a]
+        rb = ratings[b]
+
+        expected_a = 1 / (1 + 10 ** ((rb - ra) / 400))
+        expected_b = 1 / (1 + 10 ** ((ra - rb) / 400))
+
+        roll = draw() if seed is None else match_draw(seed, match_ids[i])
+        if roll < expected_a:
+            winners.append(a)
+            new_a = round(ra + K_FACTOR * (1 - expected_a))
+            new_b = round(rb + K_FACTOR * (0 - expected_b))
+        else:
+            winners.append(b)
+            new_a = round(ra + K_FACTOR * (0 - expected_a))
+            new_b = round(rb + K_FACTOR * (1 - expected_b))
+
+        before1.append(ra)
+        before2.append(rb)
+        after1.append(new_a)
+        after2.append(new_b)
+        ratings[a] = new_a
+        ratings[b] = new_b
+
+    return batch
+
+
+def write_back(session, batch, system=None):
+    if not batch.winners:
+        return
+
+    team_ids = batch.team_ids
+    session.execute(
+        update(Match),
+        [
+            {"id": match_id, "winner_id": team_ids[winner]}
+            for match_id, winner in zip(batch.match_ids, batch.winners)
+        ]
+    )
+    teams = [{"id": team_id, "rankings": rating} for team_id, rating in zip(team_ids, batch.ratings)]
+    if system is not None and system.state:
+        for team, deviation, volatility in zip(teams, batch.deviations, batch.volatilities):
+            team["rating_deviation"] = None if math.isnan(deviation) else deviation
+            team["rating_volatility"] = None if math.isnan(volatility) else volatility
+    session.execute(update(Team), teams)
+    session.execute(insert(RatingEvent), rating_events(batch))
+
+
+def rating_events(batch):
+    today = date.today()
+    team_ids = batch.team_ids
+    events = []
+    for i in range(len(batch.winners)):
+        match_id = batch.match_ids[i]
+        match_date = batch.dates[i] or today
+        for idx, before, after in (
+            (batch.team1[i], batch.before1[i], batch.after1[i]),
+            (batch.team2[i], batch.before2[i], batch.after2[i]),
+        ):
+            events.append({
+                "match_id": match_id,
+                "team_id": team_ids[idx],
+                "date": match_date,
+                "before": before,
+                "after": after,
+                "delta": after - before,
+            })
+    return events
+
+
+def simulate_pending(session, draw=random.random, seed=None):
+    batch = load_pending(session)
+    run_elo(batch, draw, seed)
+    write_back(session, batch)
+    return batch
+
+
+# Below this many pending matches, starting worker processes costs more
+# than it saves and the shards are simulated one after another in-process.
+PARALLEL_THRESHOLD = 20000
+
+
+def split_batch(batch, genre_of):
+    # Genres never share teams, so each genre's matches can be simulated on
+    # their own. A match between teams of two genres links those genres
+    # into the same shard (union-find over genre names).
+    parent = {}
+
+    def find(genre):
+        parent.setdefault(genre, genre)
+        while parent[genre] != genre:
+            parent[genre] = parent[parent[genre]]
+            genre = parent[genre]
+        return genre
+
+    team_ids = batch.team_ids
+    for a, b in zip(batch.team1, batch.team2):
+        root_a, root_b = find(genre_of.get(team_ids[a])), find(genre_of.get(team_ids[b]))
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    shards = {}
+    for i in range(len(batch)):
+        a, b = batch.team1[i], batch.team2[i]
+        shard = shards.setdefault(find(genre_of.get(team_ids[a])), PendingBatch())
+        shard.match_ids.append(batch.match_ids[i])
+        shard.dates.append(batch.dates[i])
+        shard.team1.append(shard.team_index(
+            team_ids[a], batch.names[a], batch.ratings[a], batch.deviations[a], batch.volatilities[a]
+        ))
+        shard.team2.append(shard.team_index(
+            team_ids[b], batch.names[b], batch.ratings[b], batch.deviations[b], batch.volatilities[b]
+        ))
+    return shards
+
+
+def merge_batches(shards):
+    # Shards have disjoint teams, so every team's matches stay in order.
+    merged = PendingBatch()
+    for shard in shards:
+        remap = array('l', (
+            merged.team_index(*team)
+            for team in zip(shard.team_ids, shard.names, shard.ratings, shard.deviations, shard.volatilities)
+        ))
+        merged.match_ids.extend(shard.match_ids)
+        merged.dates.extend(shard.dates)
+        merged.team1.extend(remap[idx] for idx in shard.team1)
+        merged.team2.extend(remap[idx] for idx in shard.team2)
+        merged.winners.extend(remap[idx] for idx in shard.winners)
+        merged.before1.extend(shard.before1)
+        merged.before2.extend(shard.before2)
+        merged.after1.extend(shard.after1)
+        merged.after2.extend(shard.after2)
+    return merged
+
+
+def simulate_shard(batch, seed=None, system=None):
+    # A forked worker inherits the parent's random state, so unseeded runs
+    # need a freshly seeded generator of their own.
+    run = system.run if system is not None else run_elo
+    return run(batch, random.Random().random, seed)
+
+
+def simulate_sharded(session, workers=None, seed=None, system=None):
+    return simulate_batch(session, load_pending(session), workers, seed, system)
+
+
+def simulate_batch(session, batch, workers=None, seed=None, system=None):
+    # `system` is a rating system from rating_systems.py; None is plain ELO.
+    if system is not None and system.state:
+        load_state(session, batch)
+    genre_of = dict(session.execute(select(Team.id, Team.genre)).all())
+    shards = list(split_batch(batch, genre_of).values())
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+
+    if workers > 1 and len(batch) >= PARALLEL_THRESHOLD:
+        # Largest shards first so the longest one isn't started last.
+        shards.sort(key=len, reverse=True)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(simulate_shard, shards, [seed] * len(shards), [system] * len(shards)))
+    else:
+        run = system.run if system is not None else run_elo
+        for shard in shards:
+            run(shard, seed=seed)
+
+    merged = merge_batches(shards)
+    write_back(session, merged, system)
+    return merged
+
+
+def completed_query():
+    # Same order as simulation: a replay only reproduces the stored ratings
+    # if results were simulated in date order.
+    return (
+        select(Match.team1_id, Match.team2_id, Match.winner_id)
+        .where(Match.winner_id != None)
+        .order_by(Match.date, Match.id)
+    )
+
+
+def replay(session):
+    # Recompute every rating from recorded results, starting from scratch.
+    # Matches with a deleted team can't be replayed and are counted instead.
+    ratings = {}
+    replayed = skipped = 0
+    for id1, id2, winner in session.execute(completed_query()):
+        if id1 is None or id2 is None:
+            skipped += 1
+            continue
+        ra = ratings.get(id1, INITIAL_RATING)
+        rb = ratings.get(id2, INITIAL_RATING)
+        expected_a = 1 / (1 + 10 ** ((rb - ra) / 400))
+        expected_b = 1 / (1 + 10 ** ((ra - rb) / 400))
+        if winner == id1:
+            ratings[id1] = round(ra + K_FACTOR * (1 - expected_a))
+            ratings[id2] = round(rb + K_FACTOR * (0 - expected_b))
+        else:
+            ratings[id1] = round(ra + K_FACTOR * (0 - expected_a))
+            ratings[id2] = round(rb + K_FACTOR * (1 - expected_b))
+        replayed += 1
+    return ratings, replayed, skipped
@@ -0,0 +1,344 @@
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+from array import array
+from datetime import date, datetime, timezone
+from sqlalchemy import select, Boolean, Date, Float, Integer, String
+from db.models import Team, Player, Match, TeamStats, RatingEvent, PlayerMatchStats, SCHEMA_REVISION
+
+# Read-only columnar snapshots of the league, for analytics and Monte Carlo
+# jobs that would otherwise query the live database while the CLI writes
+# to it. Every table is read inside one read transaction, so the snapshot
+# is consistent across tables, and streamed out in chunks.
+#
+# A snapshot is a directory with a manifest.json and either
+#   parquet: one <table>.parquet per table, written with pyarrow, or
+#   binary:  one raw native-endian file per column, <table>/<column>.bin.
+#            Strings are <column>.offsets (int64, rows + 1), <column>.data
+#            (UTF-8) and <column>.valid (int8, 0 for NULL).
+# The binary format needs nothing beyond the standard library, and
+# open_snapshot() maps its columns into memory as typed memoryviews
+# without copying them; np.frombuffer() turns one into an array for free.
+
+# Loaded on first use by load_pyarrow(): importing pyarrow takes longer
+# than starting the rest of the CLI, and only snapshots need it.
+pa = None
+pq = None
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 10000
+
+SNAPSHOT_TABLES = {
+    "teams": Team,
+    "players": Player,
+    "matches": Match,
+    "team_stats": TeamStats,
+    "rating_events": RatingEvent,
+    "player_match_stats": PlayerMatchStats,
+}
+FORMATS = ["parquet", "binary"]
+
+# Column kind -> array typecode and the value stored for NULL. Dates are
+# days since 1970-01-01, as in Arrow's date32.
+BINARY_CODES = {
+    "int": ("q", -2 ** 63),
+    "float": ("d", float("nan")),
+    "date": ("i", -2 ** 31),
+    "bool": ("b", -1),
+}
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def load_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return None
+        pa, pq = pyarrow, pyarrow.parquet
+    return pa
+
+
+def column_kind(column):
+    for sql_type, kind in ((Boolean, "bool"), (Integer, "int"), (Float, "float"), (Date, "date"), (String, "str")):
+        if isinstance(column.type, sql_type):
+            return kind
+    raise ValueError(f"Column {column} has no snapshot type")
+
+
+def table_columns(model):
+    return {column.name: column_kind(column) for column in model.__table__.columns}
+
+
+def snapshot_connection(bind):
+    # pysqlite doesn't open a transaction for SELECTs, so each table would
+    # be read as of its own moment. An explicit BEGIN holds one read
+    # snapshot (under WAL) for every table without blocking writers.
+    conn = bind.connect()
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")
+    else:
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+    return conn
+
+
+class BinaryTableWriter:
+    def __init__(self, directory, columns):
+        os.makedirs(directory)
+        self.columns = columns
+        self.rows = 0
+        self.files = {}
+        self.string_bytes = {}
+        for name, kind in columns.items():
+            if kind == "str":
+                self.files[name] = tuple(
+                    open(os.path.join(directory, f"{name}.{part}"), "wb") for part in ("offsets", "data", "valid")
+                )
+                self.string_bytes[name] = 0
+                array("q", [0]).tofile(self.files[name][0])
+            else:
+                self.files[name] = open(os.path.join(directory, f"{name}.bin"), "wb")
+
+    def write(self, rows):
+        for position, (name, kind) in enumerate(self.columns.items()):
+            values = [row[position] for row in rows]
+            if kind == "str":
+                self.write_strings(name, values)
+                continue
+            code, null = BINARY_CODES[kind]
+            if kind == "date":
+                values = [null if value is None else value.toordinal() - EPOCH for value in values]
+            else:
+                values = [null if value is None else value for value in values]
+            array(code, values).tofile(self.files[name])
+        self.rows += len(rows)
+
+    def write_strings(self, name, values):
+        offsets_file, data_file, valid_file = self.files[name]
+        offsets = array("q")
+        end = self.string_bytes[name]
+        encoded = []
+        for value in values:
+            if value is not None:
+                value = value.encode()
+                encoded.append(value)
+                end += len(value)
+            offsets.append(end)
+        offsets.tofile(offsets_file)
+        data_file.write(b"".join(encoded))
+        array("b", [value is not None for value in values]).tofile(valid_file)
+        self.string_bytes[name] = end
+
+    def close(self):
+        for files in self.files.values():
+            for stream in files if isinstance(files, tuple) else (files,):
+                stream.close()
+
+
+class ParquetTableWriter:
+    def __init__(self, path, columns):
+        types = {"int": pa.int64(), "float": pa.float64(), "date": pa.date32(), "bool": pa.bool_(),
+                 "str": pa.string()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns.items()])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.rows = 0
+
+    def write(self, rows):
+        # One row group per chunk.
+        columns = [
+            pa.array([row[position] for row in rows], type=field.type)
+            for position, field in enumerate(self.schema)
+        ]
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self.writer.close()
+
+
+def export_snapshot(bind, path, fmt=None, tables=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Written to <path>.partial and renamed when complete, so a reader
+    # never opens half a snapshot.
+    if fmt is None:
+        fmt = "parquet" if load_pyarrow() is not None else "binary"
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    if fmt == "parquet" and load_pyarrow() is None:
+        raise ValueError("Parquet snapshots need pyarrow: pip install pyarrow, or use --format binary")
+    tables = tables or list(SNAPSHOT_TABLES)
+    for name in tables:
+        if name not in SNAPSHOT_TABLES:
+            raise ValueError(f"Invalid table '{name}'. Choose from: {', '.join(SNAPSHOT_TABLES)}")
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least 1")
+    if os.path.exists(path):
+        raise ValueError(f"Snapshot path '{path}' already exists")
+
+    started = time.perf_counter()
+    partial = f"{path}.partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    manifest = {
+        "format": fmt,
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "schema_revision": SCHEMA_REVISION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tables": {},
+    }
+    conn = snapshot_connection(bind)
+    try:
+        for name in tables:
+            model = SNAPSHOT_TABLES[name]
+            columns = table_columns(model)
+            if fmt == "parquet":
+                writer = ParquetTableWriter(os.path.join(partial, f"{name}.parquet"), columns)
+            else:
+                writer = BinaryTableWriter(os.path.join(partial, name), columns)
+            try:
+                result = conn.execute(select(model.__table__).order_by(*model.__table__.primary_key))
+                for rows in result.partitions(chunk_size):
+                    writer.write(rows)
+            finally:
+                writer.close()
+            manifest["tables"][name] = {"rows": writer.rows, "columns": columns}
+    finally:
+        conn.rollback()
+        conn.close()
+
+    with open(os.path.join(partial, "manifest.json"), "w") as out:
+        json.dump(manifest, out, indent=2)
+    os.replace(partial, path)
+    return {
+        "path": path,
+        "format": fmt,
+        "tables": {name: table["rows"] for name, table in manifest["tables"].items()},
+        "bytes": sum(
+            os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files
+        ),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def map_file(path, code):
+    # mmap refuses empty files; an empty column is an empty array.
+    if os.path.getsize(path) == 0:
+        return memoryview(array(code))
+    with open(path, "rb") as stream:
+        return memoryview(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)).cast(code)
+
+
+class StringColumn:
+    def __init__(self, offsets, data, valid):
+        self.offsets = offsets
+        self.data = data
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.valid)
+
+    def __getitem__(self, idx):
+        if not self.valid[idx]:
+            return None
+        return bytes(self.data[self.offsets[idx]:self.offsets[idx + 1]]).decode()
+
+    def __iter__(self):
+        return (self[idx] for idx in range(len(self)))
+
+
+class BinaryTable:
+    # Columns are mapped on first access and kept; the OS pages them in as
+    # they are read.
+    def __init__(self, directory, rows, columns):
+        self.directory = directory
+        self.num_rows = rows
+        self.kinds = columns
+        self.column_names = list(columns)
+        self._columns = {}
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            kind = self.kinds[name]
+            base = os.path.join(self.directory, name)
+            if kind == "str":
+                column = StringColumn(map_file(f"{base}.offsets", "q"), map_file(f"{base}.data", "B"),
+                                      map_file(f"{base}.valid", "b"))
+            else:
+                column = map_file(f"{base}.bin", BINARY_CODES[kind][0])
+            self._columns[name] = column
+        return self._columns[name]
+
+    def values(self, name, rows=None):
+        # The column, or the given row positions of it, as a list of Python
+        # values with None for NULL. tolist() copies at C speed; only
+        # columns that hold NULLs, dates or booleans take a second pass.
+        kind = self.kinds[name]
+        column = self[name]
+        if kind == "str":
+            return list(column) if rows is None else [column[idx] for idx in rows]
+        values = column.tolist() if rows is None else [column[idx] for idx in rows]
+        null = BINARY_CODES[kind][1]
+        if kind == "float":
+            return [None if value != value else value for value in values]
+        if kind == "date":
+            # A season has a few hundred distinct days.
+            days = {day: date.fromordinal(day + EPOCH) for day in set(values) if day != null}
+            return [days.get(day) for day in values]
+        if kind == "bool":
+            return [None if value == null else bool(value) for value in values]
+        if null in values:
+            return [None if value == null else value for value in values]
+        return values
+
+
+class Snapshot:
+    def __init__(self, path):
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"No snapshot found at '{path}'")
+        with open(manifest_path) as stream:
+            self.manifest = json.load(stream)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {self.manifest.get('version')} is not supported")
+        self.path = path
+        self.format = self.manifest["format"]
+        if self.format == "binary" and self.manifest["byteorder"] != sys.byteorder:
+            raise ValueError(f"Snapshot was written on a {self.manifest['byteorder']}-endian machine")
+        if self.format == "parquet" and load_pyarrow() is None:
+            raise ValueError("Parquet snapshots need pyarrow: pip install pyarrow")
+        self.tables = list(self.manifest["tables"])
+        self._tables = {}
+
+    def table(self, name):
+        # A BinaryTable, or a pyarrow Table read through a memory map. Both
+        # have num_rows, column_names and table[column].
+        if name not in self.manifest["tables"]:
+            raise ValueError(f"Snapshot has no table '{name}'")
+        if name not in self._tables:
+            info = self.manifest["tables"][name]
+            if self.format == "parquet":
+                self._tables[name] = pq.read_table(os.path.join(self.path, f"{name}.parquet"), memory_map=True)
+            else:
+                self._tables[name] = BinaryTable(os.path.join(self.path, name), info["rows"], info["columns"])
+        return self._tables[name]
+
+    def values(self, name, column, rows=None):
+        table = self.table(name)
+        if self.format == "parquet":
+            column = table.column(column)
+            return (column if rows is None else column.take(rows)).to_pylist()
+        return table.values(column, rows)
+
+    def rows(self, name, *columns):
+        # Tuples of Python values, for code that wants rows rather than
+        # columns. Slower than reading the columns directly.
+        return zip(*(self.values(name, column) for column in columns or self.table(name).column_names))
+
+
+def open_snapshot(path):
+    return Snapshot(path)
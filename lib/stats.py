@@ -0,0 +1,136 @@
+from sqlalchemy import select, insert, update, delete, or_
+from db.models import Team, Match, TeamStats
+from ratings import INITIAL_RATING
+
+# team_stats holds one leaderboard row per team (wins, losses, last-5 form
+# and rating). Simulation updates it incrementally from the rating batch;
+# edits to individual matches recompute just the teams involved, and
+# rebuild_stats() recreates the whole table from match history.
+
+FORM_LENGTH = 5
+
+# Above this many teams a targeted refresh costs more than a full rebuild
+# (and would run into SQLite's bound-parameter limit).
+REFRESH_LIMIT = 500
+
+
+def compute_stats(session, team_ids=None):
+    query = (
+        select(Match.team1_id, Match.team2_id, Match.winner_id)
+        .where(Match.winner_id != None)
+        .order_by(Match.date.desc(), Match.id.desc())
+        .execution_options(yield_per=10000)
+    )
+    if team_ids is not None:
+        query = query.where(or_(Match.team1_id.in_(team_ids), Match.team2_id.in_(team_ids)))
+
+    totals = {}
+    for team1_id, team2_id, winner_id in session.execute(query):
+        for team_id in (team1_id, team2_id):
+            if team_id is None or (team_ids is not None and team_id not in team_ids):
+                continue
+            row = totals.setdefault(team_id, {"wins": 0, "losses": 0, "form": ""})
+            if winner_id == team_id:
+                row["wins"] += 1
+                result = "W"
+            else:
+                row["losses"] += 1
+                result = "L"
+            if len(row["form"]) < FORM_LENGTH:
+                row["form"] += result
+    return totals
+
+
+def stats_rows(session, totals, team_ids=None):
+    query = select(Team.id, Team.rankings)
+    if team_ids is not None:
+        query = query.where(Team.id.in_(team_ids))
+    empty = {"wins": 0, "losses": 0, "form": ""}
+    return [
+        {"team_id": team_id, "rating": rankings or INITIAL_RATING, **totals.get(team_id, empty)}
+        for team_id, rankings in session.execute(query)
+    ]
+
+
+def rebuild_stats(session):
+    rows = stats_rows(session, compute_stats(session))
+    session.execute(delete(TeamStats))
+    if rows:
+        session.execute(insert(TeamStats), rows)
+    return len(rows)
+
+
+def refresh_teams(session, team_ids):
+    team_ids = {team_id for team_id in team_ids if team_id is not None}
+    if not team_ids:
+        return
+    if len(team_ids) > REFRESH_LIMIT:
+        rebuild_stats(session)
+        return
+
+    session.flush()
+    rows = stats_rows(session, compute_stats(session, team_ids), team_ids)
+    session.execute(delete(TeamStats).where(TeamStats.team_id.in_(team_ids)))
+    if rows:
+        session.execute(insert(TeamStats), rows)
+
+
+def ensure_stats(session):
+    missing = session.scalars(
+        select(Team.id)
+        .outerjoin(TeamStats, TeamStats.team_id == Team.id)
+        .where(TeamStats.team_id == None)
+    ).all()
+    if missing:
+        refresh_teams(session, missing)
+    return len(missing)
+
+
+def apply_batch(session, batch):
+    # Simulated matches are processed in date order, so each team's new
+    # results are prepended to its stored form, most recent first.
+    if not batch.winners:
+        return
+
+    changes = {}
+    for i in range(len(batch.winners)):
+        winner = batch.winners[i]
+        for idx in (batch.team1[i], batch.team2[i]):
+            change = changes.setdefault(idx, [0, 0, ""])
+            if idx == winner:
+                change[0] += 1
+                change[2] = ("W" + change[2])[:FORM_LENGTH]
+            else:
+                change[1] += 1
+                change[2] = ("L" + change[2])[:FORM_LENGTH]
+
+    team_ids = batch.team_ids
+    # Only the rows of teams in the batch, unless there are too many of
+    # them to bind, when one scan of the table is cheaper anyway.
+    query = select(TeamStats.team_id, TeamStats.wins, TeamStats.losses, TeamStats.form)
+    if len(changes) <= REFRESH_LIMIT:
+        query = query.where(TeamStats.team_id.in_([team_ids[idx] for idx in changes]))
+    existing = {
+        team_id: (wins, losses, form)
+        for team_id, wins, losses, form in session.execute(query)
+    }
+
+    updates = []
+    missing = []
+    for idx, (wins, losses, form) in changes.items():
+        team_id = team_ids[idx]
+        if team_id not in existing:
+            missing.append(team_id)
+            continue
+        old_wins, old_losses, old_form = existing[team_id]
+        updates.append({
+            "team_id": team_id,
+            "wins": old_wins + wins,
+            "losses": old_losses + losses,
+            "form": (form + old_form)[:FORM_LENGTH],
+            "rating": batch.ratings[idx],
+        })
+
+    if updates:
+        session.execute(update(TeamStats), updates)
+    refresh_teams(session, missing)
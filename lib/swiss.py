@@ -0,0 +1,184 @@
+from datetime import datetime
+from sqlalchemy import select, insert, func, and_
+from sqlalchemy.orm import aliased
+from db.models import Team, Match, SwissRound
+from operations import parse_date
+from ratings import INITIAL_RATING
+
+# Swiss rounds: teams are ordered by score and then rating, and each team
+# is paired with the nearest team below it that it hasn't met yet.
+# Everything is decided in memory from one query over the event's matches,
+# so a round for 10k+ teams takes milliseconds. Each round is recorded in
+# swiss_rounds with its bye and its block of match IDs; a genre's Swiss
+# rounds form one event, and only its matches count. A team's score is its
+# wins in the event plus one point per bye, so results from before the
+# event (or from other fixtures) don't move a team up the standings.
+
+# How far down the standings to look for an opponent that hasn't been met
+# before accepting a rematch. Keeps pairing O(n * window).
+SEARCH_WINDOW = 64
+
+
+def event_matches(genre):
+    # Matches in the ID blocks of the genre's Swiss rounds. Both teams are
+    # joined: a match with a deleted team has a NULL side and no longer
+    # pairs or scores anyone.
+    team1 = aliased(Team)
+    team2 = aliased(Team)
+    return (
+        select(Match.team1_id, Match.team2_id, Match.winner_id)
+        .join(SwissRound, and_(
+            SwissRound.genre == genre,
+            Match.id.between(SwissRound.first_match_id, SwissRound.last_match_id),
+        ))
+        .join(team1, Match.team1_id == team1.id)
+        .join(team2, Match.team2_id == team2.id)
+    )
+
+
+def load_event(session, genre):
+    # (score per team, pairs that have already met) for the genre's event.
+    scores = {}
+    played = set()
+    for team1_id, team2_id, winner_id in session.execute(event_matches(genre)):
+        played.add((team1_id, team2_id) if team1_id < team2_id else (team2_id, team1_id))
+        if winner_id is not None:
+            scores[winner_id] = scores.get(winner_id, 0) + 1
+    for team_id in load_byes(session, genre):
+        scores[team_id] = scores.get(team_id, 0) + 1
+    return scores, played
+
+
+def load_standings(session, genre, scores):
+    rows = session.execute(select(Team.id, Team.rankings).where(Team.genre == genre)).all()
+    rows.sort(key=lambda row: (-scores.get(row[0], 0), -(row[1] or INITIAL_RATING), row[0]))
+    return [team_id for team_id, rankings in rows]
+
+
+def last_round(session, genre):
+    return session.scalars(
+        select(SwissRound).where(SwissRound.genre == genre).order_by(SwissRound.number.desc()).limit(1)
+    ).first()
+
+
+def count_unfinished(session, round_):
+    # Only the previous Swiss round blocks the next one, not other pending
+    # fixtures of the genre. Matches that lost a team can never be finished
+    # and don't count.
+    if round_ is None or round_.first_match_id is None:
+        return 0
+    team1 = aliased(Team)
+    team2 = aliased(Team)
+    return session.scalar(
+        select(func.count())
+        .select_from(Match)
+        .join(team1, Match.team1_id == team1.id)
+        .join(team2, Match.team2_id == team2.id)
+        .where(Match.id.between(round_.first_match_id, round_.last_match_id), Match.winner_id == None)
+    )
+
+
+def load_byes(session, genre):
+    # A list, not a set: a team can have a bye more than once, and each is
+    # worth a point.
+    return session.scalars(
+        select(SwissRound.bye_team_id).where(SwissRound.genre == genre, SwissRound.bye_team_id != None)
+    ).all()
+
+
+def pick_bye(standings, byes):
+    # The lowest-placed team that hasn't had a bye yet; once everyone has
+    # had one, the lowest-placed team again.
+    for team_id in reversed(standings):
+        if team_id not in byes:
+            return team_id
+    return standings[-1]
+
+
+def pair_round(standings, played, byes=frozenset(), window=SEARCH_WINDOW):
+    # Unpaired teams form a doubly linked list over the standings so that
+    # paired teams are skipped in O(1) while searching for an opponent.
+    n = len(standings)
+    bye = None
+    if n % 2:
+        bye = pick_bye(standings, byes)
+        standings = [team_id for team_id in standings if team_id != bye]
+        n -= 1
+
+    nxt = list(range(1, n + 1))
+    prev = list(range(-1, n - 1))
+
+    def unlink(i):
+        if prev[i] >= 0:
+            nxt[prev[i]] = nxt[i]
+        if nxt[i] < n:
+            prev[nxt[i]] = prev[i]
+
+    pairs = []
+    rematches = 0
+    head = 0
+    while head < n:
+        team = standings[head]
+        candidate = nxt[head]
+        opponent = None
+        steps = 0
+        while candidate < n and steps < window:
+            other = standings[candidate]
+            if (min(team, other), max(team, other)) not in played:
+                opponent = candidate
+                break
+            candidate = nxt[candidate]
+            steps += 1
+        if opponent is None:
+            # Everyone nearby has been met already: take the closest team.
+            opponent = nxt[head]
+            rematches += 1
+
+        pairs.append((team, standings[opponent]))
+        unlink(opponent)
+        following = nxt[head]
+        unlink(head)
+        head = following
+
+    return pairs, bye, rematches
+
+
+def schedule_round(session, genre, match_date=None, allow_pending=False):
+    scores, played = load_event(session, genre)
+    standings = load_standings(session, genre, scores)
+    if len(standings) < 2:
+        raise ValueError(f"Need at least two {genre} teams for a Swiss round")
+
+    previous = last_round(session, genre)
+    pending = count_unfinished(session, previous)
+    if pending and not allow_pending:
+        raise ValueError(
+            f"{pending} matches of {genre} Swiss round {previous.number} are still pending; "
+            "simulate them before pairing the next round"
+        )
+
+    parsed_date = parse_date(match_date) or datetime.now().date()
+    if parsed_date < datetime.now().date():
+        raise ValueError("Date cannot be in the past")
+
+    pairs, bye, rematches = pair_round(standings, played, set(load_byes(session, genre)))
+    first_match = (session.scalar(select(func.max(Match.id))) or 0) + 1
+    session.execute(insert(Match), [
+        {"id": first_match + n, "team1_id": home, "team2_id": away, "date": parsed_date, "winner_id": None}
+        for n, (home, away) in enumerate(pairs)
+    ])
+    number = previous.number + 1 if previous else 1
+    session.add(SwissRound(
+        genre=genre, number=number, date=parsed_date, bye_team_id=bye,
+        first_match_id=first_match, last_match_id=first_match + len(pairs) - 1,
+    ))
+    session.flush()
+    return {
+        "genre": genre,
+        "round": number,
+        "teams": len(standings),
+        "fixtures": len(pairs),
+        "bye": bye,
+        "rematches": rematches,
+        "date": parsed_date,
+    }
@@ -0,0 +1,297 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, func
+from db.models import Team, Match, Bracket, BracketSlot
+from operations import VALID_GENRES, parse_date
+from ratings import INITIAL_RATING
+import swiss
+
+# Fixture generation for a whole genre at once. Pairings are computed in
+# memory from one team query and written with a single executemany insert.
+# Knockout rounds depend on results, so a bracket is scheduled one round at
+# a time: generate_fixtures opens it and advance_bracket pairs the winners
+# of each finished round. Swiss rounds come from swiss.py the same way.
+#
+# In double elimination a round has a winners-bracket side (W) and a
+# losers-bracket side (L). Teams that lose in W drop into L, a loss in L
+# eliminates, and once each side is down to one team they meet in a grand
+# final (F). There is no bracket reset: the grand final decides it.
+
+FORMATS = ['round-robin', 'single-elimination', 'double-elimination', 'swiss']
+BRACKET_FORMATS = ['single-elimination', 'double-elimination']
+
+
+def seeded_teams(session, genre):
+    rows = session.execute(
+        select(Team.id, Team.rankings).where(Team.genre == genre)
+    ).all()
+    rows.sort(key=lambda row: (-(row[1] or INITIAL_RATING), row[0]))
+    return [team_id for team_id, rankings in rows]
+
+
+def round_robin_rounds(team_ids, legs=1):
+    # Circle method: the first team stays put while the rest rotate one
+    # place each round. With an odd count, None is the bye.
+    teams = list(team_ids)
+    if len(teams) % 2:
+        teams.append(None)
+    n = len(teams)
+    half = n // 2
+
+    rounds = []
+    for r in range(n - 1):
+        pairs = []
+        for i in range(half):
+            home, away = teams[i], teams[n - 1 - i]
+            if home is None or away is None:
+                continue
+            # Alternate the fixed team's side so it isn't always at home.
+            if i == 0 and r % 2:
+                home, away = away, home
+            pairs.append((home, away))
+        rounds.append(pairs)
+        teams.insert(1, teams.pop())
+
+    for leg in range(1, legs):
+        rounds += [[(away, home) if leg % 2 else (home, away) for home, away in pairs] for pairs in rounds[:n - 1]]
+    return rounds
+
+
+def bracket_order(size):
+    # Seed positions for a bracket of `size` slots: 1v8, 4v5, 2v7, 3v6 ...
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+def elimination_round(seeded):
+    # The opening round in bracket order: (home, away) for a match, or
+    # (team, None) for a bye. Byes only ever meet an empty slot.
+    size = 1
+    while size < len(seeded):
+        size *= 2
+    slots = [seeded[seed - 1] if seed <= len(seeded) else None for seed in bracket_order(size)]
+    return [
+        (home, away) if home is not None else (away, None)
+        for home, away in zip(slots[0::2], slots[1::2])
+    ]
+
+
+def assign_dates(rounds, start, days_between_rounds=1, max_per_day=None):
+    # Each round starts on its own day; a round larger than max_per_day
+    # spills over onto the following days before the next round begins.
+    fixtures = []
+    day = start
+    for pairs in rounds:
+        per_day = max_per_day or len(pairs) or 1
+        for i, (home, away) in enumerate(pairs):
+            fixtures.append({
+                "team1_id": home,
+                "team2_id": away,
+                "date": day + timedelta(days=i // per_day),
+                "winner_id": None,
+            })
+        days_used = (len(pairs) - 1) // per_day + 1 if pairs else 1
+        day += timedelta(days=max(days_between_rounds, days_used))
+    return fixtures
+
+
+def insert_fixtures(session, fixtures):
+    # Explicit IDs, so a round's slots can point at its matches without
+    # reading them back.
+    first_match = (session.scalar(select(func.max(Match.id))) or 0) + 1
+    for n, fixture in enumerate(fixtures):
+        fixture["id"] = first_match + n
+    if fixtures:
+        session.execute(insert(Match), fixtures)
+
+
+def insert_slots(session, bracket_id, round_number, sides):
+    # sides: [(side, entries, fixtures)]. Positions run on across sides.
+    rows = []
+    for side, entries, fixtures in sides:
+        match_ids = iter(fixture["id"] for fixture in fixtures)
+        for home, away in entries:
+            rows.append({
+                "bracket_id": bracket_id,
+                "round": round_number,
+                "position": len(rows),
+                "side": side,
+                "match_id": next(match_ids) if away is not None else None,
+                "team_id": home if away is None else None,
+            })
+    if rows:
+        session.execute(insert(BracketSlot), rows)
+
+
+def slot_result(slot, match):
+    # (finished, team that goes through, team that lost). A match that lost
+    # a team to deletion is a walkover for the other side, and nobody loses.
+    if slot.match_id is None:
+        return True, slot.team_id, None
+    if match is None:
+        return True, None, None
+    if match.team1_id is None or match.team2_id is None:
+        return True, match.team1_id if match.team2_id is None else match.team2_id, None
+    if match.winner_id is not None:
+        loser = match.team2_id if match.winner_id == match.team1_id else match.team1_id
+        return True, match.winner_id, loser
+    return False, None, None
+
+
+def bracket_pairs(winners):
+    # Winners of neighbouring slots meet; a slot left empty (both sides
+    # deleted) gives the other winner a bye.
+    return [
+        (home, away) if home is not None else (away, None)
+        for home, away in zip(winners[0::2], winners[1::2])
+    ]
+
+
+def losers_round(survivors, dropped):
+    # Teams that just dropped out of the winners bracket meet the losers
+    # bracket's survivors when the two groups are level, crossed over so
+    # they don't replay the match they just lost. Otherwise the larger
+    # group plays among itself and the other waits a round with a bye.
+    if survivors and len(survivors) == len(dropped):
+        return list(zip(survivors, reversed(dropped)))
+    playing, waiting = (survivors, dropped) if len(survivors) > len(dropped) else (dropped, survivors)
+    entries = list(zip(playing[0::2], playing[1::2]))
+    if len(playing) % 2:
+        entries.append((playing[-1], None))
+    return entries + [(team_id, None) for team_id in waiting]
+
+
+def next_round(bracket, results):
+    # results: side -> [(finished, winner, loser)] in slot order. Returns
+    # the champion, or the next round as {side: entries}.
+    if 'F' in results:
+        return results['F'][0][1], None
+    winners = [winner for _, winner, _ in results.get('W', [])]
+    survivors = [winner for _, winner, _ in results.get('L', []) if winner is not None]
+    dropped = []
+    if bracket.format == 'double-elimination':
+        dropped = [loser for _, _, loser in results.get('W', []) if loser is not None]
+    if len(winners) == 1 and not survivors and not dropped:
+        return winners[0], None
+    if len(winners) == 1 and len(survivors) + len(dropped) == 1:
+        home, away = winners[0], (survivors + dropped)[0]
+        return None, {'F': [(home, away) if home is not None else (away, None)]}
+    # The winners-bracket champion waits for the grand final as a bye.
+    upper = [(winners[0], None)] if len(winners) == 1 else bracket_pairs(winners)
+    return None, {'W': upper, 'L': losers_round(survivors, dropped)}
+
+
+def advance_bracket(session, genre, start=None, days_between_rounds=1, max_per_day=None):
+    bracket = session.scalars(
+        select(Bracket).where(Bracket.genre == genre, Bracket.status == 'running').order_by(Bracket.id.desc())
+    ).first()
+    if bracket is None:
+        raise ValueError(f"No running {genre} bracket; start one with --format {' or '.join(BRACKET_FORMATS)}")
+
+    round_number = session.scalar(select(func.max(BracketSlot.round)).where(BracketSlot.bracket_id == bracket.id))
+    slots = session.execute(
+        select(BracketSlot, Match)
+        .outerjoin(Match, Match.id == BracketSlot.match_id)
+        .where(BracketSlot.bracket_id == bracket.id, BracketSlot.round == round_number)
+        .order_by(BracketSlot.position)
+    ).all()
+    results = {}
+    for slot, match in slots:
+        results.setdefault(slot.side, []).append(slot_result(slot, match))
+    pending = sum(not finished for side in results.values() for finished, _, _ in side)
+    if pending:
+        raise ValueError(f"{pending} matches of round {round_number} are still pending; simulate them first")
+
+    champion, entries = next_round(bracket, results)
+    if entries is None:
+        bracket.status = 'finished'
+        bracket.champion_id = champion
+        return {"genre": genre, "bracket": bracket.id, "round": round_number, "fixtures": 0,
+                "byes": [], "champion": champion, "grand_final": False, "first_date": None, "last_date": None}
+
+    start = parse_date(start) or datetime.now().date()
+    if start < datetime.now().date():
+        raise ValueError("Date cannot be in the past")
+    sides = [(side, entries[side]) for side in ('W', 'L', 'F') if side in entries]
+    pairs = [(home, away) for _, side_entries in sides for home, away in side_entries if away is not None]
+    fixtures = assign_dates([pairs], start, days_between_rounds, max_per_day)
+    insert_fixtures(session, fixtures)
+    by_side = []
+    used = 0
+    for side, side_entries in sides:
+        count = sum(away is not None for _, away in side_entries)
+        by_side.append((side, side_entries, fixtures[used:used + count]))
+        used += count
+    insert_slots(session, bracket.id, round_number + 1, by_side)
+    return {
+        "genre": genre,
+        "bracket": bracket.id,
+        "round": round_number + 1,
+        "fixtures": len(fixtures),
+        "byes": [home for _, side_entries in sides for home, away in side_entries
+                 if away is None and home is not None],
+        "champion": None,
+        "grand_final": 'F' in entries,
+        "first_date": fixtures[0]["date"] if fixtures else None,
+        "last_date": fixtures[-1]["date"] if fixtures else None,
+    }
+
+
+def generate_fixtures(session, genre, fmt, start=None, days_between_rounds=1, max_per_day=None, legs=1):
+    if genre not in VALID_GENRES:
+        raise ValueError(f"Invalid genre '{genre}'. Choose from: {', '.join(VALID_GENRES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+
+    if fmt == 'swiss':
+        summary = swiss.schedule_round(session, genre, start)
+        return {
+            "genre": genre,
+            "format": fmt,
+            "teams": summary["teams"],
+            "rounds": 1,
+            "fixtures": summary["fixtures"],
+            "byes": [summary["bye"]] if summary["bye"] else [],
+            "first_date": summary["date"],
+            "last_date": summary["date"],
+        }
+
+    start = parse_date(start) or datetime.now().date()
+    if start < datetime.now().date():
+        raise ValueError("Date cannot be in the past")
+
+    seeded = seeded_teams(session, genre)
+    if len(seeded) < 2:
+        raise ValueError(f"Need at least two {genre} teams to generate fixtures")
+
+    byes = []
+    if fmt == 'round-robin':
+        rounds = round_robin_rounds(seeded, legs)
+        fixtures = assign_dates(rounds, start, days_between_rounds, max_per_day)
+        insert_fixtures(session, fixtures)
+    else:
+        running = session.scalar(select(Bracket.id).where(Bracket.genre == genre, Bracket.status == 'running'))
+        if running:
+            raise ValueError(f"{genre} bracket {running} is still running; finish it with `matches advance`")
+        entries = elimination_round(seeded)
+        rounds = [[(home, away) for home, away in entries if away is not None]]
+        byes = [home for home, away in entries if away is None]
+        fixtures = assign_dates(rounds, start, days_between_rounds, max_per_day)
+        insert_fixtures(session, fixtures)
+        bracket = Bracket(genre=genre, format=fmt, status='running')
+        session.add(bracket)
+        session.flush()
+        insert_slots(session, bracket.id, 1, [('W', entries, fixtures)])
+
+    return {
+        "genre": genre,
+        "format": fmt,
+        "teams": len(seeded),
+        "rounds": len(rounds),
+        "fixtures": len(fixtures),
+        "byes": byes,
+        "first_date": fixtures[0]["date"] if fixtures else None,
+        "last_date": fixtures[-1]["date"] if fixtures else None,
+    }
@@ -0,0 +1,57 @@
+import os
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+from db.models import Base, Team, Match
+from db.seed import seed_league
+import snapshot
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'league.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed_league(session, teams=12, matches=120, players_per_team=3, pending=0.25, seed=1,
+                    system="glicko2", player_stats=True)
+        # NULLs and non-ASCII text in every kind of column.
+        session.execute(update(Team).where(Team.id == 1).values(name="Équipe ünï 🎮", rating_deviation=None))
+        session.execute(update(Match).where(Match.id == 1).values(team2_id=None))
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def database_rows(engine, model):
+    table = model.__table__
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(select(table).order_by(*table.primary_key))]
+
+
+@pytest.mark.parametrize("fmt", ["binary", "parquet"])
+def test_round_trip(engine, tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    path = os.path.join(tmp_path, fmt)
+    # A small chunk size, so tables are written in several pieces.
+    summary = snapshot.export_snapshot(engine, path, fmt, chunk_size=50)
+    opened = snapshot.open_snapshot(path)
+    assert opened.format == fmt
+
+    for name, model in snapshot.SNAPSHOT_TABLES.items():
+        expected = database_rows(engine, model)
+        assert summary["tables"][name] == len(expected)
+        assert list(opened.rows(name)) == expected, name
+
+    rows = [0, 2, 5]
+    matches = database_rows(engine, Match)
+    columns = [column.name for column in Match.__table__.columns]
+    for position, column in enumerate(columns):
+        assert opened.values("matches", column, rows) == [matches[row][position] for row in rows]
+
+
+def test_existing_path_is_refused(engine, tmp_path):
+    path = os.path.join(tmp_path, "snap")
+    snapshot.export_snapshot(engine, path, "binary", ["teams"])
+    with pytest.raises(ValueError):
+        snapshot.export_snapshot(engine, path, "binary", ["teams"])
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from db.models import Base, Team, Match, SwissRound
+import swiss
+
+GENRE = "Valorant"
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def add_teams(session, ratings):
+    session.add_all([
+        Team(id=team_id, name=f"Team {team_id}", genre=GENRE, rankings=rating)
+        for team_id, rating in enumerate(ratings, 1)
+    ])
+    session.flush()
+
+
+def round_matches(session, number):
+    round_ = session.scalars(select(SwissRound).where(SwissRound.number == number)).one()
+    return session.scalars(
+        select(Match).where(Match.id.between(round_.first_match_id, round_.last_match_id)).order_by(Match.id)
+    ).all()
+
+
+def play(session, number, winner):
+    # winner(match) -> team id
+    for match in round_matches(session, number):
+        match.winner_id = winner(match)
+    session.flush()
+
+
+def pairs(session, number):
+    return {frozenset((match.team1_id, match.team2_id)) for match in round_matches(session, number)}
+
+
+def test_round_one_winners_meet_in_round_two(session):
+    add_teams(session, [1500] * 8)
+    start = date.today() + timedelta(days=1)
+    swiss.schedule_round(session, GENRE, start)
+    # The higher id wins every match, so teams 1-4 and 5-8 never share a score.
+    play(session, 1, lambda match: max(match.team1_id, match.team2_id))
+    winners = {max(pair) for pair in pairs(session, 1)}
+
+    swiss.schedule_round(session, GENRE, start + timedelta(days=1))
+
+    for pair in pairs(session, 2):
+        assert pair <= winners or not pair & winners
+
+
+def test_history_outside_the_event_is_ignored(session):
+    add_teams(session, [1500] * 4)
+    # Team 1 won a pile of earlier fixtures; they don't count in the event.
+    session.add_all([
+        Match(team1_id=1, team2_id=2, date=date(2024, 1, day), winner_id=1) for day in range(1, 11)
+    ])
+    session.flush()
+    start = date.today() + timedelta(days=1)
+    summary = swiss.schedule_round(session, GENRE, start)
+    # Earlier fixtures between 1 and 2 aren't rematches inside the event.
+    assert summary["rematches"] == 0
+    assert frozenset((1, 2)) in pairs(session, 1)
+
+    play(session, 1, lambda match: max(match.team1_id, match.team2_id))
+    swiss.schedule_round(session, GENRE, start + timedelta(days=1))
+    # 2 and 4 won round 1; 1 lost it, whatever its record before.
+    assert pairs(session, 2) == {frozenset((2, 4)), frozenset((1, 3))}
+
+
+def test_bye_scores_a_point(session):
+    add_teams(session, [1500] * 5)
+    start = date.today() + timedelta(days=1)
+    first = swiss.schedule_round(session, GENRE, start)
+    play(session, 1, lambda match: max(match.team1_id, match.team2_id))
+    scores, played = swiss.load_event(session, GENRE)
+    assert scores[first["bye"]] == 1
+    assert sorted(scores.values()) == [1, 1, 1]
@@ -0,0 +1,62 @@
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from db.models import Base, Team, Match, Bracket
+import tournaments
+
+GENRE = "Valorant"
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def run_bracket(session, teams, fmt):
+    session.add_all([
+        Team(id=team_id, name=f"Team {team_id}", genre=GENRE, rankings=2000 - team_id)
+        for team_id in range(1, teams + 1)
+    ])
+    session.flush()
+    tournaments.generate_fixtures(session, GENRE, fmt, date.today())
+    for _ in range(4 * teams):
+        # The lower id (the better seed) wins, except every third match.
+        for match in session.scalars(select(Match).where(Match.winner_id == None)):
+            home, away = sorted((match.team1_id, match.team2_id))
+            match.winner_id = away if match.id % 3 == 0 else home
+        session.flush()
+        summary = tournaments.advance_bracket(session, GENRE, date.today())
+        if summary["champion"] is not None:
+            return summary["champion"]
+    raise AssertionError("bracket never finished")
+
+
+def losses(session):
+    counts = {}
+    for match in session.scalars(select(Match)):
+        loser = match.team2_id if match.winner_id == match.team1_id else match.team1_id
+        counts[loser] = counts.get(loser, 0) + 1
+    return counts
+
+
+@pytest.mark.parametrize("teams", [2, 5, 8, 13])
+def test_double_elimination_eliminates_on_the_second_loss(session, teams):
+    champion = run_bracket(session, teams, "double-elimination")
+    counts = losses(session)
+    assert counts.get(champion, 0) <= 1
+    # Everyone but the finalists leaves with two losses; the grand final
+    # loser may have only the one.
+    assert sorted(count for team_id, count in counts.items() if team_id != champion)[1:] == [2] * (teams - 2)
+    assert session.scalars(select(Bracket)).one().status == "finished"
+
+
+def test_single_elimination_eliminates_on_the_first_loss(session):
+    champion = run_bracket(session, 8, "single-elimination")
+    counts = losses(session)
+    assert champion not in counts
+    assert sorted(counts.values()) == [1] * 7